@@ -1,13 +1,22 @@
-import os, io, time, asyncio, logging, json
+import os, io, gc, re, time, asyncio, functools, hashlib, hmac, itertools, logging, json, pickle, shutil, struct, threading, uuid, zipfile
+import multiprocessing as mp
 from typing import Optional, List
-from contextlib import asynccontextmanager
-from dataclasses import asdict
+from collections import OrderedDict, deque
+from contextlib import AsyncExitStack, asynccontextmanager
+from contextvars import ContextVar
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, replace
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait as wait_connections
 
 import torch
 import numpy as np
 import soundfile as sf
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
-from fastapi.responses import StreamingResponse, JSONResponse, HTMLResponse
+from fastapi import FastAPI, HTTPException, Request, UploadFile, File, Form
+from fastapi.responses import StreamingResponse, JSONResponse, HTMLResponse, Response, FileResponse, PlainTextResponse
+from starlette.datastructures import Headers, MutableHeaders
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
 from pydantic import BaseModel
 
 logging.basicConfig(level=logging.INFO)
@@ -15,9 +24,113 @@ logger = logging.getLogger("qwen3-tts")
 
 PORT = int(os.getenv("PORT", 8766))
 GPU_IDLE_TIMEOUT = int(os.getenv("GPU_IDLE_TIMEOUT", 600))
+# Models stay resident until they no longer fit; 0 = 90% of the device's memory.
+GPU_MEMORY_BUDGET_MB = int(os.getenv("GPU_MEMORY_BUDGET_MB", 0))
 CUDA_DEVICE = os.getenv("CUDA_DEVICE", "cuda:0")
+# Devices to serve from, each with its own model pool and INFER_WORKERS threads, e.g.
+# "cuda:0,cuda:1". "cpu:0-15" is a CPU device whose workers are bound to cores 0-15 (one
+# entry per NUMA node). Defaults to CUDA_DEVICE.
+DEVICES = [d.strip() for d in os.getenv("DEVICES", "").split(",") if d.strip()] or [CUDA_DEVICE]
+# Models loaded and warmed up at startup (comma-separated model types, "tokenizer", or "all").
+# They are exempt from GPU_IDLE_TIMEOUT, and /ready answers 503 until their warm-up is done.
+PRELOAD_MODELS = [m.strip() for m in os.getenv("PRELOAD_MODELS", "").split(",") if m.strip()]
+WARMUP_MAX_NEW_TOKENS = int(os.getenv("WARMUP_MAX_NEW_TOKENS", 48))
+# Inference runs on a dedicated thread pool per device so the event loop stays responsive.
+# Keep INFER_WORKERS at 1 unless each worker gets its own model: generation
+# mutates per-model state (rope deltas, KV caches) and is not re-entrant.
+INFER_WORKERS = int(os.getenv("INFER_WORKERS", 1))
+# Run inference in this many worker processes per device instead of threads of the API process
+# (0 = in-process). Each process holds its own copy of the models it serves.
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", 0))
+INFER_QUEUE_SIZE = int(os.getenv("INFER_QUEUE_SIZE", 16))
+INFER_RETRY_AFTER = int(os.getenv("INFER_RETRY_AFTER", 5))
+# Priority classes, most urgent first. API requests are "interactive" unless sent with
+# "X-Priority: batch"; bulk job items are "batch". Each device keeps a queue per class. Per class:
+# PRIORITY_WEIGHTS is its share of worker slots while several classes wait, PRIORITY_CONCURRENCY
+# caps its running jobs (0 = INFER_WORKERS) and PRIORITY_MAX_WAIT_MS is its queue-wait target; a
+# class past its target is served first. Waiting higher-class work pauses lower-class generation
+# at its next frame boundary.
+PRIORITIES = ("interactive", "batch")
+
+
+def _per_priority(name: str, default: str, cast) -> dict:
+    values = dict(kv.split("=") for kv in default.split(","))
+    for kv in filter(None, (kv.strip() for kv in os.getenv(name, "").split(","))):
+        cls, _, value = kv.partition("=")
+        if cls.strip() not in values:
+            raise ValueError(f"{name}: unknown priority class {cls.strip()!r}")
+        values[cls.strip()] = value
+    return {cls: cast(value) for cls, value in values.items()}
+
+
+PRIORITY_WEIGHTS = _per_priority("PRIORITY_WEIGHTS", "interactive=8,batch=1", float)
+PRIORITY_CONCURRENCY = _per_priority("PRIORITY_CONCURRENCY", "interactive=0,batch=0", int)
+PRIORITY_MAX_WAIT_MS = _per_priority("PRIORITY_MAX_WAIT_MS", "interactive=2000,batch=60000", float)
+# Admission control: each TTS request is costed before it is queued, as its predicted codec frames
+# times the observed compute seconds per frame. Requests predicted above COST_MAX_REQUEST_SECONDS
+# are refused with 413. While COST_BUDGET_SECONDS of predicted compute is admitted, further
+# interactive requests get 429 and batch ones wait (0 disables either limit). max_new_tokens is
+# capped at MAX_NEW_TOKENS_SLACK times the predicted frames, rounded up to a power of two (0 = no cap).
+COST_MAX_REQUEST_SECONDS = float(os.getenv("COST_MAX_REQUEST_SECONDS", 300))
+COST_BUDGET_SECONDS = float(os.getenv("COST_BUDGET_SECONDS", 0))
+MAX_NEW_TOKENS_SLACK = float(os.getenv("MAX_NEW_TOKENS_SLACK", 3))
+# Micro-batching: compatible requests arriving within BATCH_WINDOW_MS are run as
+# one batched generate call (BATCH_MAX_SIZE=1 disables batching).
+BATCH_WINDOW_MS = int(os.getenv("BATCH_WINDOW_MS", 20))
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", 8))
+BATCH_LENGTH_RATIO = float(os.getenv("BATCH_LENGTH_RATIO", 2.0))
+# Continuous batching (opt-in): non-streaming requests join the running batch of their model at
+# the next frame boundary and leave it as soon as they finish, instead of waiting for a batch to
+# form and for its longest member. Up to ENGINE_MAX_BATCH sequences decode together per device,
+# their KV states in a pool of ENGINE_KV_TOKENS positions (ENGINE_BLOCK_SIZE per block, allocated
+# on first use next to the model); each inference call advances the batch ENGINE_STEP_FRAMES frames.
+# Seeded, long-form and profiled requests still go through the micro-batcher.
+CONTINUOUS_BATCHING = os.getenv("CONTINUOUS_BATCHING", "0") not in ("0", "false", "False")
+ENGINE_MAX_BATCH = int(os.getenv("ENGINE_MAX_BATCH", 16))
+ENGINE_KV_TOKENS = int(os.getenv("ENGINE_KV_TOKENS", 16384))
+ENGINE_BLOCK_SIZE = int(os.getenv("ENGINE_BLOCK_SIZE", 16))
+ENGINE_STEP_FRAMES = int(os.getenv("ENGINE_STEP_FRAMES", 8))
+# Each model keeps the talker KV states of up to PREFIX_CACHE_TOKENS positions of prompt prefixes
+# (instruction, role tokens, language and speaker tags), so requests that share a prefix only
+# prefill the rest of their prompt. 0 disables it.
+PREFIX_CACHE_TOKENS = int(os.getenv("PREFIX_CACHE_TOKENS", 2048))
+# Streaming endpoints decode the first STREAM_FIRST_CHUNK_FRAMES codec frames (12.5 per
+# second of audio) as soon as they exist, then double the window up to STREAM_MAX_CHUNK_FRAMES.
+STREAM_FIRST_CHUNK_FRAMES = int(os.getenv("STREAM_FIRST_CHUNK_FRAMES", 4))
+STREAM_MAX_CHUNK_FRAMES = int(os.getenv("STREAM_MAX_CHUNK_FRAMES", 32))
+# Long-form mode: texts of LONG_FORM_CHARS or more (or requests with long_form=true) are split
+# into sentence chunks of up to LONG_FORM_CHUNK_TOKENS tokens, generated LONG_FORM_BATCH_SIZE at a
+# time and joined with LONG_FORM_CROSSFADE_MS crossfades. LONG_FORM_CHARS=0 disables the automatic switch.
+LONG_FORM_CHARS = int(os.getenv("LONG_FORM_CHARS", 400))
+LONG_FORM_CHUNK_TOKENS = int(os.getenv("LONG_FORM_CHUNK_TOKENS", 80))
+LONG_FORM_BATCH_SIZE = int(os.getenv("LONG_FORM_BATCH_SIZE", 8))
+LONG_FORM_CROSSFADE_MS = float(os.getenv("LONG_FORM_CROSSFADE_MS", 40))
+LONG_FORM_ARGS = dict(max_chunk_tokens=LONG_FORM_CHUNK_TOKENS, batch_size=LONG_FORM_BATCH_SIZE,
+                      crossfade_ms=LONG_FORM_CROSSFADE_MS)
+# Tokenizer batch endpoints run their files through the codec TOKENIZER_BATCH_SIZE at a time.
+TOKENIZER_BATCH_SIZE = int(os.getenv("TOKENIZER_BATCH_SIZE", 16))
+# Threads that encode responses (FLAC/MP3/Opus/G.711), off the event loop and the inference workers.
+ENCODE_WORKERS = int(os.getenv("ENCODE_WORKERS", 2))
+# Voice clone prompts are cached by a hash of the reference clip; set VOICE_CACHE_DIR to
+# persist them across restarts.
+VOICE_CACHE_SIZE = int(os.getenv("VOICE_CACHE_SIZE", 256))
+VOICE_CACHE_DIR = os.getenv("VOICE_CACHE_DIR", "")
 OUTPUT_DIR = "/tmp/qwen3-tts"
 os.makedirs(OUTPUT_DIR, exist_ok=True)
+# Bulk synthesis jobs (/api/jobs) keep their items and results here and resume after a restart.
+JOBS_DIR = os.getenv("JOBS_DIR", os.path.join(OUTPUT_DIR, "jobs"))
+# Opt-in cache of synthesized audio for deterministic requests (do_sample=false or a seed);
+# entries evicted from memory spill to OUTPUT_DIR/cache. 0/0 disables it.
+RESULT_CACHE_MB = float(os.getenv("RESULT_CACHE_MB", 0))
+RESULT_CACHE_DISK_MB = float(os.getenv("RESULT_CACHE_DISK_MB", 0))
+# Per-stage histograms (tokenize, prefill, per-frame decode, code predictor, codec decode) sync
+# the GPU at every stage boundary, several times per decoded frame, so they are opt-in (STAGE_METRICS=1).
+STAGE_METRICS = os.getenv("STAGE_METRICS", "0") not in ("0", "false", "False")
+# Admin-only features (per-request torch.profiler capture) need this token in X-Admin-Token;
+# empty disables them.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_DIR = os.path.join(OUTPUT_DIR, "profiles")
+PROFILE_KEEP = 20
 
 SPEAKERS = ["Vivian", "Serena", "Uncle_Fu", "Dylan", "Eric", "Ryan", "Aiden", "Ono_Anna", "Sohee"]
 LANGUAGES = ["Auto", "Chinese", "English", "Japanese", "Korean", "German", "French", "Russian", "Portuguese", "Spanish", "Italian"]
@@ -151,94 +264,1977 @@ I18N = {
 }
 
 
+# ── Metrics ──
+STAGE_SECONDS = Histogram(
+    "qwen_tts_stage_seconds", "Time spent in each pipeline stage", ["stage"],
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 120))
+CODEC_FRAMES = Counter("qwen_tts_codec_frames_total", "Codec frames decoded to audio")
+AUDIO_SECONDS = Counter("qwen_tts_audio_seconds_total", "Seconds of audio generated", ["model_type"])
+GENERATION_SECONDS = Counter("qwen_tts_generation_seconds_total", "Inference time spent generating audio",
+                             ["model_type"])
+REAL_TIME_FACTOR = Histogram("qwen_tts_real_time_factor", "Generation time divided by audio duration",
+                             ["model_type"], buckets=(.05, .1, .2, .3, .5, .75, 1, 1.5, 2, 3, 5, 10))
+BATCH_SIZE = Histogram("qwen_tts_batch_size", "Requests per batched generate call", ["model_type"],
+                       buckets=(1, 2, 3, 4, 6, 8, 12, 16, 24, 32))
+MODEL_LOADS = Counter("qwen_tts_model_loads_total", "Models loaded onto the device", ["model_type"])
+MODEL_EVICTIONS = Counter("qwen_tts_model_evictions_total", "Models freed from the device", ["model_type"])
+WORKER_RESTARTS = Counter("qwen_tts_worker_restarts_total", "Inference worker processes restarted after exiting",
+                          ["device"])
+CLIENT_DISCONNECTS = Counter("qwen_tts_client_disconnects_total",
+                             "Requests whose generation was cancelled because the client disconnected")
+PRIORITY_QUEUE_SECONDS = Histogram(
+    "qwen_tts_priority_queue_seconds", "Time inference jobs waited for a worker slot, after preemptions too",
+    ["priority"], buckets=(.001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 120, 300))
+PRIORITY_LATENCY_SECONDS = Histogram(
+    "qwen_tts_priority_latency_seconds", "Inference job latency from submission to result", ["priority"],
+    buckets=(.05, .1, .25, .5, 1, 2, 3, 5, 7.5, 10, 15, 30, 60, 120, 300))
+PREEMPTIONS = Counter("qwen_tts_preemptions_total", "Running jobs paused at a frame boundary for higher-priority work",
+                      ["priority"])
+ADMISSIONS = Counter("qwen_tts_admissions_total", "Admission decisions on predicted compute "
+                     "(admitted, deferred, rejected, too_expensive)", ["result"])
+COST_PREDICTION_RATIO = Histogram("qwen_tts_cost_prediction_ratio", "Observed / predicted codec frames per request",
+                                  ["model_type"], buckets=(.25, .5, .67, .8, .9, 1, 1.1, 1.25, 1.5, 2, 4))
+
+
+def _observe_stage(name: str, seconds: float, info: dict):
+    STAGE_SECONDS.labels(name).observe(seconds)
+
+
+def _observe_generation(model_type: str, audio_seconds: float, t_gen: float):
+    AUDIO_SECONDS.labels(model_type).inc(audio_seconds)
+    CODEC_FRAMES.inc(round(audio_seconds * CODEC_FRAME_RATE))
+    GENERATION_SECONDS.labels(model_type).inc(t_gen)
+    if audio_seconds > 0:
+        REAL_TIME_FACTOR.labels(model_type).observe(t_gen / audio_seconds)
+
+
+# ── Profiling ──
+# Set by the profiling middleware for a request sent with ``X-Profile: 1``; the inference
+# job of that request runs under torch.profiler.
+_profile_request: ContextVar[Optional[dict]] = ContextVar("profile_request", default=None)
+_PROFILE_ID_RE = re.compile(r"[0-9a-f]{16}")
+
+
+def _is_admin(request: Request) -> bool:
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(request.headers.get("x-admin-token", ""), ADMIN_TOKEN)
+
+
+def _profiled(profile: dict, fn, *args, **kwargs):
+    """Run ``fn`` under torch.profiler and save its trace and op summary to PROFILE_DIR."""
+    from torch.profiler import ProfilerActivity, profile as torch_profile
+    activities = [ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(ProfilerActivity.CUDA)
+    prof = torch_profile(activities=activities, record_shapes=True)
+    try:
+        with prof:
+            return fn(*args, **kwargs)
+    finally:
+        _save_profile(profile["id"], prof, sort_by="self_device_time_total" if len(activities) > 1 else "self_cpu_time_total")
+
+
+def _save_profile(profile_id: str, prof, sort_by: str):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    prof.export_chrome_trace(os.path.join(PROFILE_DIR, f"{profile_id}.json.gz"))
+    summary = (prof.key_averages().table(sort_by=sort_by, row_limit=40) + "\n\nBy input shape:\n"
+               + prof.key_averages(group_by_input_shape=True).table(sort_by=sort_by, row_limit=40))
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.txt"), "w") as f:
+        f.write(summary)
+    files = sorted((e for e in os.scandir(PROFILE_DIR) if e.name.endswith(".txt")), key=lambda e: e.stat().st_mtime)
+    for e in files[:-PROFILE_KEEP]:
+        for ext in (".txt", ".json.gz"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, e.name[:-4] + ext))
+            except FileNotFoundError:
+                pass
+
+
+# ── Client disconnects ──
+# Set by DisconnectWatchMiddleware once the client of the current request has disconnected.
+_client_gone: ContextVar[Optional[asyncio.Event]] = ContextVar("client_gone", default=None)
+
+
+class ClientDisconnected(HTTPException):
+    """Raised when the client left before its audio was ready (logged as HTTP 499)."""
+
+    def __init__(self):
+        super().__init__(status_code=499, detail="Client closed request")
+
+
+class Cancellation:
+    """Cancel flags of one inference call (one per batch row), and its pause switch.
+
+    Passed to the model as ``cancel``, which the talker polls every few frames: cancelled rows
+    stop and their codec decode is skipped. While the call is paused the poll blocks, which
+    hands the worker slot to higher-priority work. For a call in a worker process, ``forward``
+    relays every change to the worker's own copy.
+    """
+
+    def __init__(self, rows: int = 1):
+        self.flags = [False] * rows
+        self.forward = None     # (op, *args) -> None
+        self.on_paused = None   # called on the generating thread when it stops for a pause
+        self._running = threading.Event()
+        self._running.set()
+
+    def __call__(self) -> List[bool]:
+        if not self._running.is_set():
+            # Work run meanwhile draws from the same generator; keep seeded calls reproducible.
+            cuda = getattr(_worker, "device", "cpu").startswith("cuda")
+            rng = torch.cuda.get_rng_state() if cuda else torch.get_rng_state()
+            if self.on_paused is not None:
+                self.on_paused()
+            self._running.wait()
+            (torch.cuda.set_rng_state if cuda else torch.set_rng_state)(rng)
+        return self.flags
+
+    @property
+    def all(self) -> bool:
+        return all(self.flags)
+
+    def cancel(self, row: int = 0):
+        if not self.flags[row]:
+            self.flags[row] = True
+            if self.forward is not None:
+                self.forward("cancel", row)
+
+    def pause(self):
+        self._running.clear()
+        if self.forward is not None:
+            self.forward("pause")
+
+    def resume(self):
+        self._running.set()
+        if self.forward is not None:
+            self.forward("resume")
+
+
+async def _unless_client_gone(fut: asyncio.Future):
+    """Await ``fut``; if the client of the current request disconnects first, cancel it and raise ClientDisconnected."""
+    gone = _client_gone.get()
+    if gone is None:
+        return await fut
+    watch = asyncio.ensure_future(gone.wait())
+    try:
+        await asyncio.wait([fut, watch], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watch.cancel()
+        if not fut.done():
+            fut.cancel()
+    if fut.cancelled():
+        CLIENT_DISCONNECTS.inc()
+        raise ClientDisconnected()
+    return fut.result()
+
+
 # ── GPU Manager ──
+class QueueFullError(HTTPException):
+    """Raised when the inference queue is at capacity (HTTP 429)."""
+
+    def __init__(self, retry_after: int = INFER_RETRY_AFTER):
+        super().__init__(status_code=429, detail="Inference queue is full, retry later",
+                         headers={"Retry-After": str(retry_after)})
+
+
+class NoRoomError(HTTPException):
+    """Raised when a model does not fit in the memory budget next to the pinned models (HTTP 503)."""
+
+    def __init__(self, key: str, need_mb: float, budget_mb: float):
+        super().__init__(status_code=503, detail=f"{key} (~{need_mb:.0f} MB) does not fit in the {budget_mb:.0f} MB "
+                                                 "memory budget next to the preloaded models")
+
+
+# Priority class of the current request (see PRIORITIES); set from X-Priority and by bulk jobs.
+_priority: ContextVar[str] = ContextVar("priority", default=PRIORITIES[0])
+
+
+class _Job:
+    """An inference call as seen by the scheduler of a device."""
+
+    def __init__(self, fn, args, kwargs, priority: str, future: asyncio.Future):
+        self.fn, self.args, self.kwargs = fn, args, kwargs
+        self.priority = priority
+        self.rank = PRIORITIES.index(priority)
+        self.future = future
+        self.cancel = kwargs.get("cancel")   # generation polls it, so only these jobs can be paused
+        self.t_submit = self.t_queued = time.time()
+        self.times = {"start": self.t_submit, "end": self.t_submit}
+        self.state = "queued"   # queued -> running [-> pausing -> paused -> running ...] -> done
+        self.protected = False  # started while its class was past its wait target: never paused
+
+
 class GPUManager:
-    def __init__(self):
-        self.model = None
-        self.model_type = None
-        self.tokenizer = None
+    """Resident model pool plus the inference executor of one device.
+
+    Several models stay loaded as long as they fit in GPU_MEMORY_BUDGET_MB; the
+    least recently used idle model is evicted to make room for a new one. Every
+    user holds a reference through ``acquire()``, and a model with live
+    references is never freed: eviction waits for it, and an offload request
+    marks it to be dropped when its last reference is released.
+
+    Calls wait in one queue per priority class for one of the INFER_WORKERS slots.
+    A free slot goes to the class furthest past its PRIORITY_MAX_WAIT_MS target, or else
+    to the class that is owed the most slots by PRIORITY_WEIGHTS (stride scheduling).
+    A class that is owed slots but finds none free pauses a running job of a lower class at
+    its next frame boundary. The paused job goes back to the front of its queue, keeping its
+    thread, its model reference and its KV cache.
+    """
+
+    UTILIZATION_WINDOW = 60.0
+
+    def __init__(self, spec: str = CUDA_DEVICE, name: Optional[str] = None):
+        self.spec = spec
+        self.name = name or spec
+        self.device, _, cores = spec.partition(":") if spec.startswith("cpu") else (spec, "", "")
+        self.cores = _parse_cores(cores) if cores else None
+        if self.cores and not self.cores <= os.sched_getaffinity(0):
+            missing = sorted(self.cores - os.sched_getaffinity(0))
+            raise ValueError(f"DEVICES entry {spec}: cores {missing} are not available to this process")
+        self.models = OrderedDict()   # key -> entry dict, least recently used first
         self.last_use = 0.0
-        self._lock = asyncio.Lock()
+        self._cond = asyncio.Condition()
         self._task = None
+        self._executor = None
+        self._pending = 0   # submitted jobs not yet finished (queued + running)
+        self._running = 0
+        self.leases = 0     # requests holding or waiting for a model here, the router's load measure
+        self.pinned = set()   # preloaded models, never offloaded for being idle
+        self.tokenizer_mb = None   # the shared speech tokenizer, reserved once in used_mb()
+        self.busy_seconds = 0.0   # worker time spent in jobs
+        self._started = {}        # running jobs -> start time
+        self._jobs_lock = threading.Lock()   # _running and _started change on worker threads
+        self._recent = deque()    # (start, end) of jobs finished within UTILIZATION_WINDOW
+        self._lanes = {p: deque() for p in PRIORITIES}   # jobs waiting for a slot, paused ones first
+        self._active = dict.fromkeys(PRIORITIES, 0)      # jobs holding a slot, per class
+        self._holding = []                               # jobs holding a slot
+        self._pass = dict.fromkeys(PRIORITIES, 0.0)      # slots handed to each class / its weight
+        self._vtime = 0.0
 
     async def start(self):
+        # Twice INFER_WORKERS threads: a paused job keeps its thread while its slot runs other work.
+        self._executor = ThreadPoolExecutor(max_workers=2 * INFER_WORKERS, thread_name_prefix=f"infer-{self.name}",
+                                            initializer=self._bind_worker)
         self._task = asyncio.create_task(self._idle_loop())
 
     async def stop(self):
         if self._task:
             self._task.cancel()
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _bind_worker(self):
+        _worker.device = self.device
+        if self.cores:
+            # Threads spawned by torch from this worker inherit the affinity mask.
+            os.sched_setaffinity(0, self.cores)
+        elif self.device.startswith("cuda"):
+            torch.cuda.set_device(torch.device(self.device))
+
+    @property
+    def model_type(self):
+        types = [k for k, e in self.models.items() if k != "tokenizer" and e["model"] is not None]
+        return types[-1] if types else None
+
+    @property
+    def full(self) -> bool:
+        return self._pending >= INFER_WORKERS + INFER_QUEUE_SIZE
+
+    def check_queue(self):
+        if self.full:
+            raise QueueFullError()
+
+    def utilization(self) -> float:
+        """Fraction of worker time spent in jobs over the last UTILIZATION_WINDOW seconds."""
+        now = time.time()
+        since = now - self.UTILIZATION_WINDOW
+        while self._recent and self._recent[0][1] < since:
+            self._recent.popleft()
+        busy = sum(end - max(start, since) for start, end in self._recent)
+        with self._jobs_lock:
+            busy += sum(now - max(start, since) for start in self._started.values())
+        return min(busy / (self.UTILIZATION_WINDOW * INFER_WORKERS), 1.0)
+
+    async def run(self, fn, *args, emit=None, **kwargs):
+        """Run a blocking inference call on the executor.
+
+        Returns ``(result, t_queue, t_run)``. Raises QueueFullError when
+        ``INFER_WORKERS + INFER_QUEUE_SIZE`` jobs are already in flight. With ``emit``,
+        ``fn`` is passed an ``emit=`` callback for partial results, and ``emit`` is
+        called with each of them on the event loop. The call is queued in the priority
+        class of the current request; with a ``cancel`` Cancellation it can be paused.
+        """
+        self.check_queue()
+        profile = _profile_request.get()
+        if profile is not None:
+            fn, args = _profiled, (profile, fn, *args)
+            profile["started"] = True
+        loop = asyncio.get_running_loop()
+        if emit is not None:
+            kwargs["emit"] = functools.partial(loop.call_soon_threadsafe, emit)
+        job = _Job(fn, args, kwargs, _priority.get(), loop.create_future())
+        self._pending += 1
+        lane = self._lanes[job.priority]
+        if not lane and not self._active[job.priority]:
+            # A class that was idle joins at the current virtual time instead of catching up.
+            self._pass[job.priority] = max(self._pass[job.priority], self._vtime)
+        lane.append(job)
+        self._schedule()
+        try:
+            result = await job.future
+        except asyncio.CancelledError:
+            if job.state == "queued":
+                lane.remove(job)
+                self._release(job.times)
+            raise
+        self.last_use = time.time()
+        STAGE_SECONDS.labels("queue_wait").observe(job.times["start"] - job.t_submit)
+        return result, job.times["start"] - job.t_submit, time.time() - job.times["start"]
+
+    def _limit(self, priority: str) -> int:
+        return PRIORITY_CONCURRENCY[priority] or INFER_WORKERS
+
+    def _overdue(self, priority: str, now: float) -> float:
+        """How far the oldest waiting job of a class is past its wait target (> 1 = late)."""
+        return (now - self._lanes[priority][0].t_queued) / max(PRIORITY_MAX_WAIT_MS[priority] / 1000, 1e-3)
+
+    def _waiting(self) -> List[str]:
+        return [p for p in PRIORITIES if self._lanes[p] and self._active[p] < self._limit(p)]
+
+    def _schedule(self):
+        """Give free slots to waiting jobs, then preempt for a class that is owed one."""
+        now = time.time()
+        while len(self._holding) < INFER_WORKERS:
+            waiting = self._waiting()
+            if not waiting:
+                break
+            late = max(waiting, key=lambda p: self._overdue(p, now))
+            overdue = self._overdue(late, now) > 1
+            priority = late if overdue else min(waiting, key=lambda p: (self._pass[p], PRIORITIES.index(p)))
+            self._vtime = self._pass[priority]
+            self._pass[priority] += 1 / max(PRIORITY_WEIGHTS[priority], 1e-6)
+            job = self._lanes[priority].popleft()
+            job.protected = job.protected or overdue
+            PRIORITY_QUEUE_SECONDS.labels(priority).observe(now - job.t_queued)
+            self._active[priority] += 1
+            self._holding.append(job)
+            resumed, job.state = job.state == "paused", "running"
+            if resumed:
+                job.cancel.resume()
+            else:
+                self._start(job)
+        self._preempt(now)
+
+    def _preempt(self, now: float):
+        if len(self._holding) < INFER_WORKERS or any(j.state == "pausing" for j in self._holding):
+            return
+        for priority in self._waiting():
+            rank, owed = PRIORITIES.index(priority), self._overdue(priority, now) > 1
+            victims = [j for j in self._holding if j.rank > rank and j.cancel is not None and not j.protected
+                       and (owed or self._pass[priority] < self._pass[j.priority])]
+            if victims:
+                job = max(victims, key=lambda j: (j.rank, j.times["start"]))
+                job.state = "pausing"
+                PREEMPTIONS.labels(job.priority).inc()
+                job.cancel.pause()
+                return
+
+    def _start(self, job: _Job):
+        loop = asyncio.get_running_loop()
+        if job.cancel is not None:
+            job.cancel.on_paused = lambda: loop.call_soon_threadsafe(self._paused, job)
+        fut = self._submit(job.fn, job.args, job.kwargs, job.times)
+        fut.add_done_callback(lambda f: loop.call_soon_threadsafe(self._finished, job, f))
+
+    def _paused(self, job: _Job):
+        if job.state != "pausing":
+            return
+        job.state = "paused"
+        job.t_queued = time.time()
+        self._active[job.priority] -= 1
+        self._holding.remove(job)
+        self._lanes[job.priority].appendleft(job)
+        self._schedule()
+
+    def _finished(self, job: _Job, fut: Future):
+        if job.state == "paused":   # its worker process exited
+            self._lanes[job.priority].remove(job)
+        else:
+            self._active[job.priority] -= 1
+            self._holding.remove(job)
+        job.state = "done"
+        self._release(job.times)
+        PRIORITY_LATENCY_SECONDS.labels(job.priority).observe(time.time() - job.t_submit)
+        if not job.future.done():
+            if fut.cancelled():
+                job.future.cancel()
+            elif fut.exception() is not None:
+                job.future.set_exception(fut.exception())
+            else:
+                job.future.set_result(fut.result())
+        self._schedule()
+
+    def _submit(self, fn, args, kwargs, times: dict):
+        def job():
+            self._job_started(times, time.time())
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._job_ended(times, time.time())
+
+        return self._executor.submit(job)
+
+    # Called from the thread that observes the job (worker thread, or the reader of a worker process).
+    def _job_started(self, times: dict, t: float):
+        with self._jobs_lock:
+            times["start"] = self._started[id(times)] = t
+            self._running += 1
+
+    def _job_ended(self, times: dict, t: float):
+        with self._jobs_lock:
+            if self._started.pop(id(times), None) is None:
+                return
+            self._running -= 1
+            times["end"] = t
+
+    def _release(self, times: dict):
+        self._pending -= 1
+        if times["end"] > times["start"]:
+            self.busy_seconds += times["end"] - times["start"]
+            self._recent.append((times["start"], times["end"]))
+
+    # ── pool ──
+    @asynccontextmanager
+    async def acquire(self, key: str):
+        """Hold a reference to a resident model (``"tokenizer"`` for the speech tokenizer)."""
+        self.leases += 1
+        try:
+            entry = await self._checkout(key)
+        except BaseException:
+            self.leases -= 1
+            raise
+        try:
+            yield entry["model"]
+        finally:
+            self.leases -= 1
+            async with self._cond:
+                entry["refs"] -= 1
+                entry["last_use"] = self.last_use = time.time()
+                if entry["refs"] == 0 and entry["drop"]:
+                    self._evict(key)
+                    self._free_memory()
+                self._cond.notify_all()
+
+    async def _checkout(self, key: str):
+        async with self._cond:
+            while True:
+                entry = self.models.get(key)
+                if entry is not None:
+                    if entry["model"] is not None:
+                        self.models.move_to_end(key)
+                        entry["refs"] += 1
+                        entry["drop"] = False
+                        entry["last_use"] = self.last_use = time.time()
+                        return entry
+                    await self._cond.wait()   # another request is loading it
+                    continue
+                need_mb = 0.0 if key == "tokenizer" else self._estimate_mb(key)   # reserved in used_mb()
+                if self._make_room(key, need_mb):
+                    break
+                await self._cond.wait()
+            entry = {"model": None, "refs": 1, "size_mb": need_mb, "last_use": time.time(), "drop": False}
+            self.models[key] = entry
+        t0 = time.time()
+        try:
+            model = await asyncio.to_thread(self._load_model, key)
+        except BaseException:
+            async with self._cond:
+                self.models.pop(key, None)
+                self._cond.notify_all()
+            raise
+        STAGE_SECONDS.labels("model_load").observe(time.time() - t0)
+        MODEL_LOADS.labels(key).inc()
+        async with self._cond:
+            entry["model"] = model
+            entry["size_mb"] = self._resident_mb(model)
+            self.tokenizer_mb = self._tokenizer_mb(key, model) or self.tokenizer_mb
+            entry["last_use"] = self.last_use = time.time()
+            self._cond.notify_all()
+        return entry
+
+    def used_mb(self) -> float:
+        """Memory of the resident models plus a fixed reservation for the speech tokenizer.
+
+        Every model holds the shared tokenizer, which is not part of its own size, so it is
+        charged once here rather than per model (or per "tokenizer" entry).
+        """
+        if self.tokenizer_mb is None:
+            self.tokenizer_mb = self._estimate_mb("tokenizer")
+        return sum(e["size_mb"] for k, e in self.models.items() if k != "tokenizer") + self.tokenizer_mb
+
+    def _make_room(self, key: str, need_mb: float) -> bool:
+        """Evict idle models (LRU first) until ``need_mb`` fits; False if busy models are in the way.
+
+        Pinned models are never evicted; raises NoRoomError if ``key`` cannot fit next to them.
+        """
+        budget = self._budget_mb()
+        used = self.used_mb()
+        evicted = False
+        for k in list(self.models):
+            if used + need_mb <= budget:
+                break
+            entry = self.models[k]
+            if k == "tokenizer" or k in self.pinned:
+                continue   # the tokenizer is reserved in used_mb(), evicting it frees nothing
+            if entry["refs"] == 0 and entry["model"] is not None:
+                logger.info(f"Evicting model: {k} ({entry['size_mb']:.0f} MB)")
+                used -= entry["size_mb"]
+                self._evict(k)
+                evicted = True
+        if evicted:
+            self._free_memory()
+        if used + need_mb <= budget:
+            return True
+        if not self.models:
+            logger.warning(f"Model needs ~{need_mb:.0f} MB, over the {budget:.0f} MB budget; loading anyway")
+            return True
+        pinned_mb = sum(e["size_mb"] for k, e in self.models.items() if k in self.pinned and k != "tokenizer")
+        if pinned_mb + self.tokenizer_mb + need_mb > budget:
+            raise NoRoomError(key, need_mb, budget)
+        return False
+
+    def _evict(self, key: str):
+        entry = self.models.pop(key, None)
+        if entry is not None:
+            entry["model"] = None
+            MODEL_EVICTIONS.labels(key).inc()
+
+    def _free_memory(self):
+        gc.collect()
+        if torch.cuda.is_available() and self.device.startswith("cuda"):
+            with torch.cuda.device(torch.device(self.device)):
+                torch.cuda.empty_cache()
+
+    def _load_model(self, key: str):
+        from qwen_tts import Qwen3TTSModel, Qwen3TTSTokenizer
+        if key == "tokenizer":
+            logger.info(f"Loading tokenizer on {self.name}: {TOKENIZER_PATH}")
+            # Same loading args as the models' speech tokenizer, so all of them share one codec.
+            return Qwen3TTSTokenizer.from_pretrained_shared(
+                TOKENIZER_PATH, device_map=self.device, dtype=torch.bfloat16)
+        name = MODEL_MAP[key]
+        logger.info(f"Loading model on {self.name}: {name}")
+        model = Qwen3TTSModel.from_pretrained(
+            name, device_map=self.device, dtype=torch.bfloat16,
+            attn_implementation="flash_attention_2" if self.device.startswith("cuda") else "sdpa",
+        )
+        model.enable_prefix_cache(PREFIX_CACHE_TOKENS)
+        logger.info("Model loaded")
+        return model
+
+    def _budget_mb(self) -> float:
+        if GPU_MEMORY_BUDGET_MB > 0:
+            return GPU_MEMORY_BUDGET_MB
+        if torch.cuda.is_available() and self.device.startswith("cuda"):
+            return torch.cuda.get_device_properties(torch.device(self.device)).total_memory / 1048576 * 0.9
+        return float("inf")
+
+    def _estimate_mb(self, key: str) -> float:
+        """Size of the weight files on disk, or of the largest resident model if unknown."""
+        path = TOKENIZER_PATH if key == "tokenizer" else MODEL_MAP[key]
+        total = 0
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                if key != "tokenizer" and "speech_tokenizer" in dirs:
+                    dirs.remove("speech_tokenizer")   # shared, see _resident_mb
+                total += sum(os.path.getsize(os.path.join(root, f)) for f in files
+                             if f.endswith((".safetensors", ".bin", ".pt")))
+        if total:
+            return total / 1048576
+        if key == "tokenizer":
+            return 0.0   # measured once a model or the tokenizer is loaded
+        return max((e["size_mb"] for k, e in self.models.items() if k != "tokenizer"), default=0.0)
+
+    @staticmethod
+    def _resident_mb(obj) -> float:
+        # The speech tokenizer is shared between models and is not a submodule of
+        # obj.model, so it is only counted by the reservation in used_mb().
+        nbytes = sum(t.numel() * t.element_size() for t in list(obj.model.parameters()) + list(obj.model.buffers()))
+        return nbytes / 1048576
+
+    @classmethod
+    def _tokenizer_mb(cls, key: str, obj) -> float:
+        """Size of the speech tokenizer held by the loaded ``obj``."""
+        tokenizer = obj if key == "tokenizer" else obj.model.speech_tokenizer
+        return cls._resident_mb(tokenizer) if tokenizer is not None else 0.0
 
     async def _idle_loop(self):
         while True:
             await asyncio.sleep(30)
-            async with self._lock:
-                if self.model and time.time() - self.last_use > GPU_IDLE_TIMEOUT:
-                    logger.info("Auto-offloading model (idle timeout)")
-                    self._unload()
-
-    def _unload(self):
-        if self.model:
-            del self.model
-            self.model = None
-            self.model_type = None
-        if self.tokenizer:
-            del self.tokenizer
-            self.tokenizer = None
-        torch.cuda.empty_cache()
-
-    async def load(self, model_type: str):
-        async with self._lock:
-            self.last_use = time.time()
-            if self.model and self.model_type == model_type:
-                return self.model
-            self._unload()
-            name = MODEL_MAP[model_type]
-            logger.info(f"Loading model: {name}")
-            from qwen_tts import Qwen3TTSModel
-            self.model = Qwen3TTSModel.from_pretrained(
-                name, device_map=CUDA_DEVICE,
-                dtype=torch.bfloat16, attn_implementation="flash_attention_2",
-            )
-            self.model_type = model_type
-            logger.info("Model loaded")
-            return self.model
-
-    async def load_tokenizer(self):
-        async with self._lock:
-            self.last_use = time.time()
-            if self.tokenizer:
-                return self.tokenizer
-            from qwen_tts import Qwen3TTSTokenizer
-            logger.info(f"Loading tokenizer: {TOKENIZER_PATH}")
-            self.tokenizer = Qwen3TTSTokenizer.from_pretrained(TOKENIZER_PATH, device_map=CUDA_DEVICE)
-            return self.tokenizer
+            async with self._cond:
+                now = time.time()
+                idle = [k for k, e in self.models.items()
+                        if e["refs"] == 0 and e["model"] is not None and k not in self.pinned
+                        and now - e["last_use"] > GPU_IDLE_TIMEOUT]
+                for key in idle:
+                    logger.info(f"Auto-offloading {key} (idle timeout)")
+                    self._evict(key)
+                if idle:
+                    self._free_memory()
+                    self._cond.notify_all()
 
     async def offload(self):
-        async with self._lock:
-            self._unload()
+        """Free every idle model, pinned ones too; busy ones are dropped when their last request finishes."""
+        async with self._cond:
+            self.pinned.clear()
+            for key, entry in list(self.models.items()):
+                if entry["refs"] == 0 and entry["model"] is not None:
+                    self._evict(key)
+                else:
+                    entry["drop"] = True
+            self._free_memory()
+            self._cond.notify_all()
+
+    def device_stats(self) -> dict:
+        return _device_stats(self.device)
 
     async def status(self):
-        gpu_info = {}
+        gpu_info = self.device_stats()
+        now = time.time()
+        budget = self._budget_mb()
+        return {
+            "device": self.name,
+            "loaded": any(e["model"] is not None for e in self.models.values()),
+            "model_type": self.model_type,
+            "model_name": MODEL_MAP.get(self.model_type, ""),
+            "idle_seconds": round(now - self.last_use, 1) if self.last_use else None,
+            "models": [{"model_type": k, "size_mb": round(e["size_mb"]), "refs": e["refs"],
+                        "loading": e["model"] is None, "pinned": k in self.pinned,
+                        "idle_seconds": round(now - e["last_use"], 1)}
+                       for k, e in self.models.items()],
+            "memory_budget_mb": round(budget) if budget != float("inf") else None,
+            "infer_workers": INFER_WORKERS,
+            "infer_running": self._running,
+            "infer_queued": max(self._pending - self._running, 0),
+            "infer_queue_size": INFER_QUEUE_SIZE,
+            "priorities": {p: {"running": self._active[p],
+                               "queued": sum(j.state == "queued" for j in self._lanes[p]),
+                               "paused": sum(j.state == "paused" for j in self._lanes[p])} for p in PRIORITIES},
+            "utilization": round(self.utilization(), 3),
+            **gpu_info,
+        }
+
+
+def _device_stats(device: str) -> dict:
+    """Name, memory and (with pynvml) utilization of a CUDA device as seen by this process."""
+    stats = {}
+    try:
+        if torch.cuda.is_available() and device.startswith("cuda"):
+            idx = torch.device(device).index or 0
+            stats = {
+                "gpu_name": torch.cuda.get_device_name(idx),
+                "memory_allocated_mb": round(torch.cuda.memory_allocated(idx) / 1048576),
+                "memory_reserved_mb": round(torch.cuda.memory_reserved(idx) / 1048576),
+                "memory_total_mb": round(torch.cuda.get_device_properties(idx).total_memory / 1048576),
+            }
+            stats["gpu_utilization"] = torch.cuda.utilization(idx)   # needs pynvml
+    except Exception:
+        pass
+    return stats
+
+
+def _parse_cores(spec: str) -> set:
+    """``"0-15,32-47"`` style core list (as in taskset / numactl) -> set of core ids."""
+    cores = set()
+    for part in spec.replace("+", ",").split(","):
+        lo, _, hi = part.partition("-")
+        cores.update(range(int(lo), int(hi or lo) + 1))
+    return cores
+
+
+# ── Worker processes ──
+# With WORKER_PROCESSES set, models live in spawned worker processes and the API process only
+# does HTTP, routing and audio encoding, so the generate loops do not compete with it for the
+# GIL. Messages are pickled over a pipe; large numpy arrays (waveforms, reference audio) are
+# written to shared memory and only their name crosses the pipe.
+SHM_MIN_BYTES = 64 * 1024
+
+
+def _shm_array(name: str, shape: tuple, dtype: str) -> np.ndarray:
+    """Unpickle an array sent by ``_Pickler``: copy it out and free the segment."""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return np.ndarray(shape, dtype, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+class _Pickler(pickle.Pickler):
+    """Pickles large numpy arrays as shared memory segments and device tensors as CPU tensors."""
+
+    def reducer_override(self, obj):
+        if isinstance(obj, np.ndarray) and obj.nbytes >= SHM_MIN_BYTES and not obj.dtype.hasobject:
+            shm = shared_memory.SharedMemory(create=True, size=obj.nbytes)
+            np.ndarray(obj.shape, obj.dtype, buffer=shm.buf)[...] = obj
+            shm.close()
+            return _shm_array, (shm.name, obj.shape, obj.dtype.str)
+        if isinstance(obj, torch.Tensor) and obj.device.type != "cpu":
+            return obj.cpu().__reduce_ex__(pickle.HIGHEST_PROTOCOL)
+        return NotImplemented
+
+
+def _dumps(obj) -> bytes:
+    buf = io.BytesIO()
+    _Pickler(buf, pickle.HIGHEST_PROTOCOL).dump(obj)
+    return buf.getvalue()
+
+
+class _RemoteModel:
+    """Stands in for a model loaded in a worker process, in the arguments of ``run``.
+
+    Attributes resolve to ``_RemoteMethod``, so ``dev.run(model.create_voice_clone_prompt, ...)``
+    works the same with and without worker processes.
+    """
+
+    def __init__(self, key: str, size_mb: float, tokenizer_mb: float = 0.0):
+        self.key = key
+        self.size_mb = size_mb
+        self.tokenizer_mb = tokenizer_mb
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return _RemoteMethod(self.key, name)
+
+
+class _RemoteMethod:
+    def __init__(self, key: str, name: str):
+        self.key = key
+        self.name = name
+
+
+def _resolve(obj, models: dict):
+    if isinstance(obj, _RemoteModel):
+        return models[obj.key]
+    if isinstance(obj, _RemoteMethod):
+        return getattr(models[obj.key], obj.name)
+    return obj
+
+
+def _portable(exc: Exception) -> Exception:
+    """``exc`` if it survives a pickle round trip, else a RuntimeError carrying its message."""
+    try:
+        pickle.loads(pickle.dumps(exc))
+        return exc
+    except Exception:
+        return RuntimeError(f"{type(exc).__name__}: {exc}")
+
+
+def _worker_main(conn, spec: str):
+    """Entry point of a worker process: loads models on one device and runs the calls sent to it.
+
+    Requests are ``(op, job_id, *payload)``, where ``"cancel"``, ``"pause"`` and ``"resume"``
+    act on the Cancellation of a call; replies are ``("start" | "emit" | "paused" | "done" |
+    "error", job_id, ...)``, plus ``"stage"`` timings and ``"stats"`` device snapshots.
+    """
+    dev = GPUManager(spec)
+    models = {}
+    cancels = {}   # job id -> Cancellation of a queued or running call
+    lock = threading.Lock()
+
+    def send(msg):
+        data = _dumps(msg)
+        with lock:
+            conn.send_bytes(data)
+
+    def reply(job_id, fn):
         try:
-            if torch.cuda.is_available():
-                idx = int(CUDA_DEVICE.split(":")[-1]) if ":" in CUDA_DEVICE else 0
-                gpu_info = {
-                    "gpu_name": torch.cuda.get_device_name(idx),
-                    "memory_allocated_mb": round(torch.cuda.memory_allocated(idx) / 1048576),
-                    "memory_reserved_mb": round(torch.cuda.memory_reserved(idx) / 1048576),
-                }
-        except Exception:
+            data = _dumps(("done", job_id, fn(), time.time(), _device_stats(dev.device)))
+        except Exception as e:
+            data = _dumps(("error", job_id, _portable(e), time.time(), _device_stats(dev.device)))
+        with lock:
+            conn.send_bytes(data)
+
+    def load(job_id, key):
+        def fn():
+            models[key] = dev._load_model(key)
+            return dev._resident_mb(models[key]), dev._tokenizer_mb(key, models[key])
+        reply(job_id, fn)
+
+    def call(job_id, fn, args, kwargs, stream, cancel):
+        send(("start", job_id, time.time()))
+
+        def run():
+            kw = {k: _resolve(v, models) for k, v in kwargs.items()}
+            if stream:
+                kw["emit"] = lambda item: send(("emit", job_id, item))
+            if cancel is not None:
+                kw["cancel"] = cancel
+            return _resolve(fn, models)(*(_resolve(a, models) for a in args), **kw)
+        try:
+            reply(job_id, run)
+        finally:
+            cancels.pop(job_id, None)
+
+    if STAGE_METRICS:
+        from qwen_tts import add_stage_observer
+        add_stage_observer(lambda name, seconds, info: send(("stage", None, name, seconds, info)))
+    infer = ThreadPoolExecutor(max_workers=2 * INFER_WORKERS, thread_name_prefix="infer", initializer=dev._bind_worker)
+    loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="load", initializer=dev._bind_worker)
+    send(("stats", None, _device_stats(dev.device)))
+    while True:
+        try:
+            op, job_id, *payload = pickle.loads(conn.recv_bytes())
+        except EOFError:
+            break   # the API process is gone
+        if op == "call":
+            fn, args, kwargs, stream, flags = payload
+            cancel = None
+            if flags is not None:
+                # Registered here rather than on the infer thread, so a cancel sent while the call is queued is kept.
+                cancel = cancels[job_id] = Cancellation(len(flags))
+                cancel.flags = list(flags)
+                cancel.on_paused = functools.partial(send, ("paused", job_id))
+            infer.submit(call, job_id, fn, args, kwargs, stream, cancel)
+        elif op in ("cancel", "pause", "resume"):
+            cancel = cancels.get(job_id)
+            if cancel is not None:
+                getattr(cancel, op)(*payload)
+        elif op == "load":
+            loader.submit(load, job_id, *payload)
+        elif op == "unload":
+            models.pop(payload[0], None)
+        elif op == "free":
+            loader.submit(dev._free_memory)
+        elif op == "stop":
+            break
+    os._exit(0)
+
+
+class ProcessWorker(GPUManager):
+    """A GPUManager whose models live in a spawned worker process.
+
+    The pool bookkeeping (references, memory budget, LRU and idle eviction) stays in the
+    API process; loads, unloads and calls are forwarded to the worker, which runs them on
+    its own INFER_WORKERS threads. When the worker dies, its in-flight calls fail, its
+    models are forgotten and a new worker is started, which reloads the pinned models.
+    The device is skipped by the router until then.
+    """
+
+    def __init__(self, spec: str, name: Optional[str] = None):
+        super().__init__(spec, name)
+        self.restarts = 0
+        self._proc = self._conn = self._loop = None
+        self._jobs = {}   # job id -> (future, times, emit, cancel)
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._spawned_at = 0.0
+        self._stopping = False
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._spawn()
+        self._task = asyncio.create_task(self._idle_loop())
+
+    async def stop(self):
+        self._stopping = True
+        if self._task:
+            self._task.cancel()
+        if self._conn is not None:
+            try:
+                self._send(("stop", None))
+            except OSError:
+                pass
+        if self._proc is not None:
+            await asyncio.to_thread(self._proc.join, 10)
+            if self._proc.is_alive():
+                self._proc.kill()
+
+    def _spawn(self):
+        ctx = mp.get_context("spawn")   # CUDA cannot be used in forked children
+        conn, child = ctx.Pipe()
+        proc = ctx.Process(target=_worker_main, args=(child, self.spec), name=f"infer-{self.name}", daemon=True)
+        proc.start()
+        child.close()
+        self._proc, self._conn, self._spawned_at = proc, conn, time.time()
+        threading.Thread(target=self._read_loop, args=(proc, conn), name=f"reader-{self.name}", daemon=True).start()
+        logger.info(f"Started inference worker {self.name} (pid {proc.pid})")
+
+    @property
+    def full(self) -> bool:
+        return self._conn is None or super().full
+
+    def _send(self, msg):
+        data = _dumps(msg)
+        with self._lock:
+            self._conn.send_bytes(data)
+
+    def _request(self, op: str, *payload, times: Optional[dict] = None, emit=None, cancel=None, job_id=None) -> Future:
+        fut = Future()
+        job_id = next(self._ids) if job_id is None else job_id
+        data = _dumps((op, job_id, *payload))
+        with self._lock:
+            if self._conn is None:
+                fut.set_exception(RuntimeError(f"Inference worker {self.name} is restarting"))
+                return fut
+            self._jobs[job_id] = (fut, times, emit, cancel)
+            try:
+                self._conn.send_bytes(data)
+            except OSError as e:
+                del self._jobs[job_id]
+                fut.set_exception(e)
+        return fut
+
+    def _submit(self, fn, args, kwargs, times: dict):
+        emit = kwargs.pop("emit", None)
+        cancel = kwargs.pop("cancel", None)
+        job_id = next(self._ids)
+        if cancel is not None:
+            # Both run on the event loop, so no change falls between the snapshot and the forwarding.
+            cancel.forward = functools.partial(self._forward, job_id)
+        return self._request("call", fn, args, kwargs, emit is not None, cancel.flags if cancel is not None else None,
+                             times=times, emit=emit, cancel=cancel, job_id=job_id)
+
+    def _forward(self, job_id: int, op: str, *args):
+        """Relay a cancel, pause or resume of a running call to the worker."""
+        data = _dumps((op, job_id, *args))
+        with self._lock:
+            if self._conn is None or job_id not in self._jobs:
+                return
+            try:
+                self._conn.send_bytes(data)
+            except OSError:
+                pass   # the worker is gone; its jobs fail with it
+
+    def _read_loop(self, proc, conn):
+        while conn in wait_connections([conn, proc.sentinel]):
+            try:
+                msg = pickle.loads(conn.recv_bytes())
+            except (EOFError, OSError):
+                break
+            self._dispatch(msg)
+        conn.close()
+        proc.join(5)
+        if proc.is_alive():   # closed its end of the pipe but hangs: replace it all the same
+            proc.kill()
+            proc.join()
+        try:
+            self._loop.call_soon_threadsafe(self._worker_exited, proc)
+        except RuntimeError:
+            pass   # event loop already closed
+
+    def _dispatch(self, msg):
+        op, job_id, *payload = msg
+        if op == "stage":
+            _observe_stage(*payload)
+            return
+        if op == "stats":
+            self._stats = payload[0]
+            return
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        fut, times, emit, cancel = job
+        if op == "start":
+            self._job_started(times, payload[0])
+        elif op == "emit":
+            emit(payload[0])
+        elif op == "paused":
+            cancel.on_paused()
+        else:
+            del self._jobs[job_id]
+            value, t_end, self._stats = payload
+            if times is not None:
+                self._job_ended(times, t_end)
+            if op == "done":
+                fut.set_result(value)
+            else:
+                fut.set_exception(value)
+
+    def _worker_exited(self, proc):
+        with self._lock:
+            self._conn = None
+            jobs, self._jobs = self._jobs, {}
+        exc = RuntimeError(f"Inference worker {self.name} exited with code {proc.exitcode}")
+        for fut, times, *_ in jobs.values():
+            if times is not None:
+                self._job_ended(times, time.time())
+            fut.set_exception(exc)
+        if self._stopping:
+            return
+        logger.error(f"{exc}; restarting it")
+        self.restarts += 1
+        WORKER_RESTARTS.labels(self.name).inc()
+        asyncio.ensure_future(self._restart())
+
+    async def _restart(self):
+        async with self._cond:
+            for key, entry in list(self.models.items()):
+                if entry["model"] is not None:   # loading entries are removed by their failed _checkout
+                    del self.models[key]
+                    entry["drop"] = False
+            self._cond.notify_all()
+        if time.time() - self._spawned_at < 30:
+            await asyncio.sleep(5)   # crashing right after start: do not spin
+        if self._stopping:
+            return
+        self._spawn()
+        for key in list(self.pinned):
+            try:
+                await _preload_on(self, key)
+            except Exception:
+                logger.exception(f"Reloading {key} in worker {self.name} failed")
+
+    def _load_model(self, key: str):
+        logger.info(f"Loading {key} in worker {self.name}")
+        return _RemoteModel(key, *self._request("load", key).result())
+
+    @staticmethod
+    def _resident_mb(obj) -> float:
+        return obj.size_mb
+
+    @classmethod
+    def _tokenizer_mb(cls, key: str, obj) -> float:
+        return obj.tokenizer_mb
+
+    def _evict(self, key: str):
+        super()._evict(key)
+        try:
+            self._send(("unload", None, key))
+        except (AttributeError, OSError):
+            pass   # no worker: nothing to unload
+
+    def _free_memory(self):
+        try:
+            self._send(("free", None))
+        except (AttributeError, OSError):
             pass
+
+    def _budget_mb(self) -> float:
+        if GPU_MEMORY_BUDGET_MB > 0:
+            return GPU_MEMORY_BUDGET_MB
+        total = self._stats.get("memory_total_mb")
+        return total * 0.9 / WORKER_PROCESSES if total else float("inf")
+
+    def device_stats(self) -> dict:
+        return dict(self._stats)
+
+    async def status(self):
+        return {**await super().status(), "pid": self._proc.pid if self._proc else None, "restarts": self.restarts}
+
+
+class DevicePool:
+    """Routes requests across the per-device GPUManagers.
+
+    A request goes to the least loaded device that already holds (or is loading) its
+    model. When every such device is busy and another device is idle, the model is
+    replicated there instead; when no device holds it, it is loaded on the least loaded
+    device with the most free memory. Devices with a full queue are skipped.
+    """
+
+    def __init__(self, specs: List[str], processes: int = 0):
+        if len(set(specs)) != len(specs):
+            raise ValueError(f"Duplicate entries in DEVICES: {','.join(specs)}")
+        if processes:
+            self.managers = [ProcessWorker(spec, spec if processes == 1 else f"{spec}/{i}")
+                             for spec in specs for i in range(processes)]
+        else:
+            self.managers = [GPUManager(spec) for spec in specs]
+
+    async def start(self):
+        for dev in self.managers:
+            await dev.start()
+        if STAGE_METRICS:
+            from qwen_tts import add_stage_observer
+            add_stage_observer(_observe_stage)
+
+    async def stop(self):
+        if STAGE_METRICS:
+            from qwen_tts import remove_stage_observer
+            remove_stage_observer(_observe_stage)
+        for dev in self.managers:
+            await dev.stop()
+
+    @property
+    def model_type(self):
+        dev = max(self.managers, key=lambda d: d.last_use)
+        return dev.model_type
+
+    def check_queue(self):
+        if all(dev.full for dev in self.managers):
+            raise QueueFullError()
+
+    def route(self, key: str) -> GPUManager:
+        candidates = [dev for dev in self.managers if not dev.full]
+        if not candidates:
+            raise QueueFullError()
+        holders = [dev for dev in candidates if key in dev.models]
+        if holders:
+            best = min(holders, key=lambda d: d.leases)
+            if best.leases < INFER_WORKERS:
+                return best
+            idle = [dev for dev in candidates if dev.leases == 0 and key not in dev.models]
+            if not idle:
+                return best
+            candidates = idle
+        return min(candidates, key=lambda d: (d.leases, d.used_mb() - d._budget_mb()))
+
+    @asynccontextmanager
+    async def acquire(self, key: str):
+        """Route ``key`` to a device and hold a reference there; yields ``(device, model)``.
+
+        Run the inference call with ``device.run`` so it lands on that device's workers.
+        """
+        dev = self.route(key)
+        async with dev.acquire(key) as model:
+            yield dev, model
+
+    def resident(self) -> dict:
+        """Model types resident on each device."""
+        return {dev.name: [k for k, e in dev.models.items() if e["model"] is not None] for dev in self.managers}
+
+    async def offload(self):
+        for dev in self.managers:
+            await dev.offload()
+
+    async def status(self):
+        devices = [await dev.status() for dev in self.managers]
+        if len(devices) == 1:
+            return {**devices[0], "devices": devices}
+        last = max(self.managers, key=lambda d: d.last_use)
         return {
-            "loaded": self.model is not None,
+            "loaded": any(d["loaded"] for d in devices),
             "model_type": self.model_type,
             "model_name": MODEL_MAP.get(self.model_type, ""),
-            "idle_seconds": round(time.time() - self.last_use, 1) if self.last_use else None,
-            **gpu_info,
+            "idle_seconds": round(time.time() - last.last_use, 1) if last.last_use else None,
+            "gpu_name": ", ".join(dict.fromkeys(d["gpu_name"] for d in devices if "gpu_name" in d)),
+            "memory_allocated_mb": sum(d.get("memory_allocated_mb", 0) for d in devices),
+            "memory_reserved_mb": sum(d.get("memory_reserved_mb", 0) for d in devices),
+            "infer_running": sum(d["infer_running"] for d in devices),
+            "infer_queued": sum(d["infer_queued"] for d in devices),
+            "devices": devices,
         }
 
 
-gpu = GPUManager()
+# Thread-local state of the inference workers: ``device`` they run on.
+_worker = threading.local()
+
+devices = DevicePool(DEVICES, WORKER_PROCESSES)
+
+
+def _prompt_len(item: dict) -> int:
+    return len(item["text"]) + len(item.get("instruct") or "") + len(item.get("ref_text") or "")
+
+
+def _seed(seed: int):
+    """Seed the RNG of the calling worker's device.
+
+    Reproducible as long as INFER_WORKERS is 1 (seeded calls are never batched). Only the
+    worker's own CUDA generator is reset, so seeded jobs on other devices keep their draws.
+    """
+    if getattr(_worker, "device", "cpu").startswith("cuda"):
+        torch.cuda.manual_seed(seed)   # current device, see GPUManager._bind_worker
+    else:
+        torch.manual_seed(seed)
+
+
+def _generate_batch(model, model_type: str, items: List[dict], gen: dict, cancel: Optional[Cancellation] = None):
+    """Run one batched generate call for a list of request items (``cancel`` has one row per item)."""
+    gen = dict(gen, cancel=cancel)
+    seed = gen.pop("seed", None)
+    if seed is not None:
+        _seed(seed)
+    if gen.pop("long_form", False):
+        # Long-form items run alone; the chunks of the text are batched inside generate_long.
+        wav, sr = model.generate_long(**_item_kwargs(model, model_type, items[0]), **LONG_FORM_ARGS, **gen)
+        return [wav], sr
+    texts = [it["text"] for it in items]
+    languages = [it["language"] for it in items]
+    if model_type == "custom_voice":
+        return model.generate_custom_voice(
+            text=texts, language=languages, speaker=[it["speaker"] for it in items],
+            instruct=[it.get("instruct") or "" for it in items], **gen)
+    if model_type == "voice_design":
+        return model.generate_voice_design(
+            text=texts, language=languages, instruct=[it.get("instruct") or "" for it in items], **gen)
+    prompts = _voice_clone_prompts(model, items)
+    return model.generate_voice_clone(text=texts, language=languages, voice_clone_prompt=prompts, **gen)
+
+
+def _item_kwargs(model, model_type: str, item: dict) -> dict:
+    """Arguments of the single-text methods (``stream_*``, ``generate_long``) for one item."""
+    if model_type == "voice_clone":
+        return dict(text=item["text"], language=item["language"],
+                    voice_clone_prompt=_voice_clone_prompts(model, [item]))
+    return item
+
+
+def _long_form(item: dict, gen: dict) -> dict:
+    """Resolve ``long_form=None`` (automatic) from the text length."""
+    long_form = gen.get("long_form")
+    if long_form is None:
+        long_form = 0 < LONG_FORM_CHARS <= len(item["text"])
+    return {**gen, "long_form": bool(long_form)}
+
+
+def _voice_clone_prompts(model, items: List[dict]):
+    """Build the missing voice clone prompts in one batch and store them back into ``items``."""
+    prompts = [it.get("voice_clone_prompt") for it in items]
+    todo = [i for i, p in enumerate(prompts) if p is None]
+    if todo:
+        created = model.create_voice_clone_prompt(
+            ref_audio=[items[i]["ref_audio"] for i in todo],
+            ref_text=[items[i].get("ref_text") or None for i in todo],
+            x_vector_only_mode=[bool(items[i].get("x_vector_only_mode")) for i in todo])
+        for i, p in zip(todo, created):
+            prompts[i] = items[i]["voice_clone_prompt"] = p
+    return prompts
+
+
+class MicroBatcher:
+    """Collects compatible TTS requests and runs them as one batched generate call.
+
+    Requests are compatible when they target the same model type in the same priority
+    class with identical generation kwargs (sampling parameters are shared across a batch). A bucket is
+    flushed after BATCH_WINDOW_MS or once it holds BATCH_MAX_SIZE items, then split
+    into groups of similar prompt length so short utterances do not wait for long ones.
+    """
+
+    def __init__(self, pool: DevicePool):
+        self.devices = pool
+        self._buckets = {}
+        self._timers = {}
+
+    async def submit(self, model_type: str, item: dict, gen: dict):
+        """Queue one item; returns ``(wav, sr, t_load, t_queue, t_gen)``."""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        if gen.get("seed") is not None or gen.get("long_form") or _profile_request.get() is not None:
+            # A seeded result must not depend on which requests share its RNG draws, a long text
+            # is batched by chunks already, and a profile must only cover its own request: run
+            # these alone.
+            asyncio.create_task(self._run(model_type, [(item, fut, time.time())], gen, _priority.get()))
+            return await _unless_client_gone(fut)
+        key = (model_type, _priority.get(), tuple(sorted(gen.items())))
+        bucket = self._buckets.setdefault(key, [])
+        bucket.append((item, fut, time.time()))
+        if len(bucket) >= BATCH_MAX_SIZE:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(BATCH_WINDOW_MS / 1000, self._flush, key)
+        return await _unless_client_gone(fut)
+
+    def _flush(self, key):
+        timer = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        bucket = self._buckets.pop(key, [])
+        if not bucket:
+            return
+        bucket.sort(key=lambda e: _prompt_len(e[0]))
+        groups, group = [], []
+        for entry in bucket:
+            if group:
+                first = _prompt_len(group[0][0])
+                if _prompt_len(entry[0]) > max(first * BATCH_LENGTH_RATIO, first + 32):
+                    groups.append(group)
+                    group = []
+            group.append(entry)
+        groups.append(group)
+        for group in groups:
+            asyncio.create_task(self._run(key[0], group, dict(key[2]), key[1]))
+
+    async def _run(self, model_type: str, group: list, gen: dict, priority: str):
+        _priority.set(priority)   # this task's own context; a flush runs in the first submitter's
+        # A request whose client left is cancelled: dropped here if it has not started, otherwise
+        # its row stops generating while the rest of the batch carries on.
+        group = [e for e in group if not e[1].cancelled()]
+        if not group:
+            return
+        cancel = Cancellation(len(group))
+        for row, (_, fut, _) in enumerate(group):
+            fut.add_done_callback(lambda f, row=row: f.cancelled() and cancel.cancel(row))
+        try:
+            self.devices.check_queue()
+            t0 = time.time()
+            async with self.devices.acquire(model_type) as (dev, model):
+                t_load = time.time() - t0
+                if cancel.all:
+                    return
+                (wavs, sr), _, t_gen = await dev.run(
+                    _generate_batch, model, model_type, [e[0] for e in group], gen, cancel=cancel)
+        except ValueError as e:
+            if len(group) > 1:
+                # One bad item must not fail its neighbours: retry individually.
+                for entry in group:
+                    asyncio.create_task(self._run(model_type, [entry], gen, priority))
+                return
+            self._fail(group, e)
+            return
+        except Exception as e:
+            self._fail(group, e)
+            return
+        t_end = time.time()
+        BATCH_SIZE.labels(model_type).observe(len(group))
+        _observe_generation(model_type, sum(len(w) for w in wavs) / sr, t_gen)
+        costs.observe(model_type, [e[0] for e in group], [len(w) / sr * CODEC_FRAME_RATE for w in wavs], t_gen)
+        if len(group) > 1:
+            logger.debug(f"Batched {len(group)} {model_type} requests in {t_gen:.3f}s")
+        for (_, fut, t_submit), wav in zip(group, wavs):
+            if not fut.done():
+                t_queue = max(t_end - t_gen - t_submit - t_load, 0.0)
+                fut.set_result((wav, sr, t_load, t_queue, t_gen))
+
+    @staticmethod
+    def _fail(group: list, exc: Exception):
+        for _, fut, _ in group:
+            if not fut.done():
+                fut.set_exception(exc)
+
+
+def _engine_step(model, model_type: str, new: List[tuple], cancelled: List[int], reset: bool = False,
+                 cancel: Optional[Cancellation] = None):
+    """Advance the continuous batch of ``model`` by up to ENGINE_STEP_FRAMES frames.
+
+    ``new`` are ``(item, gen)`` pairs to add first and ``cancelled`` the sequence ids to stop;
+    ``reset`` drops whatever a failed call left in the engine. Returns ``(added, finished, sr)``:
+    the sequence id of each new item (or the ValueError that rejected it) and ``(seq_id, wav)``
+    of the sequences that finished, cancelled ones with an empty wav.
+    """
+    engine = model.get_engine(ENGINE_MAX_BATCH, ENGINE_KV_TOKENS, ENGINE_BLOCK_SIZE)
+    if reset:
+        engine.clear()
+    for seq_id in cancelled:
+        engine.cancel(seq_id)
+    added = []
+    for item, gen in new:
+        try:
+            added.extend(model.add_requests(engine, **_item_kwargs(model, model_type, item), **gen))
+        except ValueError as e:
+            added.append(e)
+    finished = []
+    for _ in range(ENGINE_STEP_FRAMES):
+        if cancel is not None:
+            cancel()   # blocks while the call is paused for higher-priority work
+        finished += engine.step()
+        if not engine.num_running and not engine.num_waiting:
+            break
+    wavs, sr = model.decode_sequences(finished) if finished else ([], 0)
+    return added, [(seq.seq_id, wav) for seq, wav in zip(finished, wavs)], sr
+
+
+class _EngineRequest:
+    """A request of the ContinuousBatcher, from submission until its sequence finishes."""
+
+    def __init__(self, item: dict, gen: dict, future: asyncio.Future):
+        self.item, self.gen, self.future = item, gen, future
+        self.priority = _priority.get()
+        self.rank = PRIORITIES.index(self.priority)
+        self.t_submit = time.time()
+        self.t_load = 0.0
+        self.t_gen = 0.0     # inference time of the calls it took part in
+        self.t_share = 0.0   # its share of that time, per running sequence
+
+
+class ContinuousBatcher:
+    """Runs TTS requests through the continuous-batching engine of their model (CONTINUOUS_BATCHING).
+
+    Requests queue per model type. A driver task holds the model on one device and calls
+    ``_engine_step`` until the queue and its batch are empty: each call adds the queued requests
+    that fit, passes on the cancels of requests whose client left and hands back the ones that
+    finished. Sampling parameters are per sequence, so any requests of a model type share a batch.
+    A call runs in the class of the most urgent request in the batch and can be paused like any
+    other generation. Once every driver of a model type has a full batch another one is started,
+    on another device. Seeded, long-form and profiled requests are passed to ``fallback``.
+    """
+
+    def __init__(self, pool: DevicePool, fallback: MicroBatcher):
+        self.devices = pool
+        self.fallback = fallback
+        self._pending = {}   # model type -> deque of _EngineRequest
+        self._drivers = {}   # model type -> [{"device": name or None while starting, "load": requests}]
+
+    async def submit(self, model_type: str, item: dict, gen: dict):
+        """Queue one item; returns ``(wav, sr, t_load, t_queue, t_gen)``."""
+        if gen.get("seed") is not None or gen.get("long_form") or _profile_request.get() is not None:
+            return await self.fallback.submit(model_type, item, gen)
+        gen = {k: v for k, v in gen.items() if k not in ("seed", "long_form")}
+        req = _EngineRequest(item, gen, asyncio.get_running_loop().create_future())
+        self._pending.setdefault(model_type, deque()).append(req)
+        drivers = self._drivers.setdefault(model_type, [])
+        if not drivers or (len(drivers) < len(self.devices.managers)
+                           and all(d["device"] is not None and d["load"] >= ENGINE_MAX_BATCH for d in drivers)):
+            driver = {"device": None, "load": 0}
+            drivers.append(driver)
+            asyncio.create_task(self._drive(model_type, driver))
+        return await _unless_client_gone(req.future)
+
+    async def _drive(self, model_type: str, driver: dict):
+        drivers, pending = self._drivers[model_type], self._pending[model_type]
+        running = {}   # sequence id -> _EngineRequest
+        try:
+            self.devices.check_queue()
+            t0 = time.time()
+            async with self.devices.acquire(model_type) as (dev, model):
+                if any(d["device"] == dev.name for d in drivers):
+                    return   # routed to a device that already has a driver; it takes the queue
+                driver["device"] = dev.name
+                t_load = time.time() - t0
+                reset = True   # the engine is empty unless a driver before this one failed
+                while True:
+                    new = []
+                    while pending and len(running) + len(new) < ENGINE_MAX_BATCH:
+                        req = pending.popleft()
+                        if not req.future.cancelled():
+                            req.t_load = t_load
+                            new.append(req)
+                    driver["load"] = len(running) + len(new)
+                    if not running and not new:
+                        drivers.remove(driver)   # before any await, so a new request starts a new driver
+                        break
+                    _priority.set(min((*running.values(), *new), key=lambda r: r.rank).priority)
+                    cancelled = [seq_id for seq_id, req in running.items() if req.future.cancelled()]
+                    try:
+                        (added, finished, sr), _, t_gen = await dev.run(
+                            _engine_step, model, model_type, [(r.item, r.gen) for r in new], cancelled, reset,
+                            cancel=Cancellation())
+                    except QueueFullError as e:
+                        self._fail(new, e)   # the batch carries on once the device has room again
+                        await asyncio.sleep(BATCH_WINDOW_MS / 1000)
+                        continue
+                    except Exception as e:
+                        self._fail([*running.values(), *new], e)
+                        running.clear()
+                        reset = True
+                        continue
+                    reset, t_load = False, 0.0
+                    for req, seq_id in zip(new, added):
+                        if isinstance(seq_id, ValueError):
+                            self._fail([req], seq_id)
+                        else:
+                            running[seq_id] = req
+                    BATCH_SIZE.labels(model_type).observe(len(running))
+                    for req in running.values():
+                        req.t_gen += t_gen
+                        req.t_share += t_gen / len(running)
+                    self._finish(model_type, [(running.pop(seq_id), wav) for seq_id, wav in finished], sr)
+        except Exception as e:
+            self._fail(list(running.values()), e)
+            if not any(d is not driver for d in drivers):   # nobody else will serve the queue
+                self._fail(list(pending), e)
+                pending.clear()
+        finally:
+            if driver in drivers:
+                drivers.remove(driver)
+
+    @staticmethod
+    def _finish(model_type: str, done: list, sr: int):
+        if not done:
+            return
+        t_end = time.time()
+        t_gen = sum(req.t_share for req, _ in done)
+        _observe_generation(model_type, sum(len(w) for _, w in done) / sr, t_gen)
+        costs.observe(model_type, [req.item for req, _ in done], [len(w) / sr * CODEC_FRAME_RATE for _, w in done], t_gen)
+        for req, wav in done:
+            if not req.future.done():
+                t_queue = max(t_end - req.t_submit - req.t_load - req.t_gen, 0.0)
+                req.future.set_result((wav, sr, req.t_load, t_queue, req.t_gen))
+
+    @staticmethod
+    def _fail(reqs: List[_EngineRequest], exc: Exception):
+        for req in reqs:
+            if not req.future.done():
+                req.future.set_exception(exc)
+
+
+batcher = ContinuousBatcher(devices, MicroBatcher(devices)) if CONTINUOUS_BATCHING else MicroBatcher(devices)
+
+
+def _load_voice_prompts(src) -> list:
+    """Read a voice prompt file (as written by /api/voice-prompt/save) into prompt items."""
+    from qwen_tts import VoiceClonePromptItem
+    payload = torch.load(src, map_location="cpu", weights_only=True)
+    items = []
+    for d in payload["items"]:
+        ref_code = d.get("ref_code")
+        if ref_code is not None and not torch.is_tensor(ref_code):
+            ref_code = torch.tensor(ref_code)
+        ref_spk = d["ref_spk_embedding"]
+        if not torch.is_tensor(ref_spk):
+            ref_spk = torch.tensor(ref_spk)
+        items.append(VoiceClonePromptItem(
+            ref_code=ref_code, ref_spk_embedding=ref_spk,
+            x_vector_only_mode=bool(d.get("x_vector_only_mode", False)),
+            icl_mode=bool(d.get("icl_mode", True)),
+            ref_text=d.get("ref_text"),
+        ))
+    return items
+
+
+def _voice_prompt_bytes(items) -> bytes:
+    buf = io.BytesIO()
+    torch.save({"items": [asdict(it) for it in items]}, buf)
+    return buf.getvalue()
+
+
+class VoicePromptCache:
+    """LRU of voice clone prompts keyed by the content of the reference clip.
+
+    A ``voice_id`` is derived from the uploaded file bytes, ``ref_text`` and
+    ``x_vector_only_mode``, so re-sending the same clip (or just its voice_id) skips
+    the speech tokenizer encode and the speaker encoder. With VOICE_CACHE_DIR set,
+    prompts are also written there in the /api/voice-prompt/save format and are
+    reloaded on demand after a restart.
+    """
+
+    _ID_RE = re.compile(r"[0-9a-f]{32}")
+
+    def __init__(self, max_items: int = VOICE_CACHE_SIZE, directory: str = VOICE_CACHE_DIR):
+        self.max_items = max_items
+        self.directory = directory
+        self._items = OrderedDict()
+        self.hits = self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def voice_id(content: bytes, ref_text: str, x_vector_only_mode: bool) -> str:
+        h = hashlib.sha256(content)
+        # The transcript is not part of an x-vector-only prompt.
+        h.update(b"\0xvec" if x_vector_only_mode else b"\0icl\0" + ref_text.encode())
+        return h.hexdigest()[:32]
+
+    def _path(self, voice_id: str) -> str:
+        return os.path.join(self.directory, f"{voice_id}.pt")
+
+    async def get(self, voice_id: str):
+        item = self._items.get(voice_id)
+        if item is None and self.directory and self._ID_RE.fullmatch(voice_id):
+            path = self._path(voice_id)
+            if os.path.exists(path):
+                try:
+                    item = (await asyncio.to_thread(_load_voice_prompts, path))[0]
+                except Exception:
+                    logger.exception(f"Unreadable voice prompt {path}")
+        if item is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._remember(voice_id, item)
+        return item
+
+    async def put(self, voice_id: str, item):
+        item = replace(item, ref_spk_embedding=item.ref_spk_embedding.cpu(),
+                       ref_code=None if item.ref_code is None else item.ref_code.cpu())
+        self._remember(voice_id, item)
+        if self.directory:
+            await asyncio.to_thread(self._write, voice_id, _voice_prompt_bytes([item]))
+        return item
+
+    def _write(self, voice_id: str, data: bytes):
+        tmp = self._path(voice_id) + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self._path(voice_id))
+
+    def _remember(self, voice_id: str, item):
+        self._items[voice_id] = item
+        self._items.move_to_end(voice_id)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"items": len(self._items), "max_items": self.max_items, "hits": self.hits,
+                "misses": self.misses, "persistent": bool(self.directory)}
+
+
+voices = VoicePromptCache()
+
+
+class ResultCache:
+    """Two-tier LRU of synthesized audio for deterministic requests.
+
+    The key is a sha256 over a canonical JSON of everything that determines the
+    output: model, text, language, speaker / instruct / voice id, all generation
+    parameters and the seed. The memory tier holds up to RESULT_CACHE_MB of float32
+    audio; entries evicted from it are written to OUTPUT_DIR/cache (bounded by
+    RESULT_CACHE_DISK_MB) and promoted back to memory on their next hit.
+    """
+
+    def __init__(self, max_mb: float = RESULT_CACHE_MB, disk_mb: float = RESULT_CACHE_DISK_MB,
+                 directory: str = os.path.join(OUTPUT_DIR, "cache")):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.disk_max_bytes = int(disk_mb * 1024 * 1024)
+        self.directory = directory
+        self._mem = OrderedDict()    # key -> (wav, sr)
+        self._mem_bytes = 0
+        self._disk = OrderedDict()   # key -> file size
+        self._disk_bytes = 0
+        self.hits = self.disk_hits = self.misses = 0
+        if self.disk_max_bytes:
+            os.makedirs(directory, exist_ok=True)
+            files = [e for e in os.scandir(directory) if e.name.endswith(".wav")]
+            for e in sorted(files, key=lambda e: e.stat().st_mtime):
+                self._disk[e.name[:-4]] = e.stat().st_size
+                self._disk_bytes += e.stat().st_size
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_bytes or self.disk_max_bytes)
+
+    @staticmethod
+    def key(model_type: str, fields: dict, gen: dict) -> str:
+        canon = json.dumps({"model": MODEL_MAP[model_type], **fields, **gen}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(canon.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.wav")
+
+    async def get(self, key: str):
+        entry = self._mem.get(key)
+        if entry is not None:
+            self._mem.move_to_end(key)
+            self.hits += 1
+            return entry
+        if key in self._disk:
+            try:
+                wav, sr = await asyncio.to_thread(sf.read, self._path(key), dtype="float32")
+            except Exception:
+                logger.exception(f"Unreadable cache entry {key}")
+                self._drop_disk(key)
+            else:
+                self._disk.move_to_end(key)
+                self.hits += 1
+                self.disk_hits += 1
+                await self._remember(key, wav, sr)
+                return wav, sr
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, wav: np.ndarray, sr: int):
+        await self._remember(key, np.asarray(wav, dtype=np.float32), sr)
+
+    async def _remember(self, key: str, wav: np.ndarray, sr: int):
+        if key in self._mem:
+            self._mem_bytes -= self._mem.pop(key)[0].nbytes
+        self._mem[key] = (wav, sr)
+        self._mem_bytes += wav.nbytes
+        while self._mem_bytes > self.max_bytes and self._mem:
+            old_key, (old_wav, old_sr) = self._mem.popitem(last=False)
+            self._mem_bytes -= old_wav.nbytes
+            await self._spill(old_key, old_wav, old_sr)
+
+    async def _spill(self, key: str, wav: np.ndarray, sr: int):
+        if not self.disk_max_bytes or key in self._disk or wav.nbytes > self.disk_max_bytes:
+            return
+        self._disk[key] = wav.nbytes
+        self._disk_bytes += wav.nbytes
+        try:
+            await asyncio.to_thread(self._write, key, wav, sr)
+        except Exception:
+            logger.exception(f"Failed to spill cache entry {key}")
+            self._drop_disk(key)
+            return
+        while self._disk_bytes > self.disk_max_bytes and self._disk:
+            self._drop_disk(next(iter(self._disk)))
+
+    def _write(self, key: str, wav: np.ndarray, sr: int):
+        tmp = self._path(key) + ".tmp"
+        sf.write(tmp, wav, sr, format="WAV", subtype="FLOAT")
+        os.replace(tmp, self._path(key))
+
+    def _drop_disk(self, key: str):
+        self._disk_bytes -= self._disk.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                "memory_items": len(self._mem), "memory_mb": round(self._mem_bytes / 1024 / 1024, 2),
+                "memory_budget_mb": round(self.max_bytes / 1024 / 1024, 2),
+                "disk_items": len(self._disk), "disk_mb": round(self._disk_bytes / 1024 / 1024, 2),
+                "disk_budget_mb": round(self.disk_max_bytes / 1024 / 1024, 2)}
+
+
+results = ResultCache()
+
+
+# ── Admission control ──
+CODEC_FRAME_RATE = 12.5   # codec frames per second of audio
+# Scripts spoken slower per character than Latin text, in Latin characters per character.
+_SCRIPT_UNITS = ((re.compile(r"[\u3400-\u9fff\uf900-\ufaff]"), 3.2),   # Han
+                 (re.compile(r"[\uac00-\ud7af]"), 2.4),                 # Hangul syllables
+                 (re.compile(r"[\u3040-\u30ff]"), 1.8))                 # kana
+
+
+def _text_units(text: str) -> float:
+    """Length of ``text`` in Latin characters of speech."""
+    units = float(len(text))
+    for pattern, weight in _SCRIPT_UNITS:
+        units += (weight - 1) * len(pattern.findall(text))
+    return units
+
+
+class CostLimitError(HTTPException):
+    """Raised when a request is predicted to need more than COST_MAX_REQUEST_SECONDS of compute (HTTP 413)."""
+
+    def __init__(self, seconds: float):
+        super().__init__(status_code=413, detail=f"Request would take about {seconds:.0f}s of compute, over the "
+                                                 f"{COST_MAX_REQUEST_SECONDS:.0f}s limit; split the text")
+
+
+class CostModel:
+    """Predicts the codec frames and compute time of TTS items, and admits them against the budgets.
+
+    Frames are the text length in Latin characters (see ``_text_units``) times a speaking rate:
+    for an ICL voice clone the reference speaker's own (reference frames per character of
+    reference text), otherwise FRAMES_PER_UNIT, corrected per model type and language by what
+    finished runs produced. Compute is the frames, plus REF_FRAME_COST per reference frame
+    (prefilled and decoded along with the output), times the seconds per frame observed for the
+    model type, batching included.
+    """
+
+    FRAMES_PER_UNIT = 0.85     # ~14.5 characters of English per second of speech
+    SECONDS_PER_FRAME = 0.04   # until a run of the model type has been observed
+    REF_FRAME_COST = 0.2
+    ALPHA = 0.1
+
+    def __init__(self):
+        self.correction = {}         # (model_type, language) -> observed / predicted frames, EMA
+        self.seconds_per_frame = {}  # model_type -> EMA
+        self.admitted = 0.0          # predicted compute seconds of admitted, unfinished requests
+        self._cond = asyncio.Condition()
+
+    @staticmethod
+    def _reference(item: dict) -> tuple:
+        """``(frames, characters)`` of the ICL reference of a voice clone item, or ``(0, 0)``."""
+        prompt = item.get("voice_clone_prompt")
+        if prompt is not None:
+            if not prompt.icl_mode or prompt.ref_code is None:
+                return 0, 0.0
+            return int(prompt.ref_code.shape[0]), _text_units(prompt.ref_text or "")
+        if isinstance(item.get("ref_audio"), tuple) and not item.get("x_vector_only_mode"):
+            wav, sr = item["ref_audio"]
+            return len(wav) / sr * CODEC_FRAME_RATE, _text_units(item.get("ref_text") or "")
+        return 0, 0.0
+
+    def _base_frames(self, item: dict) -> tuple:
+        ref_frames, ref_units = self._reference(item)
+        rate = ref_frames / ref_units if ref_frames and ref_units >= 10 else self.FRAMES_PER_UNIT
+        return _text_units(item["text"]) * rate, ref_frames
+
+    def estimate(self, model_type: str, item: dict) -> tuple:
+        """``(frames, compute_seconds)`` predicted for one item."""
+        frames, ref_frames = self._base_frames(item)
+        frames *= self.correction.get((model_type, item.get("language")), 1.0)
+        spf = self.seconds_per_frame.get(model_type, self.SECONDS_PER_FRAME)
+        return frames, (frames + self.REF_FRAME_COST * ref_frames) * spf
+
+    def observe(self, model_type: str, items: List[dict], frames: List[float], t_gen: float):
+        """Calibrate from one finished generate call; ``frames`` are the frames each item produced."""
+        total = 0.0
+        for item, produced in zip(items, frames):
+            if not produced:   # cancelled
+                continue
+            base, ref_frames = self._base_frames(item)
+            if base > 0:
+                key = (model_type, item.get("language"))
+                correction = self.correction.get(key, 1.0)
+                COST_PREDICTION_RATIO.labels(model_type).observe(produced / (base * correction))
+                ratio = min(max(produced / base, 0.25), 4.0)
+                self.correction[key] = correction + self.ALPHA * (ratio - correction)
+            total += produced + self.REF_FRAME_COST * ref_frames
+        if total and t_gen > 0:
+            spf = self.seconds_per_frame.get(model_type)
+            self.seconds_per_frame[model_type] = t_gen / total if spf is None else spf + self.ALPHA * (t_gen / total - spf)
+
+    @staticmethod
+    def cap(gen: dict, frames: float) -> dict:
+        """Lower ``max_new_tokens`` to MAX_NEW_TOKENS_SLACK x ``frames``, in powers of two so requests still batch.
+
+        Long-form requests are left alone: their ``max_new_tokens`` applies per chunk.
+        """
+        if MAX_NEW_TOKENS_SLACK <= 0 or gen.get("long_form"):
+            return gen
+        cap = 64
+        while cap < frames * MAX_NEW_TOKENS_SLACK:
+            cap *= 2
+        return {**gen, "max_new_tokens": min(gen.get("max_new_tokens", cap), cap)}
+
+    def _fits(self, seconds: float) -> bool:
+        return not COST_BUDGET_SECONDS or not self.admitted or self.admitted + seconds <= COST_BUDGET_SECONDS
+
+    async def admit(self, seconds: float):
+        """Reserve ``seconds`` of the budget; batch requests wait for room, others get 429 (QueueFullError)."""
+        if COST_MAX_REQUEST_SECONDS and seconds > COST_MAX_REQUEST_SECONDS:
+            ADMISSIONS.labels("too_expensive").inc()
+            raise CostLimitError(seconds)
+        if not self._fits(seconds):
+            if _priority.get() != "batch":
+                ADMISSIONS.labels("rejected").inc()
+                excess = self.admitted + seconds - COST_BUDGET_SECONDS
+                raise QueueFullError(max(INFER_RETRY_AFTER, int(excess / len(devices.managers)) + 1))
+            ADMISSIONS.labels("deferred").inc()
+            async with self._cond:
+                await self._cond.wait_for(lambda: self._fits(seconds))
+        self.admitted += seconds
+        ADMISSIONS.labels("admitted").inc()
+
+    async def release(self, seconds: float):
+        self.admitted = max(self.admitted - seconds, 0.0)
+        async with self._cond:
+            self._cond.notify_all()
+
+
+costs = CostModel()
+
+
+async def _submit_admitted(model_type: str, item: dict, gen: dict):
+    """Admit an item against the compute budgets and run it through the batcher with a capped max_new_tokens."""
+    frames, cost = costs.estimate(model_type, item)
+    await costs.admit(cost)
+    try:
+        return await batcher.submit(model_type, item, costs.cap(gen, frames))
+    finally:
+        await costs.release(cost)
+
+
+async def synthesize(model_type: str, item: dict, gen: dict, key_fields: dict):
+    """Serve a TTS item from the result cache or run it through the batcher.
+
+    ``key_fields`` identifies the input (text, language, speaker, instruct, voice id).
+    Only deterministic requests are cached: with the cache enabled, a greedy request
+    without a seed is pinned to seed 0 because the sub-talker still samples.
+    Returns ``(wav, sr, t_load, t_queue, t_gen, cache)`` with cache in HIT/MISS/BYPASS.
+    """
+    gen = _long_form(item, gen)
+    if results.enabled and gen.get("seed") is None and not gen["do_sample"]:
+        gen = {**gen, "seed": 0}
+    if not results.enabled or gen.get("seed") is None or _profile_request.get() is not None:
+        return (*await _submit_admitted(model_type, item, gen), "BYPASS")
+    key = results.key(model_type, key_fields, gen)
+    hit = await results.get(key)
+    if hit is not None:
+        return hit[0], hit[1], 0.0, 0.0, 0.0, "HIT"
+    wav, sr, t_load, t_queue, t_gen = await _submit_admitted(model_type, item, gen)
+    await results.put(key, wav, sr)
+    return wav, sr, t_load, t_queue, t_gen, "MISS"
+
+
+async def _voice_clone_item(text: str, language: str, ref_audio: Optional[UploadFile], ref_text: str,
+                            x_vector_only_mode: bool, voice_id: str):
+    """Build the request item for a voice clone, reusing a cached prompt when there is one.
+
+    Returns ``(item, voice_id)``. Uploaded audio takes precedence over ``voice_id``. A new
+    prompt is built here and cached before the item is submitted, since synthesis may run
+    on a worker process whose copy of the item never comes back.
+    """
+    content = await ref_audio.read() if ref_audio is not None else b""
+    ref_text = ref_text.strip()
+    if content:
+        voice_id = voices.voice_id(content, ref_text, x_vector_only_mode)
+    elif not voice_id:
+        raise ValueError("Either ref_audio or voice_id must be provided")
+    prompt = await voices.get(voice_id)
+    if prompt is None:
+        if not content:
+            raise HTTPException(status_code=404, detail=f"Unknown voice_id: {voice_id}")
+        prompt = await _build_voice_prompt(voice_id, content, ref_text, x_vector_only_mode)
+    return dict(text=text, language=language, voice_clone_prompt=prompt, ref_text=prompt.ref_text), voice_id
+
+
+async def _build_voice_prompt(voice_id: str, content: bytes, ref_text: str, x_vector_only_mode: bool):
+    """Extract a voice clone prompt from uploaded audio and store it in the voice cache."""
+    audio_np, audio_sr = sf.read(io.BytesIO(content), dtype="float32")
+    audio_np = normalize_audio(audio_np)
+    async with devices.acquire("voice_clone") as (dev, model):
+        items, _, _ = await dev.run(
+            model.create_voice_clone_prompt,
+            ref_audio=(audio_np, audio_sr),
+            ref_text=ref_text or None,
+            x_vector_only_mode=x_vector_only_mode,
+        )
+    return await voices.put(voice_id, items[0])
+
+
+# ── Preload / warm-up ──
+readiness = {"ready": not PRELOAD_MODELS, "warming_up": [], "error": None}
+_preload_task: Optional[asyncio.Task] = None
+
+
+def _preload_keys() -> List[str]:
+    keys = [*MODEL_MAP, "tokenizer"] if PRELOAD_MODELS == ["all"] else PRELOAD_MODELS
+    unknown = [k for k in keys if k not in MODEL_MAP and k != "tokenizer"]
+    if unknown:
+        raise ValueError(f"Unknown model in PRELOAD_MODELS: {', '.join(unknown)}")
+    return keys
+
+
+def _warmup_items(model_type: str) -> List[dict]:
+    """Short, medium and long prompts, so kernels and allocator pools see a spread of shapes."""
+    texts = [SAMPLE_TEXTS["German"], SAMPLE_TEXTS["Chinese"], " ".join(SAMPLE_TEXTS[l] for l in ("English", "French", "Italian"))]
+    if model_type == "custom_voice":
+        return [dict(text=t, language="Auto", speaker=SPEAKERS[0], instruct="") for t in texts]
+    if model_type == "voice_design":
+        return [dict(text=t, language="Auto", instruct=VOICE_DESIGN_EXAMPLES[0]["instruct"]) for t in texts]
+    # A 3 s chirp stands in for reference audio: exercises the speech tokenizer encoder and speaker encoder.
+    t = np.arange(3 * 24000, dtype=np.float32) / 24000
+    ref = (0.1 * np.sin(2 * np.pi * (150 + 100 * t) * t)).astype(np.float32)
+    return [dict(text=txt, language="Auto", ref_audio=(ref, 24000), ref_text=SAMPLE_TEXTS["English"],
+                 x_vector_only_mode=False) for txt in texts]
+
+
+def _warm_up(model, key: str):
+    """Run the code paths requests will hit: single and batched generate, then a stream."""
+    if key == "tokenizer":
+        t = np.arange(2 * 24000, dtype=np.float32) / 24000
+        enc = model.encode(0.1 * np.sin(2 * np.pi * 220 * t), sr=24000)
+        model.decode(enc)
+        return
+    gen = gen_kwargs(max_new_tokens=WARMUP_MAX_NEW_TOKENS)
+    for item in _warmup_items(key):
+        _generate_batch(model, key, [item], gen)
+    _generate_batch(model, key, _warmup_items(key), gen)
+    item = _warmup_items(key)[0]
+    stream = getattr(model, f"stream_{key}")
+    for _ in stream(**_item_kwargs(model, key, item), first_chunk_frames=STREAM_FIRST_CHUNK_FRAMES,
+                    max_chunk_frames=STREAM_MAX_CHUNK_FRAMES, max_new_tokens=WARMUP_MAX_NEW_TOKENS):
+        pass
+
+
+async def _preload_on(dev: GPUManager, key: str):
+    async with dev.acquire(key) as model:
+        dev.pinned.add(key)
+        await dev.run(_warm_up, model, key)
+
+
+def start_preload(keys: List[str]):
+    """Preload ``keys`` in the background (again, after an offload); ``/ready`` is 503 until done."""
+    global _preload_task
+    if _preload_task is not None:
+        _preload_task.cancel()
+    readiness.update(ready=False, error=None)
+    _preload_task = asyncio.create_task(preload_models(keys))
+
+
+async def preload_models(keys: List[str]):
+    """Load, pin and warm up ``keys`` on every device; flips ``readiness`` when all of them are hot."""
+    readiness["warming_up"] = list(keys)
+    try:
+        for key in keys:
+            t0 = time.time()
+            await asyncio.gather(*(_preload_on(dev, key) for dev in devices.managers))
+            readiness["warming_up"].remove(key)
+            logger.info(f"Preloaded and warmed up {key} on {len(devices.managers)} device(s) in {time.time() - t0:.1f}s")
+    except Exception as e:
+        logger.exception("Preloading failed")
+        readiness["error"] = str(e)
+        return
+    readiness["ready"] = True
 
 
 # ── Helpers ──
@@ -250,11 +2246,12 @@ def wav_bytes(audio: np.ndarray, sr: int) -> bytes:
 
 
 def gen_kwargs(do_sample=True, top_k=50, top_p=0.9, temperature=1.0, repetition_penalty=1.05,
-               max_new_tokens=2048, subtalker_top_k=50, subtalker_top_p=0.9, subtalker_temperature=1.0):
+               max_new_tokens=2048, subtalker_top_k=50, subtalker_top_p=0.9, subtalker_temperature=1.0,
+               seed=None, long_form=None):
     return dict(do_sample=do_sample, top_k=top_k, top_p=top_p, temperature=temperature,
                 repetition_penalty=repetition_penalty, max_new_tokens=max_new_tokens,
                 subtalker_top_k=subtalker_top_k, subtalker_top_p=subtalker_top_p,
-                subtalker_temperature=subtalker_temperature)
+                subtalker_temperature=subtalker_temperature, seed=seed, long_form=long_form)
 
 
 def normalize_audio(wav):
@@ -267,32 +2264,344 @@ def normalize_audio(wav):
     return np.clip(x, -1.0, 1.0).astype(np.float32)
 
 
-def timed_wav_response(audio, sr, t_load, t_gen, filename="output.wav"):
-    """Return WAV StreamingResponse with timing headers."""
+# ── Audio encoding ──
+# name -> (soundfile format, subtype, fixed output rate); pcm/mulaw/alaw are headerless.
+AUDIO_FORMATS = {
+    "wav": ("WAV", "PCM_16", None),
+    "pcm": ("RAW", "PCM_16", None),
+    "flac": ("FLAC", "PCM_16", None),
+    "mp3": ("MP3", "MPEG_LAYER_III", None),
+    "opus": ("OGG", "OPUS", None),
+    "mulaw": ("RAW", "ULAW", 8000),
+    "alaw": ("RAW", "ALAW", 8000),
+}
+_MEDIA_TYPES = {"wav": "audio/wav", "flac": "audio/flac", "mp3": "audio/mpeg", "opus": "audio/ogg; codecs=opus",
+                "mulaw": "audio/basic", "alaw": "audio/x-alaw-basic"}
+_SFC_SET_OGG_PAGE_LATENCY_MS = 0x1302   # libsndfile >= 1.2; not wrapped by soundfile
+OGG_PAGE_LATENCY_MS = 100.0
+MP3_STREAM_COMPRESSION = 0.6   # libsndfile level for streamed CBR MP3, ~64 kbit/s at 24 kHz
+
+encode_pool = ThreadPoolExecutor(max_workers=ENCODE_WORKERS, thread_name_prefix="encode")
+
+
+def audio_format(fmt: Optional[str], default: str, streaming: bool = False) -> str:
+    fmt = (fmt or default).lower()
+    if fmt not in AUDIO_FORMATS:
+        raise ValueError(f"Unsupported format {fmt!r}, expected one of {', '.join(AUDIO_FORMATS)}")
+    if streaming and fmt in ("wav", "flac"):
+        # Both need the total length in their header, which is only known once the stream has ended.
+        raise ValueError(f"{fmt} cannot be streamed, use pcm (or opus/mp3)")
+    return fmt
+
+
+def audio_headers(fmt: str, sr: int) -> dict:
+    out_sr = AUDIO_FORMATS[fmt][2] or sr
+    name = "pcm_s16le" if fmt == "pcm" else fmt
+    return {"X-Sample-Rate": str(out_sr), "X-Audio-Format": name, "X-Audio-Channels": "1"}
+
+
+def media_type(fmt: str, sr: int) -> str:
+    if fmt == "pcm":
+        return f"audio/pcm;rate={sr};encoding=signed-int;bits=16"
+    return _MEDIA_TYPES[fmt]
+
+
+class _Decimator:
+    """Streaming windowed-sinc low-pass plus integer decimation (24 kHz -> 8 kHz for G.711)."""
+
+    def __init__(self, factor: int, taps_per_phase: int = 32):
+        self.factor = factor
+        n = taps_per_phase * factor + 1
+        t = np.arange(n) - (n - 1) / 2
+        cutoff = 0.9 / factor   # fraction of the input Nyquist, leaves room for the transition band
+        self.h = (cutoff * np.sinc(cutoff * t) * np.kaiser(n, 8.0)).astype(np.float32)
+        self._tail = np.zeros(n - 1, dtype=np.float32)
+        self._offset = 0
+
+    def __call__(self, x: np.ndarray) -> np.ndarray:
+        buf = np.concatenate([self._tail, x.astype(np.float32)])
+        y = np.convolve(buf, self.h, mode="valid")
+        self._tail = buf[len(buf) - len(self._tail):]
+        start = -self._offset % self.factor
+        self._offset = (self._offset + len(x)) % self.factor
+        return y[start::self.factor]
+
+
+def _resampler(fmt: str, sr: int):
+    target = AUDIO_FORMATS[fmt][2]
+    if target is None or target == sr:
+        return None
+    if sr % target:
+        raise ValueError(f"Cannot resample {sr} Hz to {target} Hz for {fmt}")
+    return _Decimator(sr // target)
+
+
+def _mp3_frame_length(header: bytes) -> int:
+    """Length of the MPEG audio layer III frame starting with ``header`` (0 if not a frame header)."""
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return 0
+    version = (header[1] >> 3) & 3   # 3: MPEG-1, 2: MPEG-2, 0: MPEG-2.5
+    bitrates = ((0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320) if version == 3 else
+                (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160))
+    rates = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}.get(version)
+    br_idx, sr_idx = header[2] >> 4, (header[2] >> 2) & 3
+    if rates is None or br_idx in (0, 15) or sr_idx == 3:
+        return 0
+    return (144 if version == 3 else 72) * bitrates[br_idx] * 1000 // rates[sr_idx] + ((header[2] >> 1) & 1)
+
+
+class _StreamSink:
+    """Write-only file object that hands encoded bytes out as soon as they are written.
+
+    Encoders patch their headers (the MP3 info frame) on close by seeking back;
+    writes into bytes already sent are dropped.
+    """
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._sent = 0
+        self._pos = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        n = len(data)
+        if self._pos < self._sent:
+            skip = min(self._sent - self._pos, n)
+            data, self._pos = data[skip:], self._pos + skip
+        off = self._pos - self._sent
+        if off > len(self._buf):
+            self._buf.extend(bytes(off - len(self._buf)))
+        self._buf[off:off + len(data)] = data
+        self._pos += len(data)
+        return n
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        base = {0: 0, 1: self._pos, 2: self._sent + len(self._buf)}[whence]
+        self._pos = base + offset
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def read(self, size: int = -1) -> bytes:
+        off = max(self._pos - self._sent, 0)
+        data = bytes(self._buf[off:] if size < 0 else self._buf[off:off + size])
+        self._pos += len(data)
+        return data
+
+    def take(self) -> bytes:
+        data = bytes(self._buf)
+        self._sent += len(data)
+        self._buf.clear()
+        return data
+
+
+class AudioEncoder:
+    """Incremental encoder for one streamed response; not thread-safe, call it from one task."""
+
+    def __init__(self, fmt: str, sr: int):
+        major, subtype, target = AUDIO_FORMATS[fmt]
+        self._resample = _resampler(fmt, sr)
+        self._sink = _StreamSink()
+        # Streamed MP3 is constant bitrate: without the info frame (see below) decoders
+        # estimate a VBR stream's duration from its first frames and cut it short.
+        cbr = dict(compression_level=MP3_STREAM_COMPRESSION, bitrate_mode="CONSTANT") if fmt == "mp3" else {}
+        self._file = sf.SoundFile(self._sink, "w", samplerate=target or sr, channels=1, format=major, subtype=subtype,
+                                  **cbr)
+        if major == "OGG":
+            latency = sf._ffi.new("double*", OGG_PAGE_LATENCY_MS)
+            sf._snd.sf_command(self._file._file, _SFC_SET_OGG_PAGE_LATENCY_MS, latency, sf._ffi.sizeof("double"))
+        # The MP3 info frame is only filled in on close, after it was sent: leave it out of the stream.
+        self._skip_head = fmt == "mp3"
+        self._head = b""
+        self._seconds = 0.0   # encode time over the whole stream, reported on close
+
+    def write(self, audio: np.ndarray) -> bytes:
+        t0 = time.perf_counter()
+        audio = np.clip(np.asarray(audio, dtype=np.float32), -1.0, 1.0)
+        if self._resample is not None:
+            audio = self._resample(audio)
+        self._file.write(audio)
+        self._seconds += time.perf_counter() - t0
+        return self._take()
+
+    def close(self) -> bytes:
+        t0 = time.perf_counter()
+        self._file.close()
+        STAGE_SECONDS.labels("output_encode").observe(self._seconds + time.perf_counter() - t0)
+        return self._take()
+
+    def _take(self) -> bytes:
+        data = self._sink.take()
+        if self._skip_head:
+            self._head += data
+            size = _mp3_frame_length(self._head[:4])
+            if size == 0 or len(self._head) < size:
+                return b""
+            data, self._head, self._skip_head = self._head[size:], b"", False
+        return data
+
+
+def encode_audio(audio: np.ndarray, sr: int, fmt: str) -> bytes:
+    """Encode a complete waveform (headers carry the real length)."""
+    t0 = time.perf_counter()
+    major, subtype, target = AUDIO_FORMATS[fmt]
+    audio = np.clip(np.asarray(audio, dtype=np.float32), -1.0, 1.0)
+    resample = _resampler(fmt, sr)
+    if resample is not None:
+        audio = resample(audio)
+    buf = io.BytesIO()
+    sf.write(buf, audio, target or sr, format=major, subtype=subtype)
+    STAGE_SECONDS.labels("output_encode").observe(time.perf_counter() - t0)
+    return buf.getvalue()
+
+
+async def timed_audio_response(audio, sr, t_load, t_gen, name="output", t_queue=0.0, cache="BYPASS", fmt="wav"):
+    """Encode ``audio`` on the encode pool and return it with timing headers."""
     audio_dur = len(audio) / sr
+    data = await asyncio.get_running_loop().run_in_executor(encode_pool, encode_audio, audio, sr, fmt)
+    ext = "raw" if fmt == "pcm" else fmt
     return StreamingResponse(
-        io.BytesIO(wav_bytes(audio, sr)), media_type="audio/wav",
+        io.BytesIO(data), media_type=media_type(fmt, sr),
         headers={
-            "Content-Disposition": f"attachment; filename={filename}",
-            "X-Time-Load": f"{t_load:.3f}", "X-Time-Gen": f"{t_gen:.3f}",
-            "X-Time-Total": f"{t_load + t_gen:.3f}", "X-Audio-Duration": f"{audio_dur:.3f}",
+            "Content-Disposition": f"attachment; filename={name}.{ext}",
+            "X-Time-Load": f"{t_load:.3f}", "X-Time-Queue": f"{t_queue:.3f}", "X-Time-Gen": f"{t_gen:.3f}",
+            "X-Time-Total": f"{t_load + t_queue + t_gen:.3f}", "X-Audio-Duration": f"{audio_dur:.3f}",
+            "X-Cache": cache, **audio_headers(fmt, sr),
         })
 
 
 # ── FastAPI ──
 @asynccontextmanager
 async def lifespan(_app):
-    await gpu.start()
+    keys = _preload_keys()
+    await devices.start()
+    if keys:
+        start_preload(keys)
+    await jobs.start()
     yield
-    await gpu.stop()
+    if _preload_task is not None:
+        _preload_task.cancel()
+    await jobs.stop()
+    await devices.stop()
+    encode_pool.shutdown(wait=False, cancel_futures=True)
 
 app = FastAPI(title="Qwen3-TTS API", version="2.0.0",
               description="All-in-One TTS: Custom Voice / Voice Design / Voice Clone / Tokenizer", lifespan=lifespan)
 
 from fastapi.middleware.cors import CORSMiddleware
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"],
-                   expose_headers=["X-Time-Load","X-Time-Gen","X-Time-Total","X-Audio-Duration",
-                                   "X-Sample-Rate","X-Audio-Format","X-Audio-Channels"])
+                   expose_headers=["X-Time-Load","X-Time-Queue","X-Time-Gen","X-Time-Total","X-Audio-Duration",
+                                   "X-Sample-Rate","X-Audio-Format","X-Audio-Channels","X-Time-First-Chunk","X-Voice-Id","X-Cache","X-Profile-Url"])
+
+
+class DisconnectWatchMiddleware:
+    """Sets ``_client_gone`` for an HTTP request as soon as its client disconnects.
+
+    Starlette only notices a disconnect when the app reads ``receive`` again or fails to send.
+    Here ``receive`` is read in the background once the request body has been consumed, and
+    the messages are replayed to the app, so generation waiting on the request can be cancelled
+    right away.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        gone = asyncio.Event()
+        messages = asyncio.Queue()
+        listener = None
+
+        async def listen():
+            while True:
+                message = await receive()
+                messages.put_nowait(message)
+                if message["type"] == "http.disconnect":
+                    gone.set()
+                    return
+
+        async def watched_receive():
+            nonlocal listener
+            if listener is not None:
+                if gone.is_set() and messages.empty():
+                    return {"type": "http.disconnect"}
+                return await messages.get()
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                gone.set()
+            elif not message.get("more_body", False):
+                listener = asyncio.create_task(listen())
+            return message
+
+        token = _client_gone.set(gone)
+        try:
+            await self.app(scope, watched_receive, send)
+        finally:
+            _client_gone.reset(token)
+            if listener is not None:
+                listener.cancel()
+
+
+app.add_middleware(DisconnectWatchMiddleware)
+
+
+class PriorityMiddleware:
+    """Runs a request in the priority class named by ``X-Priority`` (default: interactive)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        priority = Headers(scope=scope).get("x-priority", "") if scope["type"] == "http" else ""
+        if not priority:
+            return await self.app(scope, receive, send)
+        if priority not in PRIORITIES:
+            response = JSONResponse(status_code=400,
+                                    content={"detail": f"X-Priority must be one of: {', '.join(PRIORITIES)}"})
+            return await response(scope, receive, send)
+        token = _priority.set(priority)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _priority.reset(token)
+
+
+app.add_middleware(PriorityMiddleware)
+
+
+class ProfileMiddleware:
+    """Profiles the inference job of requests sent with ``X-Profile: 1`` by an admin.
+
+    Requests without the header are passed straight to the app; the others get
+    ``X-Profile-Url`` added to their response once their job ran under the profiler.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or Headers(scope=scope).get("x-profile", "0") in ("", "0", "false"):
+            return await self.app(scope, receive, send)
+        if not _is_admin(Request(scope)):
+            response = JSONResponse(status_code=403, content={"detail": "Profiling requires a valid X-Admin-Token"})
+            return await response(scope, receive, send)
+        profile = {"id": uuid.uuid4().hex[:16], "started": False}
+
+        async def send_with_url(message):
+            if message["type"] == "http.response.start" and profile["started"]:
+                MutableHeaders(scope=message)["X-Profile-Url"] = f"/api/profiles/{profile['id']}"
+            await send(message)
+
+        token = _profile_request.set(profile)
+        try:
+            await self.app(scope, receive, send_with_url)
+        finally:
+            _profile_request.reset(token)
+
+
+app.add_middleware(ProfileMiddleware)
 
 
 @app.get("/health")
@@ -300,15 +2609,122 @@ async def health():
     return {"status": "ok", "service": "qwen3-tts", "version": "2.0.0"}
 
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 503 until the PRELOAD_MODELS are loaded and warmed up."""
+    if readiness["ready"]:
+        return {"ready": True}
+    return JSONResponse(status_code=503, content={"ready": False, "warming_up": readiness["warming_up"],
+                                                  "error": readiness["error"]})
+
+
 @app.get("/api/gpu-status")
 async def api_gpu_status():
-    return await gpu.status()
+    return await devices.status()
+
+
+@app.get("/api/cache/stats")
+async def api_cache_stats():
+    return {"results": results.stats(), "voice_prompts": voices.stats()}
+
+
+class _StateCollector:
+    """Exports cache, pool and memory state at scrape time.
+
+    CPU memory is covered by the default ``process_resident_memory_bytes``.
+    """
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        lookups = CounterMetricFamily("qwen_tts_cache_lookups", "Cache lookups by outcome", labels=["cache", "result"])
+        lookups.add_metric(["result", "hit"], results.hits)
+        lookups.add_metric(["result", "miss"], results.misses)
+        lookups.add_metric(["voice_prompt", "hit"], voices.hits)
+        lookups.add_metric(["voice_prompt", "miss"], voices.misses)
+        yield lookups
+        yield CounterMetricFamily("qwen_tts_result_cache_disk_hits", "Result cache hits served from disk",
+                                  value=results.disk_hits)
+        yield GaugeMetricFamily("qwen_tts_admitted_cost_seconds", "Predicted compute of admitted, unfinished requests",
+                                value=costs.admitted)
+        spf = GaugeMetricFamily("qwen_tts_cost_seconds_per_frame", "Observed compute seconds per codec frame",
+                                labels=["model_type"])
+        for model_type, seconds in costs.seconds_per_frame.items():
+            spf.add_metric([model_type], seconds)
+        yield spf
+        running = GaugeMetricFamily("qwen_tts_infer_running", "Inference jobs running", labels=["device"])
+        queued = GaugeMetricFamily("qwen_tts_infer_queued", "Inference jobs waiting for a worker", labels=["device"])
+        lanes = GaugeMetricFamily("qwen_tts_priority_queued", "Inference jobs waiting for a worker slot, paused ones included",
+                                  labels=["device", "priority"])
+        busy = CounterMetricFamily("qwen_tts_device_busy_seconds", "Worker time spent in inference jobs",
+                                   labels=["device"])
+        utilization = GaugeMetricFamily("qwen_tts_device_utilization",
+                                        f"Fraction of worker time busy over the last {GPUManager.UTILIZATION_WINDOW:.0f}s",
+                                        labels=["device"])
+        resident = GaugeMetricFamily("qwen_tts_model_resident_bytes", "Device memory held by each resident model",
+                                     labels=["device", "model_type"])
+        memory = [GaugeMetricFamily("qwen_tts_gpu_memory_allocated_bytes", "Device memory allocated by tensors",
+                                    labels=["device"]),
+                  GaugeMetricFamily("qwen_tts_gpu_memory_reserved_bytes", "Device memory held by the caching allocator",
+                                    labels=["device"]),
+                  GaugeMetricFamily("qwen_tts_gpu_memory_total_bytes", "Total device memory", labels=["device"])]
+        for dev in devices.managers:
+            running.add_metric([dev.name], dev._running)
+            queued.add_metric([dev.name], max(dev._pending - dev._running, 0))
+            for priority, lane in dev._lanes.items():
+                lanes.add_metric([dev.name, priority], len(lane))
+            busy.add_metric([dev.name], dev.busy_seconds)
+            utilization.add_metric([dev.name], dev.utilization())
+            for key, entry in list(dev.models.items()):
+                if entry["model"] is not None:
+                    resident.add_metric([dev.name, key], entry["size_mb"] * 1048576)
+            stats = dev.device_stats()
+            for gauge, field in zip(memory, ("memory_allocated_mb", "memory_reserved_mb", "memory_total_mb")):
+                if field in stats:
+                    gauge.add_metric([dev.name], stats[field] * 1048576)
+        yield from (running, queued, lanes, busy, utilization, resident, *memory)
+
+
+REGISTRY.register(_StateCollector())
+
+
+@app.get("/metrics")
+async def metrics():
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+
+def _profile_path(request: Request, profile_id: str, ext: str) -> str:
+    if not _is_admin(request):
+        raise HTTPException(status_code=403, detail="Requires a valid X-Admin-Token")
+    path = os.path.join(PROFILE_DIR, f"{profile_id}{ext}")
+    if not _PROFILE_ID_RE.fullmatch(profile_id) or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=f"Unknown profile: {profile_id}")
+    return path
+
+
+@app.get("/api/profiles/{profile_id}")
+async def api_profile_summary(profile_id: str, request: Request):
+    """Top ops of a profiled request (self device time, or CPU time without CUDA)."""
+    with open(_profile_path(request, profile_id, ".txt")) as f:
+        return PlainTextResponse(f.read())
+
+
+@app.get("/api/profiles/{profile_id}/trace")
+async def api_profile_trace(profile_id: str, request: Request):
+    """Chrome trace of a profiled request (open in Perfetto or chrome://tracing)."""
+    return FileResponse(_profile_path(request, profile_id, ".json.gz"), media_type="application/gzip",
+                        filename=f"{profile_id}.json.gz")
 
 
 @app.post("/api/gpu-offload")
 async def api_gpu_offload():
-    await gpu.offload()
-    return {"message": "GPU offloaded"}
+    """Free every idle model. Preloaded models are then loaded and warmed up again; /ready is 503 meanwhile."""
+    await devices.offload()
+    keys = _preload_keys()
+    if keys:
+        start_preload(keys)
+    return {"message": "GPU offloaded", "reloading": keys}
 
 
 @app.get("/api/speakers")
@@ -323,7 +2739,9 @@ async def api_languages():
 
 @app.get("/api/models")
 async def api_models():
-    return {"models": MODEL_MAP, "current": gpu.model_type}
+    placement = devices.resident()
+    resident = [k for k in MODEL_MAP if any(k in keys for keys in placement.values())]
+    return {"models": MODEL_MAP, "current": devices.model_type, "resident": resident, "placement": placement}
 
 
 @app.get("/api/sample-texts")
@@ -345,6 +2763,9 @@ class CustomVoiceReq(BaseModel):
     subtalker_top_k: int = 50
     subtalker_top_p: float = 0.9
     subtalker_temperature: float = 1.0
+    seed: Optional[int] = None
+    long_form: Optional[bool] = None   # None = automatic for texts of LONG_FORM_CHARS or more
+    format: Optional[str] = None   # wav (default) / pcm / flac / mp3 / opus / mulaw / alaw
 
 
 class VoiceDesignReq(BaseModel):
@@ -360,22 +2781,26 @@ class VoiceDesignReq(BaseModel):
     subtalker_top_k: int = 50
     subtalker_top_p: float = 0.9
     subtalker_temperature: float = 1.0
+    seed: Optional[int] = None
+    long_form: Optional[bool] = None   # None = automatic for texts of LONG_FORM_CHARS or more
+    format: Optional[str] = None   # wav (default) / pcm / flac / mp3 / opus / mulaw / alaw
 
 
 @app.post("/api/tts/custom-voice")
 async def api_custom_voice(req: CustomVoiceReq):
     try:
-        t0 = time.time()
-        model = await gpu.load("custom_voice")
-        t_load = time.time() - t0
-        t1 = time.time()
-        wavs, sr = model.generate_custom_voice(
-            text=req.text, language=req.language, speaker=req.speaker, instruct=req.instruct or None,
-            **gen_kwargs(req.do_sample, req.top_k, req.top_p, req.temperature,
-                         req.repetition_penalty, req.max_new_tokens, req.subtalker_top_k,
-                         req.subtalker_top_p, req.subtalker_temperature))
-        t_gen = time.time() - t1
-        return timed_wav_response(wavs[0], sr, t_load, t_gen, f"cv_{req.speaker}_{req.language}.wav")
+        fmt = audio_format(req.format, "wav")
+        item = dict(text=req.text, language=req.language, speaker=req.speaker, instruct=req.instruct)
+        wav, sr, t_load, t_queue, t_gen, cache = await synthesize(
+            "custom_voice", item,
+            gen_kwargs(req.do_sample, req.top_k, req.top_p, req.temperature,
+                       req.repetition_penalty, req.max_new_tokens, req.subtalker_top_k,
+                       req.subtalker_top_p, req.subtalker_temperature, req.seed, req.long_form),
+            item)
+        return await timed_audio_response(wav, sr, t_load, t_gen, f"cv_{req.speaker}_{req.language}",
+                                          t_queue=t_queue, cache=cache, fmt=fmt)
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
@@ -386,17 +2811,18 @@ async def api_custom_voice(req: CustomVoiceReq):
 @app.post("/api/tts/voice-design")
 async def api_voice_design(req: VoiceDesignReq):
     try:
-        t0 = time.time()
-        model = await gpu.load("voice_design")
-        t_load = time.time() - t0
-        t1 = time.time()
-        wavs, sr = model.generate_voice_design(
-            text=req.text, language=req.language, instruct=req.instruct,
-            **gen_kwargs(req.do_sample, req.top_k, req.top_p, req.temperature,
-                         req.repetition_penalty, req.max_new_tokens, req.subtalker_top_k,
-                         req.subtalker_top_p, req.subtalker_temperature))
-        t_gen = time.time() - t1
-        return timed_wav_response(wavs[0], sr, t_load, t_gen, f"vd_{req.language}.wav")
+        fmt = audio_format(req.format, "wav")
+        item = dict(text=req.text, language=req.language, instruct=req.instruct)
+        wav, sr, t_load, t_queue, t_gen, cache = await synthesize(
+            "voice_design", item,
+            gen_kwargs(req.do_sample, req.top_k, req.top_p, req.temperature,
+                       req.repetition_penalty, req.max_new_tokens, req.subtalker_top_k,
+                       req.subtalker_top_p, req.subtalker_temperature, req.seed, req.long_form),
+            item)
+        return await timed_audio_response(wav, sr, t_load, t_gen, f"vd_{req.language}", t_queue=t_queue,
+                                          cache=cache, fmt=fmt)
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
@@ -411,23 +2837,25 @@ async def api_voice_clone(
     top_k: int = Form(50), top_p: float = Form(0.9), temperature: float = Form(1.0),
     repetition_penalty: float = Form(1.05), max_new_tokens: int = Form(2048),
     subtalker_top_k: int = Form(50), subtalker_top_p: float = Form(0.9),
-    subtalker_temperature: float = Form(1.0), ref_audio: UploadFile = File(...),
+    subtalker_temperature: float = Form(1.0), ref_audio: Optional[UploadFile] = File(None),
+    voice_id: str = Form(""), seed: Optional[int] = Form(None), long_form: Optional[bool] = Form(None),
+    format: str = Form(""),
 ):
     try:
-        content = await ref_audio.read()
-        audio_np, audio_sr = sf.read(io.BytesIO(content), dtype="float32")
-        audio_np = normalize_audio(audio_np)
-        t0 = time.time()
-        model = await gpu.load("voice_clone")
-        t_load = time.time() - t0
-        t1 = time.time()
-        wavs, sr = model.generate_voice_clone(
-            text=text, language=language, ref_audio=(audio_np, audio_sr),
-            ref_text=ref_text or None, x_vector_only_mode=x_vector_only_mode,
-            **gen_kwargs(do_sample, top_k, top_p, temperature, repetition_penalty,
-                         max_new_tokens, subtalker_top_k, subtalker_top_p, subtalker_temperature))
-        t_gen = time.time() - t1
-        return timed_wav_response(wavs[0], sr, t_load, t_gen, "vc_clone.wav")
+        fmt = audio_format(format, "wav")
+        item, voice_id = await _voice_clone_item(text, language, ref_audio, ref_text,
+                                                 x_vector_only_mode, voice_id)
+        wav, sr, t_load, t_queue, t_gen, cache = await synthesize(
+            "voice_clone", item,
+            gen_kwargs(do_sample, top_k, top_p, temperature, repetition_penalty,
+                       max_new_tokens, subtalker_top_k, subtalker_top_p, subtalker_temperature, seed,
+                       long_form),
+            dict(text=text, language=language, voice_id=voice_id))
+        resp = await timed_audio_response(wav, sr, t_load, t_gen, "vc_clone", t_queue=t_queue, cache=cache, fmt=fmt)
+        resp.headers["X-Voice-Id"] = voice_id
+        return resp
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
@@ -440,24 +2868,24 @@ async def api_save_voice_prompt(
     ref_text: str = Form(""), x_vector_only_mode: bool = Form(False),
     ref_audio: UploadFile = File(...),
 ):
-    """Save a reusable voice clone prompt from reference audio."""
+    """Save a reusable voice clone prompt from reference audio.
+
+    The prompt is also kept in the server-side voice cache; the returned X-Voice-Id
+    can be sent to /api/tts/voice-clone instead of the audio.
+    """
     try:
         content = await ref_audio.read()
-        audio_np, audio_sr = sf.read(io.BytesIO(content), dtype="float32")
-        audio_np = normalize_audio(audio_np)
-        model = await gpu.load("voice_clone")
-        items = model.create_voice_clone_prompt(
-            ref_audio=(audio_np, audio_sr),
-            ref_text=ref_text.strip() or None,
-            x_vector_only_mode=x_vector_only_mode,
-        )
-        payload = {"items": [asdict(it) for it in items]}
+        ref_text = ref_text.strip()
+        voice_id = voices.voice_id(content, ref_text, x_vector_only_mode)
+        prompt = await voices.get(voice_id)
+        if prompt is None:
+            prompt = await _build_voice_prompt(voice_id, content, ref_text, x_vector_only_mode)
         ts = time.strftime("%Y%m%d_%H%M%S")
-        buf = io.BytesIO()
-        torch.save(payload, buf)
-        buf.seek(0)
-        return StreamingResponse(buf, media_type="application/octet-stream",
-                                 headers={"Content-Disposition": f"attachment; filename=voice_prompt_{ts}.pt"})
+        return StreamingResponse(io.BytesIO(_voice_prompt_bytes([prompt])), media_type="application/octet-stream",
+                                 headers={"Content-Disposition": f"attachment; filename=voice_prompt_{ts}.pt",
+                                          "X-Voice-Id": voice_id})
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
@@ -472,37 +2900,27 @@ async def api_voice_clone_from_prompt(
     temperature: float = Form(1.0), repetition_penalty: float = Form(1.05),
     max_new_tokens: int = Form(2048), subtalker_top_k: int = Form(50),
     subtalker_top_p: float = Form(0.9), subtalker_temperature: float = Form(1.0),
-    voice_prompt: UploadFile = File(...),
+    voice_prompt: UploadFile = File(...), seed: Optional[int] = Form(None), long_form: Optional[bool] = Form(None),
+    format: str = Form(""),
 ):
     """Generate speech using a previously saved voice prompt file."""
     try:
-        from qwen_tts import VoiceClonePromptItem
+        fmt = audio_format(format, "wav")
         content = await voice_prompt.read()
-        payload = torch.load(io.BytesIO(content), map_location="cpu", weights_only=True)
-        items = []
-        for d in payload["items"]:
-            ref_code = d.get("ref_code")
-            if ref_code is not None and not torch.is_tensor(ref_code):
-                ref_code = torch.tensor(ref_code)
-            ref_spk = d["ref_spk_embedding"]
-            if not torch.is_tensor(ref_spk):
-                ref_spk = torch.tensor(ref_spk)
-            items.append(VoiceClonePromptItem(
-                ref_code=ref_code, ref_spk_embedding=ref_spk,
-                x_vector_only_mode=bool(d.get("x_vector_only_mode", False)),
-                icl_mode=bool(d.get("icl_mode", True)),
-                ref_text=d.get("ref_text"),
-            ))
-        t0 = time.time()
-        model = await gpu.load("voice_clone")
-        t_load = time.time() - t0
-        t1 = time.time()
-        wavs, sr = model.generate_voice_clone(
-            text=text, language=language, voice_clone_prompt=items,
-            **gen_kwargs(do_sample, top_k, top_p, temperature, repetition_penalty,
-                         max_new_tokens, subtalker_top_k, subtalker_top_p, subtalker_temperature))
-        t_gen = time.time() - t1
-        return timed_wav_response(wavs[0], sr, t_load, t_gen, "vc_from_prompt.wav")
+        items = _load_voice_prompts(io.BytesIO(content))
+        if len(items) != 1:
+            raise ValueError(f"Voice prompt file must contain exactly one item, got {len(items)}")
+        wav, sr, t_load, t_queue, t_gen, cache = await synthesize(
+            "voice_clone",
+            dict(text=text, language=language, voice_clone_prompt=items[0], ref_text=items[0].ref_text),
+            gen_kwargs(do_sample, top_k, top_p, temperature, repetition_penalty,
+                       max_new_tokens, subtalker_top_k, subtalker_top_p, subtalker_temperature, seed,
+                       long_form),
+            dict(text=text, language=language, voice_prompt=hashlib.sha256(content).hexdigest()))
+        return await timed_audio_response(wav, sr, t_load, t_gen, "vc_from_prompt", t_queue=t_queue,
+                                          cache=cache, fmt=fmt)
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
@@ -510,63 +2928,422 @@ async def api_voice_clone_from_prompt(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ── Speech tokenizer endpoints ──
+# Codes travel as JSON, as .npy (little-endian int16, frames x codebooks; .npz for several) or
+# packed: a 12-byte header (b"QTC1", uint32 frames, uint16 codebooks, 2 pad bytes) followed by
+# the codes as little-endian int16, frame by frame. Packed records can be concatenated.
+CODE_FORMATS = ("json", "npy", "qtc")
+_QTC_MAGIC = b"QTC1"
+_QTC_HEADER = struct.Struct("<4sIH2x")
+
+
+def code_format(fmt: Optional[str]) -> str:
+    fmt = (fmt or "json").lower()
+    if fmt not in CODE_FORMATS:
+        raise ValueError(f"Unsupported code format {fmt!r}, expected one of {', '.join(CODE_FORMATS)}")
+    return fmt
+
+
+def pack_codes(codes: List[np.ndarray], fmt: str, batch: bool = False) -> bytes:
+    """Serialize code arrays as ``npy`` (``npz`` for a batch) or concatenated ``qtc`` records."""
+    buf = io.BytesIO()
+    if fmt == "qtc":
+        for c in codes:
+            buf.write(_QTC_HEADER.pack(_QTC_MAGIC, *c.shape))
+            buf.write(c.astype("<i2").tobytes())
+    elif batch:
+        np.savez(buf, *[c.astype("<i2") for c in codes])
+    else:
+        np.save(buf, codes[0].astype("<i2"), allow_pickle=False)
+    return buf.getvalue()
+
+
+def unpack_codes(data: bytes) -> List[np.ndarray]:
+    """Parse the code arrays of a payload in any of CODE_FORMATS (JSON: frames, ``{"codes"}`` or ``{"items"}``)."""
+    if data.startswith(_QTC_MAGIC):
+        codes, pos = [], 0
+        while pos < len(data):
+            magic, frames, books = _QTC_HEADER.unpack_from(data, pos) if len(data) - pos >= _QTC_HEADER.size else (b"",) * 3
+            end = pos + _QTC_HEADER.size + frames * books * 2
+            if magic != _QTC_MAGIC or end > len(data):
+                raise ValueError(f"Truncated or corrupt packed codes at byte {pos}")
+            codes.append(np.frombuffer(data, "<i2", frames * books, pos + _QTC_HEADER.size).reshape(frames, books).copy())
+            pos = end
+    elif data.startswith(b"\x93NUMPY"):
+        codes = [np.load(io.BytesIO(data), allow_pickle=False)]
+    elif data.startswith(b"PK"):
+        with np.load(io.BytesIO(data), allow_pickle=False) as npz:
+            codes = [npz[f"arr_{i}"] for i in range(len(npz.files))]
+    else:
+        obj = json.loads(data)
+        if isinstance(obj, dict):
+            obj = [it["codes"] for it in obj["items"]] if "items" in obj else [obj.get("codes")]
+        else:
+            obj = [obj]
+        codes = [np.asarray(c) for c in obj]
+    for c in codes:
+        if c.ndim != 2 or not c.shape[0] or not np.issubdtype(c.dtype, np.integer) or c.min() < 0 or c.max() > 32767:
+            raise ValueError("Codes must be a non-empty frames x codebooks array of non-negative integers")
+    return codes
+
+
+def _code_limits(tokenizer) -> tuple:
+    """``(num_quantizers, codebook_size)`` of the codes the tokenizer's decoder accepts."""
+    config = tokenizer.model.config.decoder_config
+    return config.num_quantizers, config.codebook_size
+
+
+_CODE_LIMITS = None   # _code_limits() of the speech tokenizer, read once
+
+
+async def _check_codes(dev: GPUManager, tokenizer, codes: List[np.ndarray]):
+    """Raise ValueError unless every array is frames x num_quantizers with codes below codebook_size.
+
+    The decoder looks codes up in its codebooks unchecked; an out-of-range code is an
+    IndexError on CPU and a device-side assert that breaks the CUDA context on GPU.
+    """
+    global _CODE_LIMITS
+    if _CODE_LIMITS is None:
+        _CODE_LIMITS, _, _ = await dev.run(_code_limits, tokenizer)
+    books, size = _CODE_LIMITS
+    for i, c in enumerate(codes):
+        if c.shape[1] != books:
+            raise ValueError(f"Code array {i} has {c.shape[1]} codebooks, the tokenizer expects {books}")
+        if c.max() >= size:
+            raise ValueError(f"Code array {i} has code {c.max()}, the tokenizer's codebooks have {size} entries")
+
+
+def _length_batches(lengths: List[int], size: int):
+    """Index lists of at most ``size`` items of similar length, so padding stays small."""
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    for i in range(0, len(order), max(size, 1)):
+        yield order[i:i + size]
+
+
+def _encode_audios(tokenizer, audios: List[tuple]) -> List[np.ndarray]:
+    """Encode ``(wav, sr)`` pairs in padded batches; returns int16 codes (frames x codebooks) in input order."""
+    out = [None] * len(audios)
+    for idx in _length_batches([len(w) / sr for w, sr in audios], TOKENIZER_BATCH_SIZE):
+        enc = tokenizer.encode([audios[i][0] for i in idx], sr=[audios[i][1] for i in idx])
+        for i, c in zip(idx, enc.audio_codes):
+            out[i] = c.cpu().numpy().astype(np.int16)
+    return out
+
+
+def _decode_codes(tokenizer, codes: List[np.ndarray]) -> tuple:
+    """Decode code arrays in padded batches; returns ``(wavs, sr)`` in input order."""
+    out, sr = [None] * len(codes), 0
+    for idx in _length_batches([len(c) for c in codes], TOKENIZER_BATCH_SIZE):
+        wavs, sr = tokenizer.decode({"audio_codes": [codes[i] for i in idx]})
+        for i, w in zip(idx, wavs):
+            out[i] = w
+    return out, sr
+
+
+def _stream_decode_job(tokenizer, codes: np.ndarray, emit, cancel: Optional[Cancellation] = None):
+    """Decode ``codes`` a window at a time, passing each ``(wav, sr)`` chunk to ``emit``; returns the frames decoded."""
+    sr = tokenizer.get_output_sample_rate()
+    state, pos, window = None, 0, STREAM_FIRST_CHUNK_FRAMES
+    while pos < len(codes):
+        if cancel is not None and cancel()[0]:
+            break
+        wav, state = tokenizer.streaming_decode(torch.tensor(codes[pos:pos + window]), state)
+        emit((wav, sr))
+        pos, window = pos + window, min(window * 2, STREAM_MAX_CHUNK_FRAMES)
+    return min(pos, len(codes))
+
+
+async def _read_audio(upload: UploadFile) -> tuple:
+    audio_np, audio_sr = sf.read(io.BytesIO(await upload.read()), dtype="float32")
+    return normalize_audio(audio_np), audio_sr
+
+
+def _codes_response(codes: List[np.ndarray], fmt: str, batch: bool = False):
+    if fmt == "json":
+        items = [{"codes": c.tolist(), "num_frames": len(c)} for c in codes]
+        return {"items": items} if batch else items[0]
+    ext = "qtc" if fmt == "qtc" else ("npz" if batch else "npy")
+    return Response(pack_codes(codes, fmt, batch), media_type="application/octet-stream",
+                    headers={"Content-Disposition": f"attachment; filename=codes.{ext}",
+                             "X-Num-Frames": ",".join(str(len(c)) for c in codes)})
+
+
 @app.post("/api/tokenizer/encode")
-async def api_tokenizer_encode(ref_audio: UploadFile = File(...)):
-    """Encode audio to speech tokens using Qwen3-TTS-Tokenizer-12Hz."""
+async def api_tokenizer_encode(ref_audio: UploadFile = File(...), format: str = Form("json")):
+    """Encode audio to speech tokens using Qwen3-TTS-Tokenizer-12Hz (``format``: json, npy or qtc)."""
     try:
-        content = await ref_audio.read()
-        audio_np, audio_sr = sf.read(io.BytesIO(content), dtype="float32")
-        audio_np = normalize_audio(audio_np)
-        tokenizer = await gpu.load_tokenizer()
-        enc = tokenizer.encode(audio_np, sr=audio_sr)
-        codes = enc.audio_codes[0].cpu().tolist()
-        return {"codes": codes, "num_frames": len(codes)}
+        fmt = code_format(format)
+        audio = await _read_audio(ref_audio)
+        async with devices.acquire("tokenizer") as (dev, tokenizer):
+            codes, _, _ = await dev.run(_encode_audios, tokenizer, [audio])
+        return _codes_response(codes, fmt)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         logger.exception("tokenizer-encode error")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/tokenizer/encode-batch")
+async def api_tokenizer_encode_batch(files: List[UploadFile] = File(...), format: str = Form("json")):
+    """Encode several audio files in padded batches; codes come back in upload order."""
+    try:
+        fmt = code_format(format)
+        audios = [await _read_audio(f) for f in files]
+        async with devices.acquire("tokenizer") as (dev, tokenizer):
+            codes, _, _ = await dev.run(_encode_audios, tokenizer, audios)
+        return _codes_response(codes, fmt, batch=True)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.exception("tokenizer-encode-batch error")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _single_codes(request: Request) -> np.ndarray:
+    codes = unpack_codes(await request.body())
+    if len(codes) != 1:
+        raise ValueError(f"Expected one code array, got {len(codes)}; use /api/tokenizer/decode-batch")
+    return codes[0]
+
+
 @app.post("/api/tokenizer/decode")
-async def api_tokenizer_decode(codes: List[List[int]]):
-    """Decode speech tokens back to audio."""
+async def api_tokenizer_decode(request: Request, format: str = ""):
+    """Decode speech tokens back to audio.
+
+    The body holds the codes as JSON (a list of frames, or the output of /api/tokenizer/encode),
+    .npy or packed qtc.
+    """
     try:
-        tokenizer = await gpu.load_tokenizer()
-        code_tensor = torch.tensor(codes).unsqueeze(0)
-        wavs, sr = tokenizer.decode({"audio_codes": code_tensor})
-        audio_dur = len(wavs[0]) / sr
-        return StreamingResponse(
-            io.BytesIO(wav_bytes(wavs[0], sr)), media_type="audio/wav",
-            headers={"Content-Disposition": "attachment; filename=decoded.wav",
-                     "X-Audio-Duration": f"{audio_dur:.3f}"})
+        fmt = audio_format(format, "wav")
+        codes = await _single_codes(request)
+        async with devices.acquire("tokenizer") as (dev, tokenizer):
+            await _check_codes(dev, tokenizer, [codes])
+            (wavs, sr), t_queue, t_gen = await dev.run(_decode_codes, tokenizer, [codes])
+        CODEC_FRAMES.inc(len(codes))
+        return await timed_audio_response(wavs[0], sr, 0.0, t_gen, "decoded", t_queue=t_queue, fmt=fmt)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         logger.exception("tokenizer-decode error")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-# ── Streaming TTS endpoints (PCM raw audio) ──
-def _pcm_stream(audio: np.ndarray, sr: int, chunk_duration: float = 0.25):
-    """Yield raw PCM s16le chunks for transfer-chunked playback."""
-    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
-    chunk_bytes = int(sr * chunk_duration) * 2
-    for i in range(0, len(pcm), chunk_bytes):
-        yield pcm[i:i + chunk_bytes]
+@app.post("/api/tokenizer/decode-batch")
+async def api_tokenizer_decode_batch(files: List[UploadFile] = File(...), format: str = Form("wav")):
+    """Decode several code files (each may hold several arrays) in padded batches; returns a zip of audio files."""
+    try:
+        fmt = audio_format(format, "wav")
+        codes = [c for f in files for c in unpack_codes(await f.read())]
+        async with devices.acquire("tokenizer") as (dev, tokenizer):
+            await _check_codes(dev, tokenizer, codes)
+            (wavs, sr), _, _ = await dev.run(_decode_codes, tokenizer, codes)
+        CODEC_FRAMES.inc(sum(len(c) for c in codes))
+        loop = asyncio.get_running_loop()
+        audio = await asyncio.gather(*[loop.run_in_executor(encode_pool, encode_audio, w, sr, fmt) for w in wavs])
+        buf = io.BytesIO()
+        ext = "raw" if fmt == "pcm" else fmt
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zf:
+            for i, data in enumerate(audio):
+                zf.writestr(f"decoded_{i:03d}.{ext}", data)
+        return Response(buf.getvalue(), media_type="application/zip",
+                        headers={"Content-Disposition": "attachment; filename=decoded.zip", **audio_headers(fmt, sr)})
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.exception("tokenizer-decode-batch error")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/tokenizer/decode/stream")
+async def api_tokenizer_decode_stream(request: Request, format: str = ""):
+    """Decode speech tokens as a stream of PCM s16le (or encoded) audio chunks, for long code sequences."""
+    try:
+        fmt = audio_format(format, "pcm", streaming=True)
+        codes = await _single_codes(request)
+        devices.check_queue()
+        stack = AsyncExitStack()
+        dev, tokenizer = await stack.enter_async_context(devices.acquire("tokenizer"))
+        try:
+            await _check_codes(dev, tokenizer, [codes])
+        except BaseException:
+            await stack.aclose()
+            raise
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue()
+        done = object()
+        cancel = Cancellation()
+
+        def finished(task):
+            if watch is not None:
+                watch.cancel()
+            exc = None if task.cancelled() else task.exception()
+            if not task.cancelled() and exc is None:
+                CODEC_FRAMES.inc(task.result()[0])
+            chunks.put_nowait(exc if exc is not None else done)
+            asyncio.ensure_future(stack.aclose())
+
+        async def watch_client(gone: asyncio.Event):
+            await gone.wait()
+            cancel.cancel()
+            CLIENT_DISCONNECTS.inc()
+            chunks.put_nowait(ClientDisconnected())
+
+        gone = _client_gone.get()
+        watch = asyncio.ensure_future(watch_client(gone)) if gone is not None else None
+        task = asyncio.ensure_future(dev.run(_stream_decode_job, tokenizer, codes, emit=chunks.put_nowait,
+                                             cancel=cancel))
+        task.add_done_callback(finished)
+        first = await chunks.get()
+        if isinstance(first, BaseException):
+            raise first
+        encoder = AudioEncoder(fmt, first[1])
+
+        async def body():
+            chunk = first
+            while chunk is not done:
+                if isinstance(chunk, ClientDisconnected):
+                    return
+                if isinstance(chunk, BaseException):
+                    logger.error("tokenizer-decode-stream aborted mid-stream: %s", chunk)
+                    break
+                data = await loop.run_in_executor(encode_pool, encoder.write, chunk[0])
+                if data:
+                    yield data
+                chunk = await chunks.get()
+            data = await loop.run_in_executor(encode_pool, encoder.close)
+            if data:
+                yield data
+
+        return StreamingResponse(body(), media_type=media_type(fmt, first[1]), headers=audio_headers(fmt, first[1]))
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.exception("tokenizer-decode-stream error")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ── Streaming TTS endpoints (PCM or encoded audio) ──
+def _stream_job(model, model_type: str, item: dict, gen: dict, emit, cancel: Optional[Cancellation] = None):
+    """Run a ``stream_*`` call and pass each ``(wav, sr)`` chunk to ``emit``; returns ``(audio_seconds, sr)``."""
+    gen = dict(gen, cancel=cancel)
+    seed = gen.pop("seed", None)
+    if seed is not None:
+        _seed(seed)
+    if gen.pop("long_form"):
+        stream, extra = model.stream_long, LONG_FORM_ARGS
+    else:
+        stream, extra = getattr(model, f"stream_{model_type}"), {}
+    audio_seconds = 0.0
+    for chunk in stream(**_item_kwargs(model, model_type, item), first_chunk_frames=STREAM_FIRST_CHUNK_FRAMES,
+                        max_chunk_frames=STREAM_MAX_CHUNK_FRAMES, **extra, **gen):
+        audio_seconds += len(chunk[0]) / chunk[1]
+        emit(chunk)
+    return audio_seconds, model.model.speech_tokenizer.get_output_sample_rate()
+
+
+async def _stream_tts(model_type: str, item: dict, gen: dict, name: str, fmt: str = "pcm"):
+    """Run a ``stream_*`` call on the executor and relay its chunks as PCM s16le.
+
+    Streaming requests bypass the micro-batcher: audio is pushed as soon as the
+    talker has produced the first STREAM_FIRST_CHUNK_FRAMES frames. The first chunk
+    is awaited before the response starts so request errors still map to HTTP
+    status codes; a failure after that ends the stream early, and so does a client
+    disconnect, which also stops the generation.
+    """
+    devices.check_queue()
+    t_start = time.time()
+    frames, cost = costs.estimate(model_type, item)
+    await costs.admit(cost)
+    stack = AsyncExitStack()
+    stack.push_async_callback(costs.release, cost)
+    try:
+        dev, model = await stack.enter_async_context(devices.acquire(model_type))
+    except BaseException:
+        await stack.aclose()
+        raise
+    t_load = time.time() - t_start
+    loop = asyncio.get_running_loop()
+    chunks = asyncio.Queue()
+    done = object()
+
+    def finished(task):
+        # The model reference is held until generation ends, even if the client left.
+        if watch is not None:
+            watch.cancel()
+        exc = None if task.cancelled() else task.exception()
+        chunks.put_nowait(exc if exc is not None else done)
+        if exc is None and not task.cancelled():
+            (audio_seconds, _), _, t_gen = task.result()
+            _observe_generation(model_type, audio_seconds, t_gen)
+            costs.observe(model_type, [item], [audio_seconds * CODEC_FRAME_RATE], t_gen)
+        asyncio.ensure_future(stack.aclose())
+
+    async def watch_client(gone: asyncio.Event):
+        await gone.wait()
+        cancel.cancel()
+        CLIENT_DISCONNECTS.inc()
+        chunks.put_nowait(ClientDisconnected())
+
+    cancel = Cancellation()
+    gone = _client_gone.get()
+    watch = asyncio.ensure_future(watch_client(gone)) if gone is not None else None
+    task = asyncio.ensure_future(dev.run(_stream_job, model, model_type, item, costs.cap(_long_form(item, gen), frames),
+                                         emit=chunks.put_nowait, cancel=cancel))
+    task.add_done_callback(finished)
+
+    first = await chunks.get()
+    if isinstance(first, BaseException):
+        raise first
+    t_first = time.time() - t_start
+    sr = first[1] if first is not done else task.result()[0][1]
+
+    encoder = AudioEncoder(fmt, sr)
+
+    async def body():
+        chunk = first
+        while chunk is not done:
+            if isinstance(chunk, ClientDisconnected):
+                return
+            if isinstance(chunk, BaseException):
+                logger.error("%s aborted mid-stream: %s", name, chunk)
+                break
+            data = await loop.run_in_executor(encode_pool, encoder.write, chunk[0])
+            if data:
+                yield data
+            chunk = await chunks.get()
+        data = await loop.run_in_executor(encode_pool, encoder.close)
+        if data:
+            yield data
+
+    return StreamingResponse(
+        body(), media_type=media_type(fmt, sr),
+        headers={**audio_headers(fmt, sr), "X-Time-Load": f"{t_load:.3f}", "X-Time-First-Chunk": f"{t_first:.3f}"})
 
 
 @app.post("/api/tts/custom-voice/stream")
 async def api_custom_voice_stream(req: CustomVoiceReq):
-    """Streaming custom voice TTS — returns raw PCM s16le audio chunks."""
+    """Streaming custom voice TTS — returns PCM s16le (or encoded) audio chunks."""
     try:
-        model = await gpu.load("custom_voice")
-        wavs, sr = model.generate_custom_voice(
-            text=req.text, language=req.language, speaker=req.speaker,
-            instruct=req.instruct or None,
-            **gen_kwargs(req.do_sample, req.top_k, req.top_p, req.temperature,
-                         req.repetition_penalty, req.max_new_tokens, req.subtalker_top_k,
-                         req.subtalker_top_p, req.subtalker_temperature))
-        return StreamingResponse(
-            _pcm_stream(wavs[0], sr),
-            media_type=f"audio/pcm;rate={sr};encoding=signed-int;bits=16",
-            headers={"X-Sample-Rate": str(sr), "X-Audio-Format": "pcm_s16le", "X-Audio-Channels": "1"})
+        return await _stream_tts(
+            "custom_voice",
+            dict(text=req.text, language=req.language, speaker=req.speaker, instruct=req.instruct),
+            gen_kwargs(req.do_sample, req.top_k, req.top_p, req.temperature,
+                       req.repetition_penalty, req.max_new_tokens, req.subtalker_top_k,
+                       req.subtalker_top_p, req.subtalker_temperature, req.seed, req.long_form),
+            "custom-voice-stream", audio_format(req.format, "pcm", streaming=True))
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
@@ -576,18 +3353,17 @@ async def api_custom_voice_stream(req: CustomVoiceReq):
 
 @app.post("/api/tts/voice-design/stream")
 async def api_voice_design_stream(req: VoiceDesignReq):
-    """Streaming voice design TTS — returns raw PCM s16le audio chunks."""
+    """Streaming voice design TTS — returns PCM s16le (or encoded) audio chunks."""
     try:
-        model = await gpu.load("voice_design")
-        wavs, sr = model.generate_voice_design(
-            text=req.text, language=req.language, instruct=req.instruct,
-            **gen_kwargs(req.do_sample, req.top_k, req.top_p, req.temperature,
-                         req.repetition_penalty, req.max_new_tokens, req.subtalker_top_k,
-                         req.subtalker_top_p, req.subtalker_temperature))
-        return StreamingResponse(
-            _pcm_stream(wavs[0], sr),
-            media_type=f"audio/pcm;rate={sr};encoding=signed-int;bits=16",
-            headers={"X-Sample-Rate": str(sr), "X-Audio-Format": "pcm_s16le", "X-Audio-Channels": "1"})
+        return await _stream_tts(
+            "voice_design",
+            dict(text=req.text, language=req.language, instruct=req.instruct),
+            gen_kwargs(req.do_sample, req.top_k, req.top_p, req.temperature,
+                       req.repetition_penalty, req.max_new_tokens, req.subtalker_top_k,
+                       req.subtalker_top_p, req.subtalker_temperature, req.seed, req.long_form),
+            "voice-design-stream", audio_format(req.format, "pcm", streaming=True))
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
@@ -602,23 +3378,25 @@ async def api_voice_clone_stream(
     top_k: int = Form(50), top_p: float = Form(0.9), temperature: float = Form(1.0),
     repetition_penalty: float = Form(1.05), max_new_tokens: int = Form(2048),
     subtalker_top_k: int = Form(50), subtalker_top_p: float = Form(0.9),
-    subtalker_temperature: float = Form(1.0), ref_audio: UploadFile = File(...),
+    subtalker_temperature: float = Form(1.0), ref_audio: Optional[UploadFile] = File(None),
+    voice_id: str = Form(""), seed: Optional[int] = Form(None), long_form: Optional[bool] = Form(None),
+    format: str = Form(""),
 ):
-    """Streaming voice clone TTS — returns raw PCM s16le audio chunks."""
+    """Streaming voice clone TTS — returns PCM s16le (or encoded) audio chunks."""
     try:
-        content = await ref_audio.read()
-        audio_np, audio_sr = sf.read(io.BytesIO(content), dtype="float32")
-        audio_np = normalize_audio(audio_np)
-        model = await gpu.load("voice_clone")
-        wavs, sr = model.generate_voice_clone(
-            text=text, language=language, ref_audio=(audio_np, audio_sr),
-            ref_text=ref_text or None, x_vector_only_mode=x_vector_only_mode,
-            **gen_kwargs(do_sample, top_k, top_p, temperature, repetition_penalty,
-                         max_new_tokens, subtalker_top_k, subtalker_top_p, subtalker_temperature))
-        return StreamingResponse(
-            _pcm_stream(wavs[0], sr),
-            media_type=f"audio/pcm;rate={sr};encoding=signed-int;bits=16",
-            headers={"X-Sample-Rate": str(sr), "X-Audio-Format": "pcm_s16le", "X-Audio-Channels": "1"})
+        fmt = audio_format(format, "pcm", streaming=True)
+        item, voice_id = await _voice_clone_item(text, language, ref_audio, ref_text,
+                                                 x_vector_only_mode, voice_id)
+        resp = await _stream_tts(
+            "voice_clone", item,
+            gen_kwargs(do_sample, top_k, top_p, temperature, repetition_penalty,
+                       max_new_tokens, subtalker_top_k, subtalker_top_p, subtalker_temperature, seed,
+                       long_form),
+            "voice-clone-stream", fmt)
+        resp.headers["X-Voice-Id"] = voice_id
+        return resp
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
@@ -626,6 +3404,299 @@ async def api_voice_clone_stream(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ── Bulk jobs ──
+class JobItem(CustomVoiceReq):
+    """One item of a bulk job; fields that do not apply to ``model_type`` are ignored."""
+    model_type: str = "custom_voice"   # custom_voice / voice_design / voice_clone
+    voice_id: str = ""                 # voice_clone: a voice from the voice prompt cache
+    name: Optional[str] = None         # client label, echoed in the results
+
+
+async def _parse_job_items(raw: bytes) -> List[JobItem]:
+    """Parse a JSON array, ``{"items": [...]}`` or JSON lines into validated items.
+
+    Voice clone items must name a voice that is in the voice prompt cache now.
+    """
+    text = raw.decode("utf-8")
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        data = [json.loads(line) for line in text.splitlines() if line.strip()]
+    if isinstance(data, dict):
+        data = data["items"] if "items" in data else [data]
+    if not isinstance(data, list) or not data:
+        raise ValueError("Expected a JSON array or JSON lines of synthesis items")
+    items = []
+    for i, d in enumerate(data):
+        if not isinstance(d, dict):
+            raise ValueError(f"Item {i}: expected an object")
+        try:
+            it = JobItem(**d)
+            if it.model_type not in MODEL_MAP:
+                raise ValueError(f"Unknown model_type {it.model_type!r}")
+            if it.model_type == "voice_clone" and not it.voice_id:
+                raise ValueError("voice_clone items need a voice_id (see /api/voice-prompt/save)")
+            if it.model_type == "voice_clone" and await voices.get(it.voice_id) is None:
+                raise ValueError(f"Unknown voice_id: {it.voice_id}")
+            audio_format(it.format, "wav")
+        except ValueError as e:
+            raise ValueError(f"Item {i}: {e}")
+        items.append(it)
+    return items
+
+
+async def _job_request(it: JobItem):
+    """``(model_type, item, gen, key_fields)`` for ``synthesize()``, built like the TTS endpoints do."""
+    gen = gen_kwargs(it.do_sample, it.top_k, it.top_p, it.temperature, it.repetition_penalty, it.max_new_tokens,
+                     it.subtalker_top_k, it.subtalker_top_p, it.subtalker_temperature, it.seed, it.long_form)
+    if it.model_type == "custom_voice":
+        item = dict(text=it.text, language=it.language, speaker=it.speaker, instruct=it.instruct)
+        return it.model_type, item, gen, item
+    if it.model_type == "voice_design":
+        item = dict(text=it.text, language=it.language, instruct=it.instruct)
+        return it.model_type, item, gen, item
+    prompt = await voices.get(it.voice_id)
+    if prompt is None:
+        raise ValueError(f"Unknown voice_id: {it.voice_id}")
+    return (it.model_type, dict(text=it.text, language=it.language, voice_clone_prompt=prompt, ref_text=prompt.ref_text),
+            gen, dict(text=it.text, language=it.language, voice_id=it.voice_id))
+
+
+def _write_file(path: str, data: bytes):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class Job:
+    def __init__(self, job_id: str, directory: str, items: List[JobItem], created: float, state: str = "queued"):
+        self.id = job_id
+        self.directory = directory
+        self.items = items
+        self.created = created
+        self.state = state      # queued / running / done / cancelled
+        self.results = {}       # index -> result record (see JobQueue._run_item)
+
+    def summary(self) -> dict:
+        failed = sum(1 for r in self.results.values() if "error" in r)
+        return {"job_id": self.id, "state": self.state, "created": self.created, "total": len(self.items),
+                "done": len(self.results) - failed, "failed": failed}
+
+
+class JobQueue:
+    """Background runner for bulk synthesis jobs.
+
+    Each job is a directory under JOBS_DIR with ``manifest.json`` (the items), one
+    audio file per finished item and ``results.jsonl``, an append-only log of
+    finished and failed items. Items go through the result cache and the
+    micro-batcher BATCH_MAX_SIZE at a time, sorted by model type and text length so
+    that each window forms one batch; this also leaves room in the inference queue
+    for interactive requests. Jobs run one after another. After a restart, unfinished
+    jobs are queued again: they skip the items finished in their log and retry the
+    failed ones. A failure is final once its job is done.
+    """
+
+    def __init__(self, directory: str = JOBS_DIR):
+        self.directory = directory
+        self.jobs = OrderedDict()   # job id -> Job, oldest first
+        self._queue = None
+        self._task = None
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        for job in await asyncio.to_thread(self._scan):
+            self.jobs[job.id] = job
+            if job.state in ("queued", "running"):
+                job.state = "queued"
+                self._queue.put_nowait(job)
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    def _scan(self) -> List[Job]:
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir() or not os.path.exists(os.path.join(entry.path, "manifest.json")):
+                continue
+            try:
+                job = self._load(entry.name, entry.path)
+            except Exception:
+                logger.exception(f"Unreadable job {entry.path}")
+                continue
+            if job.state == "cancelled":
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                found.append(job)
+        return sorted(found, key=lambda j: j.created)
+
+    @staticmethod
+    def _load(job_id: str, directory: str) -> Job:
+        with open(os.path.join(directory, "manifest.json")) as f:
+            manifest = json.load(f)
+        state = "queued"
+        if os.path.exists(os.path.join(directory, "state")):
+            with open(os.path.join(directory, "state")) as f:
+                state = f.read().strip()
+        job = Job(job_id, directory, [JobItem(**it) for it in manifest["items"]], manifest["created"], state)
+        log = os.path.join(directory, "results.jsonl")
+        if os.path.exists(log):
+            with open(log) as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue   # torn write of the last record; the item runs again
+                    if "error" in rec and state != "done":
+                        job.results.pop(rec["index"], None)   # retried on resume
+                    elif "error" in rec or os.path.exists(os.path.join(directory, rec["file"])):
+                        job.results[rec["index"]] = rec
+        return job
+
+    def get(self, job_id: str) -> Job:
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+        return job
+
+    async def submit(self, items: List[JobItem]) -> Job:
+        job_id = uuid.uuid4().hex[:16]
+        job = Job(job_id, os.path.join(self.directory, job_id), items, time.time())
+        manifest = {"job_id": job_id, "created": job.created, "items": [it.model_dump() for it in items]}
+        await asyncio.to_thread(os.makedirs, job.directory, exist_ok=True)
+        await asyncio.to_thread(_write_file, os.path.join(job.directory, "manifest.json"),
+                                json.dumps(manifest, ensure_ascii=False).encode())
+        self.jobs[job_id] = job
+        self._queue.put_nowait(job)
+        return job
+
+    async def cancel(self, job_id: str):
+        """Stop a job and delete its files (a running job stops after its current window)."""
+        job = self.get(job_id)
+        running = job.state == "running"
+        job.state = "cancelled"
+        self.jobs.pop(job_id, None)
+        if running:
+            await asyncio.to_thread(_write_file, os.path.join(job.directory, "state"), b"cancelled")
+        else:
+            await asyncio.to_thread(shutil.rmtree, job.directory, True)
+
+    async def _loop(self):
+        while True:
+            job = await self._queue.get()
+            if job.state != "queued":
+                continue
+            try:
+                await self._run(job)
+            except Exception:
+                logger.exception(f"Job {job.id} failed")
+
+    async def _run(self, job: Job):
+        job.state = "running"
+        todo = sorted((i for i in range(len(job.items)) if i not in job.results),
+                      key=lambda i: (job.items[i].model_type, len(job.items[i].text)))
+        window = max(BATCH_MAX_SIZE, 1)
+        for start in range(0, len(todo), window):
+            if job.state != "running":
+                break
+            await asyncio.gather(*(self._run_item(job, i) for i in todo[start:start + window]))
+        if job.state == "cancelled":
+            await asyncio.to_thread(shutil.rmtree, job.directory, True)
+            return
+        job.state = "done"
+        await asyncio.to_thread(_write_file, os.path.join(job.directory, "state"), b"done")
+        logger.info(f"Job {job.id} finished: {job.summary()}")
+
+    async def _run_item(self, job: Job, index: int):
+        _priority.set("batch")
+        it = job.items[index]
+        rec = {"index": index, "name": it.name}
+        try:
+            model_type, item, gen, key_fields = await _job_request(it)
+            while True:
+                try:
+                    wav, sr, _, _, t_gen, cache = await synthesize(model_type, item, gen, key_fields)
+                    break
+                except QueueFullError:
+                    await asyncio.sleep(INFER_RETRY_AFTER)
+            fmt = audio_format(it.format, "wav")
+            data = await asyncio.get_running_loop().run_in_executor(encode_pool, encode_audio, wav, sr, fmt)
+            rec.update(file=f"{index:06d}.{'raw' if fmt == 'pcm' else fmt}", format=fmt, sample_rate=sr,
+                       duration=round(len(wav) / sr, 3), time_gen=round(t_gen, 3), cache=cache)
+            if job.state == "cancelled":
+                return
+            await asyncio.to_thread(_write_file, os.path.join(job.directory, rec["file"]), data)
+        except Exception as e:
+            if job.state == "cancelled":
+                return
+            rec["error"] = e.detail if isinstance(e, HTTPException) else str(e)
+            logger.warning(f"Job {job.id} item {index} failed: {rec['error']}")
+        job.results[index] = rec
+        await asyncio.to_thread(self._append_log, job, rec)
+
+    @staticmethod
+    def _append_log(job: Job, rec: dict):
+        with open(os.path.join(job.directory, "results.jsonl"), "a") as f:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+
+jobs = JobQueue()
+
+
+@app.post("/api/jobs", status_code=202)
+async def api_create_job(request: Request):
+    """Submit a bulk synthesis job: a JSON array, ``{"items": [...]}`` or JSON lines of items.
+
+    Items take the fields of /api/tts/custom-voice plus ``model_type``, ``voice_id``
+    (voice_clone, from the voice prompt cache) and an optional ``name``.
+    """
+    try:
+        items = await _parse_job_items(await request.body())
+        return (await jobs.submit(items)).summary()
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@app.get("/api/jobs")
+async def api_list_jobs():
+    return {"jobs": [job.summary() for job in jobs.jobs.values()]}
+
+
+@app.get("/api/jobs/{job_id}")
+async def api_job_status(job_id: str):
+    return jobs.get(job_id).summary()
+
+
+@app.get("/api/jobs/{job_id}/results")
+async def api_job_results(job_id: str):
+    """Finished and failed items so far, in item order."""
+    job = jobs.get(job_id)
+    results = [dict(rec) for _, rec in sorted(job.results.items())]
+    for rec in results:
+        if "file" in rec:
+            rec["url"] = f"/api/jobs/{job_id}/items/{rec['index']}"
+    return {**job.summary(), "results": results}
+
+
+@app.get("/api/jobs/{job_id}/items/{index}")
+async def api_job_item(job_id: str, index: int):
+    job = jobs.get(job_id)
+    rec = job.results.get(index)
+    if rec is None or "file" not in rec:
+        raise HTTPException(status_code=404, detail=f"Item {index} of job {job_id} is not finished")
+    return FileResponse(os.path.join(job.directory, rec["file"]), media_type=media_type(rec["format"], rec["sample_rate"]),
+                        filename=rec["file"], headers=audio_headers(rec["format"], rec["sample_rate"]))
+
+
+@app.delete("/api/jobs/{job_id}")
+async def api_cancel_job(job_id: str):
+    await jobs.cancel(job_id)
+    return {"message": f"Job {job_id} cancelled"}
+
+
 # ── HTML UI ──
 _UI_TEMPLATE = None
 
@@ -20,5 +20,6 @@ qwen_tts: Qwen-TTS package.
 
 from .inference.qwen3_tts_model import Qwen3TTSModel, VoiceClonePromptItem
 from .inference.qwen3_tts_tokenizer import Qwen3TTSTokenizer
+from .core.telemetry import add_stage_observer, remove_stage_observer
 
 __all__ = ["__version__"]
\ No newline at end of file
@@ -0,0 +1,65 @@
+# coding=utf-8
+# Copyright 2026 The Alibaba Qwen team.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Cooperative cancellation of generation.
+
+The generate and stream methods accept `cancel`, a callable that returns either one bool for the
+whole call or one bool per batch row. The talker polls it every `cancel_check_frames` frames and
+stops a cancelled row as if it had emitted EOS, so the other rows of the batch keep decoding;
+the wrapper then skips the codec decode for cancelled rows and returns empty waveforms for them.
+
+`cancel` is called on the generating thread between frames, so it may also block to pause the
+call while other calls use the same model; the talker restores its per-call state afterwards.
+"""
+from typing import Callable, List, Optional, Sequence, Union
+
+import torch
+from transformers.generation.stopping_criteria import StoppingCriteria
+
+CancelFn = Callable[[], Union[bool, Sequence[bool]]]
+
+# 4 frames of the 12Hz codec: a cancelled row stops within ~330 ms of audio.
+DEFAULT_CHECK_FRAMES = 4
+
+
+def cancel_flags(cancel: Optional[CancelFn], batch_size: int) -> List[bool]:
+    """Per-row cancel flags of `cancel` (all False when `cancel` is None)."""
+    if cancel is None:
+        return [False] * batch_size
+    flags = cancel()
+    if isinstance(flags, bool):
+        return [flags] * batch_size
+    flags = [bool(f) for f in flags]
+    if len(flags) != batch_size:
+        raise ValueError(f"cancel() returned {len(flags)} flags for a batch of {batch_size}.")
+    return flags
+
+
+class CancelCriteria(StoppingCriteria):
+    """Stops the rows `cancel` flags, polling it every `check_frames` calls."""
+
+    def __init__(self, cancel: CancelFn, check_frames: int = DEFAULT_CHECK_FRAMES):
+        self.cancel = cancel
+        self.check_frames = max(int(check_frames), 1)
+        self.calls = 0
+        self.stopped: Optional[torch.BoolTensor] = None
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        if self.stopped is None or self.calls % self.check_frames == 0:
+            flags = cancel_flags(self.cancel, input_ids.shape[0])
+            self.stopped = torch.tensor(flags, dtype=torch.bool, device=input_ids.device)
+        self.calls += 1
+        return self.stopped
@@ -14,9 +14,13 @@
 # limitations under the License.
 """PyTorch Qwen3TTS model."""
 
+import hashlib
+import itertools
 import json
 import os
-from dataclasses import dataclass
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
 from typing import Callable, Optional
 
 import huggingface_hub
@@ -28,6 +32,13 @@ from torch.nn import functional as F
 from transformers.activations import ACT2FN
 from transformers.cache_utils import Cache, DynamicCache
 from transformers.generation import GenerationMixin
+from transformers.generation.logits_process import (LogitsProcessorList,
+                                                    MinNewTokensLengthLogitsProcessor,
+                                                    RepetitionPenaltyLogitsProcessor,
+                                                    SuppressTokensLogitsProcessor,
+                                                    TemperatureLogitsWarper,
+                                                    TopKLogitsWarper,
+                                                    TopPLogitsWarper)
 from transformers.integrations import use_kernel_forward_from_hub
 from transformers.masking_utils import (create_causal_mask,
                                         create_sliding_window_causal_mask)
@@ -44,6 +55,8 @@ from transformers.utils import can_return_tuple, logging
 from transformers.utils.hub import cached_file
 
 from ...inference.qwen3_tts_tokenizer import Qwen3TTSTokenizer
+from ..cancellation import DEFAULT_CHECK_FRAMES, CancelFn, cancel_flags
+from ..telemetry import stage
 from .configuration_qwen3_tts import (Qwen3TTSConfig,
                                       Qwen3TTSSpeakerEncoderConfig,
                                       Qwen3TTSTalkerCodePredictorConfig,
@@ -1153,6 +1166,55 @@ class Qwen3TTSTalkerCodePredictorModel(Qwen3TTSPreTrainedModel):
         )
 
 
+class Qwen3TTSCodePredictorCache:
+    """
+    Buffers of the code predictor that are reused across the frames of one talker call.
+
+    Every frame runs the predictor over the same `num_code_groups` positions (talker hidden state,
+    first codebook, then one per residual codebook), so the KV cache, the rotary tables, the
+    sampling processors and the output buffers are allocated once, on the first frame, and
+    overwritten in place. The batch may shrink between frames; rows past it are ignored.
+    """
+
+    def __init__(
+        self,
+        predictor: "Qwen3TTSTalkerCodePredictorModelForConditionalGeneration",
+        batch_size: int,
+        embedding_dim: int,
+        logits_processor: LogitsProcessorList,
+        do_sample: bool,
+        dtype: torch.dtype,
+        device: torch.device,
+    ):
+        config = predictor.config
+        num_positions = config.num_code_groups
+        shape = (batch_size, config.num_key_value_heads, num_positions, config.head_dim)
+        self.keys = [torch.empty(shape, dtype=dtype, device=device) for _ in range(config.num_hidden_layers)]
+        self.values = [torch.empty(shape, dtype=dtype, device=device) for _ in range(config.num_hidden_layers)]
+        self.length = 0
+        self.cos, self.sin = predictor.model.rotary_emb(
+            self.keys[0], torch.arange(num_positions, device=device).unsqueeze(0)
+        )
+        # The prefill covers two positions; eager attention needs the causal mask spelled out,
+        # the other implementations apply it themselves when no mask is given.
+        self.prefill_mask = None
+        if config._attn_implementation == "eager":
+            self.prefill_mask = torch.full((2, 2), torch.finfo(dtype).min, dtype=dtype, device=device).triu(1)[None, None]
+        self.logits_processor = logits_processor
+        self.do_sample = do_sample
+        self.codes = torch.empty((batch_size, num_positions - 1), dtype=torch.long, device=device)
+        self.embeds = torch.empty((batch_size, num_positions, embedding_dim), dtype=dtype, device=device)
+
+    def update(self, key_states, value_states, layer_idx, cache_kwargs=None):
+        """Write the new positions of a layer and return its keys and values so far (the `Cache.update` contract)."""
+        batch_size, _, length, _ = key_states.shape
+        end = self.length + length
+        keys, values = self.keys[layer_idx][:batch_size], self.values[layer_idx][:batch_size]
+        keys[:, :, self.length:end] = key_states
+        values[:, :, self.length:end] = value_states
+        return keys[:, :, :end], values[:, :, :end]
+
+
 class Qwen3TTSTalkerCodePredictorModelForConditionalGeneration(Qwen3TTSPreTrainedModel, GenerationMixin):
     _tied_weights_keys = ["lm_head.weight"]
     _tp_plan = {"lm_head": "colwise_rep"}
@@ -1318,6 +1380,96 @@ class Qwen3TTSTalkerCodePredictorModelForConditionalGeneration(Qwen3TTSPreTraine
         model_kwargs["generation_steps"] = outputs.generation_steps
         return model_kwargs
 
+    def sampling_settings(
+        self,
+        do_sample: Optional[bool] = None,
+        top_k: Optional[int] = None,
+        top_p: Optional[float] = None,
+        temperature: Optional[float] = None,
+    ) -> tuple:
+        """`(do_sample, top_k, top_p, temperature)`, with the values left as None taken from `generation_config`."""
+        generation_config = self.generation_config
+        return (
+            generation_config.do_sample if do_sample is None else do_sample,
+            generation_config.top_k if top_k is None else top_k,
+            generation_config.top_p if top_p is None else top_p,
+            generation_config.temperature if temperature is None else temperature,
+        )
+
+    def new_cache(
+        self,
+        batch_size: int,
+        embedding_dim: int,
+        do_sample: Optional[bool] = None,
+        top_k: Optional[int] = None,
+        top_p: Optional[float] = None,
+        temperature: Optional[float] = None,
+    ) -> Qwen3TTSCodePredictorCache:
+        """Allocate the per-call buffers of `predict`, with the sampling processors `generate` would build."""
+        do_sample, top_k, top_p, temperature = self.sampling_settings(do_sample, top_k, top_p, temperature)
+        processors = LogitsProcessorList()
+        if do_sample:
+            if temperature is not None and temperature != 1.0:
+                processors.append(TemperatureLogitsWarper(temperature))
+            if top_k is not None and top_k != 0:
+                processors.append(TopKLogitsWarper(top_k=top_k))
+            if top_p is not None and top_p < 1.0:
+                processors.append(TopPLogitsWarper(top_p=top_p))
+        return Qwen3TTSCodePredictorCache(self, batch_size, embedding_dim, processors, do_sample, self.dtype, self.device)
+
+    @torch.no_grad()
+    def predict(self, inputs_embeds: torch.Tensor, cache: Qwen3TTSCodePredictorCache):
+        """
+        Sample the residual codebooks of one frame.
+
+        Equivalent to `generate(inputs_embeds=..., max_new_tokens=num_code_groups - 1)` with the
+        processors of `cache`, down to the random draws, but runs the decoder layers directly on
+        the preallocated cache instead of setting up a generation per frame.
+
+        Args:
+            inputs_embeds (`torch.FloatTensor` of shape `(batch_size, 2, talker_hidden_size)`):
+                The talker hidden state and the embedding of the first codebook.
+            cache (`Qwen3TTSCodePredictorCache`):
+                Buffers from `new_cache`, reused across the frames of one call.
+
+        Returns:
+            codes (`torch.LongTensor` of shape `(batch_size, num_code_groups - 1)`) and the input
+            embeddings of all codebooks of the frame, first one included
+            (`(batch_size, num_code_groups, talker_hidden_size)`). Both are views of `cache` that
+            the next call overwrites.
+        """
+        batch_size = inputs_embeds.shape[0]
+        codes, embeds = cache.codes[:batch_size], cache.embeds[:batch_size]
+        embeds[:, 0] = inputs_embeds[:, 1]
+        layers = self.model.layers[: self.config.num_hidden_layers]
+        hidden_states = self.small_to_mtp_projection(inputs_embeds)
+        attention_mask = cache.prefill_mask
+        cache.length = 0
+        for step in range(self.config.num_code_groups - 1):
+            end = cache.length + hidden_states.shape[1]
+            position_embeddings = (cache.cos[:, cache.length:end], cache.sin[:, cache.length:end])
+            for decoder_layer in layers:
+                hidden_states = decoder_layer(
+                    hidden_states,
+                    attention_mask=attention_mask,
+                    past_key_values=cache,
+                    position_embeddings=position_embeddings,
+                )[0]
+            cache.length, attention_mask = end, None
+            logits = self.lm_head[step](self.model.norm(hidden_states))
+            scores = logits[:, -1, :].float()
+            for processor in cache.logits_processor:   # warpers only: skips the list's per-call signature checks
+                scores = processor(codes[:, :step], scores)
+            if cache.do_sample:
+                next_codes = torch.multinomial(torch.softmax(scores, dim=-1), num_samples=1).squeeze(1)
+            else:
+                next_codes = torch.argmax(scores, dim=-1)
+            codes[:, step] = next_codes
+            embeds[:, step + 1] = self.model.codec_embedding[step](next_codes)
+            if step < self.config.num_code_groups - 2:
+                hidden_states = self.small_to_mtp_projection(embeds[:, step + 1:step + 2])
+        return codes, embeds
+
 
 @dataclass
 class Qwen3TTSTalkerOutputWithPast(ModelOutput):
@@ -1343,6 +1495,7 @@ class Qwen3TTSTalkerOutputWithPast(ModelOutput):
     generation_step: Optional[int] = None
     trailing_text_hidden: Optional[torch.FloatTensor] = None
     tts_pad_embed: Optional[torch.FloatTensor] = None
+    predictor_cache: Optional[Qwen3TTSCodePredictorCache] = None
 
 
 class Qwen3TTSTalkerDecoderLayer(GradientCheckpointingLayer):
@@ -1653,6 +1806,7 @@ class Qwen3TTSTalkerForConditionalGeneration(Qwen3TTSTalkerTextPreTrainedModel,
         subtalker_top_p=None,
         subtalker_top_k=None,
         subtalker_temperature=None,
+        predictor_cache=None,
         **kwargs,
     ) -> CausalLMOutputWithPast:
         r"""
@@ -1661,29 +1815,24 @@ class Qwen3TTSTalkerForConditionalGeneration(Qwen3TTSTalkerTextPreTrainedModel,
             config.vocab_size]` or -100 (see `input_ids` docstring). Tokens with indices set to `-100` are ignored
             (masked), the loss is only computed for the tokens with labels in `[0, ..., config.vocab_size]`.
         ```"""
-        # Prefill
-        if inputs_embeds is not None and inputs_embeds.shape[1] > 1:
+        # Prefill (a single position when the rest of the prompt follows cached prefixes)
+        if inputs_embeds is not None and (inputs_embeds.shape[1] > 1 or past_hidden is None):
             generation_step = -1
             codec_ids = None
         # Generate
         else:
             last_id_hidden = self.get_input_embeddings()(input_ids)
-            predictor_result = self.code_predictor.generate(
-                inputs_embeds=torch.cat((past_hidden, last_id_hidden), dim=1),
-                max_new_tokens=self.config.num_code_groups - 1,
-                do_sample=subtalker_dosample,
-                top_p=subtalker_top_p,
-                top_k=subtalker_top_k,
-                temperature=subtalker_temperature,
-                output_hidden_states=True,
-                return_dict_in_generate=True,
-            )
-            codec_ids = torch.cat((input_ids, predictor_result.sequences), dim=-1)
-            codec_hiddens = torch.cat(
-                [last_id_hidden]
-                + [self.code_predictor.get_input_embeddings()[i](predictor_result.sequences[..., i:i+1]) for i in range(self.config.num_code_groups - 1)],
-                dim=1,
-            )
+            if predictor_cache is None:
+                predictor_cache = self.code_predictor.new_cache(
+                    input_ids.shape[0], self.config.hidden_size,
+                    do_sample=subtalker_dosample, top_k=subtalker_top_k, top_p=subtalker_top_p,
+                    temperature=subtalker_temperature,
+                )
+            with stage("code_predictor"):
+                predicted_codes, codec_hiddens = self.code_predictor.predict(
+                    torch.cat((past_hidden, last_id_hidden), dim=1), predictor_cache
+                )
+            codec_ids = torch.cat((input_ids, predicted_codes), dim=-1)
             inputs_embeds = codec_hiddens.sum(1, keepdim=True)
 
             if generation_step < trailing_text_hidden.shape[1]:
@@ -1695,11 +1844,13 @@ class Qwen3TTSTalkerForConditionalGeneration(Qwen3TTSTalkerTextPreTrainedModel,
                 cache_position is None
                 or (cache_position is not None and cache_position[0] == 0)
                 or self.rope_deltas is None
+                or generation_step == -1
             ):
                 delta0 = (1 - attention_mask).sum(dim=-1).unsqueeze(1)
                 position_ids, rope_deltas = self.get_rope_index(
                     attention_mask,
                 )
+                position_ids = position_ids[..., attention_mask.shape[1] - inputs_embeds.shape[1]:]
                 rope_deltas = rope_deltas - delta0
                 self.rope_deltas = rope_deltas
             else:
@@ -1710,21 +1861,22 @@ class Qwen3TTSTalkerForConditionalGeneration(Qwen3TTSTalkerTextPreTrainedModel,
                 position_ids = position_ids.add(delta)
                 position_ids = position_ids.unsqueeze(0).expand(3, -1, -1)
 
-        outputs: BaseModelOutputWithPast = self.model(
-            input_ids=None,
-            attention_mask=attention_mask,
-            position_ids=position_ids,
-            past_key_values=past_key_values,
-            inputs_embeds=inputs_embeds,
-            use_cache=use_cache,
-            output_attentions=output_attentions,
-            output_hidden_states=output_hidden_states,
-            cache_position=cache_position,
-            **kwargs,
-        )
+        with stage("talker_prefill" if generation_step == -1 else "talker_decode"):
+            outputs: BaseModelOutputWithPast = self.model(
+                input_ids=None,
+                attention_mask=attention_mask,
+                position_ids=position_ids,
+                past_key_values=past_key_values,
+                inputs_embeds=inputs_embeds,
+                use_cache=use_cache,
+                output_attentions=output_attentions,
+                output_hidden_states=output_hidden_states,
+                cache_position=cache_position,
+                **kwargs,
+            )
 
-        hidden_states = outputs.last_hidden_state
-        logits = self.codec_head(hidden_states)
+            hidden_states = outputs.last_hidden_state
+            logits = self.codec_head(hidden_states)
 
         loss = None
         if labels is not None:
@@ -1741,6 +1893,7 @@ class Qwen3TTSTalkerForConditionalGeneration(Qwen3TTSTalkerTextPreTrainedModel,
             generation_step=generation_step + 1,
             trailing_text_hidden=trailing_text_hidden,
             tts_pad_embed=tts_pad_embed,
+            predictor_cache=predictor_cache,
         )
 
     def get_rope_index(
@@ -1807,6 +1960,7 @@ class Qwen3TTSTalkerForConditionalGeneration(Qwen3TTSTalkerTextPreTrainedModel,
         model_kwargs["generation_step"] = outputs.generation_step
         model_kwargs["trailing_text_hidden"] = outputs.trailing_text_hidden
         model_kwargs["tts_pad_embed"] = outputs.tts_pad_embed
+        model_kwargs["predictor_cache"] = outputs.predictor_cache
         return model_kwargs
 
 
@@ -1826,6 +1980,8 @@ class Qwen3TTSForConditionalGeneration(Qwen3TTSPreTrainedModel, GenerationMixin)
 
         self.speech_tokenizer = None
         self.generate_config = None
+        self.prefix_cache: Optional[Qwen3TTSTalkerPrefixCache] = None
+        self._prompt_embed_tables = {}   # (device, dtype) -> see _prompt_embeds
 
         self.supported_speakers = self.config.talker_config.spk_id.keys()
         self.supported_languages = ["auto"]
@@ -1843,6 +1999,14 @@ class Qwen3TTSForConditionalGeneration(Qwen3TTSPreTrainedModel, GenerationMixin)
     def load_speech_tokenizer(self, speech_tokenizer):
         self.speech_tokenizer = speech_tokenizer
     
+    def enable_prefix_cache(self, max_tokens: int = 4096):
+        """
+        Keep the talker KV states of prompt prefixes and prefill only the rest of later prompts that share
+        them, see `Qwen3TTSTalkerPrefixCache`. Used by `generate`, `generate_stream` and the engines of
+        this model; `max_tokens=0` turns it off again.
+        """
+        self.prefix_cache = Qwen3TTSTalkerPrefixCache(max_tokens) if max_tokens > 0 else None
+
     def load_generate_config(self, generate_config):
         self.generate_config = generate_config
     
@@ -1912,7 +2076,7 @@ class Qwen3TTSForConditionalGeneration(Qwen3TTSPreTrainedModel, GenerationMixin)
         if speech_tokenizer_path is None:
             raise ValueError(f"""{pretrained_model_name_or_path}/{speech_tokenizer_path} not exists""")
         speech_tokenizer_dir = os.path.dirname(speech_tokenizer_path)
-        speech_tokenizer = Qwen3TTSTokenizer.from_pretrained(
+        speech_tokenizer = Qwen3TTSTokenizer.from_pretrained_shared(
             speech_tokenizer_dir,
             *model_args,
             **kwargs,
@@ -1987,28 +2151,13 @@ class Qwen3TTSForConditionalGeneration(Qwen3TTSPreTrainedModel, GenerationMixin)
             else:
                 codec_embed.append(self.talker.code_predictor.get_input_embeddings()[i-1](ref_code[:, i:i+1]))
         codec_embed = torch.cat(codec_embed, dim=1).sum(1).unsqueeze(0)
-        codec_embed = torch.cat([self.talker.get_input_embeddings()(
-                                    torch.tensor(
-                                        [[
-                                            self.config.talker_config.codec_bos_id,
-                                        ]],
-                                        device=self.talker.device,
-                                        dtype=text_id.dtype,
-                                    )
-                                ), codec_embed], dim=1)
+        constants = self._prompt_embeds()
+        codec_embed = torch.cat([constants["codec_bos"], codec_embed], dim=1)
         # compute lens
         text_lens = text_embed.shape[1]
         codec_lens = codec_embed.shape[1]
         if non_streaming_mode:
-            icl_input_embed = text_embed + self.talker.get_input_embeddings()(
-                                                torch.tensor(
-                                                    [[
-                                                        self.config.talker_config.codec_pad_id,
-                                                    ] * text_lens],
-                                                    device=self.talker.device,
-                                                    dtype=text_id.dtype,
-                                                )
-                                            )
+            icl_input_embed = text_embed + constants["codec_pad"].expand(-1, text_lens, -1)
             icl_input_embed = torch.cat([icl_input_embed, codec_embed + tts_pad_embed], dim=1)
             return icl_input_embed, tts_pad_embed
         else:
@@ -2018,54 +2167,85 @@ class Qwen3TTSForConditionalGeneration(Qwen3TTSPreTrainedModel, GenerationMixin)
                 text_embed = torch.cat([text_embed] + [tts_pad_embed] * (codec_lens - text_lens), dim=1)
                 return text_embed + codec_embed, tts_pad_embed
 
-    @torch.no_grad()
-    def generate(
+    def _prompt_embeds(self) -> dict:
+        """
+        Talker prompt embeddings that only depend on config ids, computed once per device and dtype.
+
+        Holds the projected `tts_bos`, `tts_eos` and `tts_pad` text embeddings and the codec `pad` and `bos`
+        embeddings. The codec think/language tags (`think`, by language id) and speaker embeddings
+        (`speaker`, by speaker id) are added as they are first used. With grad enabled the table is built
+        afresh for the call, so that training still reaches the embeddings.
+        """
+        key = (self.talker.device, self.talker.dtype)
+        table = self._prompt_embed_tables.get(key)
+        if table is not None:
+            return table
+        talker_config = self.config.talker_config
+        tts_bos, tts_eos, tts_pad = self.talker.text_projection(
+            self.talker.get_text_embeddings()(
+                torch.tensor(
+                    [[self.config.tts_bos_token_id, self.config.tts_eos_token_id, self.config.tts_pad_token_id]],
+                    device=self.talker.device,
+                )
+            )
+        ).chunk(3, dim=1)  # 3 * [1 1 d]
+        codec_pad, codec_bos = self.talker.get_input_embeddings()(
+            torch.tensor([[talker_config.codec_pad_id, talker_config.codec_bos_id]], device=self.talker.device)
+        ).chunk(2, dim=1)
+        table = {
+            "tts_bos": tts_bos, "tts_eos": tts_eos, "tts_pad": tts_pad,
+            "codec_pad": codec_pad, "codec_bos": codec_bos, "codec_pad_bos": torch.cat([codec_pad, codec_bos], dim=1),
+            "think": {}, "speaker": {},
+        }
+        if not torch.is_grad_enabled():
+            self._prompt_embed_tables[key] = table
+        return table
+
+    def _codec_think_embed(self, table: dict, language_id: Optional[int]) -> torch.Tensor:
+        """`[1, n, d]` codec think tags of a language id (None: no language, "auto")."""
+        embed = table["think"].get(language_id)
+        if embed is None:
+            talker_config = self.config.talker_config
+            if language_id is None:
+                ids = [talker_config.codec_nothink_id, talker_config.codec_think_bos_id, talker_config.codec_think_eos_id]
+            else:
+                ids = [talker_config.codec_think_id, talker_config.codec_think_bos_id, language_id, talker_config.codec_think_eos_id]
+            embed = table["think"][language_id] = self.talker.get_input_embeddings()(
+                torch.tensor([ids], device=self.talker.device)
+            )
+        return embed
+
+    def _speaker_embed(self, table: dict, spk_id: int) -> torch.Tensor:
+        """`[d]` codec embedding of a speaker id."""
+        embed = table["speaker"].get(spk_id)
+        if embed is None:
+            embed = table["speaker"][spk_id] = self.talker.get_input_embeddings()(
+                torch.tensor(spk_id, device=self.talker.device)
+            )
+        return embed
+
+    def _build_talker_inputs(
         self,
-        input_ids: Optional[list[torch.Tensor]] = None,
+        input_ids: list[torch.Tensor],
         instruct_ids: Optional[list[torch.Tensor]] = None,
         ref_ids: Optional[list[torch.Tensor]] = None,
-        voice_clone_prompt: list[dict] = None,
+        voice_clone_prompt: dict = None,
         languages: list[str] = None,
         speakers: list[str] = None,
-        non_streaming_mode = False,
-        max_new_tokens: int = 4096,
-        do_sample: bool = True,
-        top_k: int = 50,
-        top_p: float = 1.0,
-        temperature: float = 0.9,
-        subtalker_dosample: bool = True,
-        subtalker_top_k: int = 50,
-        subtalker_top_p: float = 1.0,
-        subtalker_temperature: float = 0.9,
-        eos_token_id: Optional[int] = None,
-        repetition_penalty: float = 1.05,
-        **kwargs,
+        non_streaming_mode: bool = False,
     ):
-        talker_kwargs = {
-            "max_new_tokens": max_new_tokens,
-            "min_new_tokens": 2,
-            "do_sample": do_sample,
-            "top_k": top_k,
-            "top_p": top_p,
-            "temperature": temperature,
-            "subtalker_dosample": subtalker_dosample, 
-            "subtalker_top_k": subtalker_top_k,
-            "subtalker_top_p": subtalker_top_p,
-            "subtalker_temperature": subtalker_temperature,
-            "eos_token_id": eos_token_id
-            if eos_token_id is not None
-            else self.config.talker_config.codec_eos_token_id,
-            "repetition_penalty": repetition_penalty,
-            "suppress_tokens": [
-                i
-                for i in range(self.config.talker_config.vocab_size - 1024, self.config.talker_config.vocab_size)
-                if i not in (self.config.talker_config.codec_eos_token_id,)
-            ],
-            "output_hidden_states": getattr(kwargs, "output_hidden_states", True),
-            "return_dict_in_generate": getattr(kwargs, "return_dict_in_generate", True)
-        }
-        
+        """
+        Build the left-padded talker prefill embeddings for a batch.
+
+        Returns:
+            tuple: `(inputs_embeds, attention_mask, trailing_text_hidden, tts_pad_embed, prefix_lengths)`: the
+            first four as consumed by the talker forward pass, then the length of each prompt's prefix, the
+            positions ahead of its text (see `Qwen3TTSTalkerPrefixCache`).
+        """
         talker_input_embeds = [[] for _ in range(len(input_ids))]
+        prefix_lengths = []
+        constants = self._prompt_embeds()
+        tts_bos_embed, tts_eos_embed, tts_pad_embed = constants["tts_bos"], constants["tts_eos"], constants["tts_pad"]
 
         voice_clone_spk_embeds = None
         # voice clone speaker prompt generate
@@ -2092,13 +2272,7 @@ class Qwen3TTSForConditionalGeneration(Qwen3TTSPreTrainedModel, GenerationMixin)
                         raise NotImplementedError(f"Speaker {speaker} not implemented")
                     else:
                         spk_id = self.config.talker_config.spk_id[speaker.lower()]
-                        speaker_embed = self.talker.get_input_embeddings()(
-                                            torch.tensor(
-                                                spk_id,
-                                                device=self.talker.device,
-                                                dtype=input_id.dtype,
-                                            )
-                                        )
+                        speaker_embed = self._speaker_embed(constants, spk_id)
             else:
                 if voice_clone_prompt["x_vector_only_mode"][index] or voice_clone_prompt["icl_mode"][index]:
                     speaker_embed = voice_clone_spk_embeds[index]
@@ -2121,48 +2295,9 @@ class Qwen3TTSForConditionalGeneration(Qwen3TTSPreTrainedModel, GenerationMixin)
                 dialect = self.config.talker_config.spk_is_dialect[speaker.lower()]
                 language_id = self.config.talker_config.codec_language_id[dialect]
             
-            tts_bos_embed, tts_eos_embed, tts_pad_embed = self.talker.text_projection(
-                self.talker.get_text_embeddings()(
-                    torch.tensor(
-                        [[self.config.tts_bos_token_id, self.config.tts_eos_token_id, self.config.tts_pad_token_id]],
-                        device=self.talker.device,
-                        dtype=input_id.dtype,
-                    )
-                )
-            ).chunk(3, dim=1)  # 3 * [1 1 d]
-            
             # codec: tag and speaker
-            if language_id is None:
-                codec_prefill_list = [[
-                                        self.config.talker_config.codec_nothink_id,
-                                        self.config.talker_config.codec_think_bos_id,
-                                        self.config.talker_config.codec_think_eos_id,
-                                    ]]
-            else:
-                codec_prefill_list = [[
-                                        self.config.talker_config.codec_think_id,
-                                        self.config.talker_config.codec_think_bos_id,
-                                        language_id,
-                                        self.config.talker_config.codec_think_eos_id,
-                                    ]]
-
-            codec_input_emebdding_0 = self.talker.get_input_embeddings()(
-                                                    torch.tensor(
-                                                        codec_prefill_list,
-                                                        device=self.talker.device,
-                                                        dtype=input_id.dtype,
-                                                    )
-                                                )
-            codec_input_emebdding_1 = self.talker.get_input_embeddings()(
-                                                    torch.tensor(
-                                                        [[
-                                                            self.config.talker_config.codec_pad_id,
-                                                            self.config.talker_config.codec_bos_id,
-                                                        ]],
-                                                        device=self.talker.device,
-                                                        dtype=input_id.dtype,
-                                                    )
-                                                )
+            codec_input_emebdding_0 = self._codec_think_embed(constants, language_id)
+            codec_input_emebdding_1 = constants["codec_pad_bos"]
             if speaker_embed is None:
                 codec_input_emebdding = torch.cat([codec_input_emebdding_0,
                                                    codec_input_emebdding_1], dim=1)
@@ -2184,6 +2319,8 @@ class Qwen3TTSForConditionalGeneration(Qwen3TTSPreTrainedModel, GenerationMixin)
                                             ), dim=1) + codec_input_emebdding[:, :-1]
 
             talker_input_embed = torch.cat((_talker_input_embed_role, _talker_input_embed), dim=1)
+            # instruct + role + codec tags and speaker: everything up to here is independent of the text
+            prefix_lengths.append(sum(t.shape[1] for t in talker_input_embeds[index]) + talker_input_embed.shape[1])
 
             if voice_clone_prompt is not None and voice_clone_prompt["ref_code"] is not None and voice_clone_prompt["icl_mode"][index]:
                 icl_input_embed, trailing_text_hidden = self.generate_icl_prompt(
@@ -2205,24 +2342,10 @@ class Qwen3TTSForConditionalGeneration(Qwen3TTSPreTrainedModel, GenerationMixin)
                     talker_input_embed = torch.cat([talker_input_embed,
                                                     torch.cat((self.talker.text_projection(
                                                         self.talker.get_text_embeddings()(input_id[:, 3:-5])
-                                                    ), tts_eos_embed), dim=1) + self.talker.get_input_embeddings()(
-                                                        torch.tensor(
-                                                            [[
-                                                                self.config.talker_config.codec_pad_id,
-                                                            ] * (input_id[:, 3:-5].shape[1] + 1)],
-                                                            device=self.talker.device,
-                                                            dtype=input_id.dtype,
-                                                        )
-                                                    ), 
-                                                    tts_pad_embed + self.talker.get_input_embeddings()(
-                                                        torch.tensor(
-                                                            [[
-                                                                self.config.talker_config.codec_bos_id,
-                                                            ]],
-                                                            device=self.talker.device,
-                                                            dtype=input_id.dtype,
-                                                        )
-                                                    ) 
+                                                    ), tts_eos_embed), dim=1) + constants["codec_pad"].expand(
+                                                        -1, input_id[:, 3:-5].shape[1] + 1, -1
+                                                    ),
+                                                    tts_pad_embed + constants["codec_bos"],
                                                     ], dim=1)
                     trailing_text_hidden = tts_pad_embed
                 else:
@@ -2268,31 +2391,982 @@ class Qwen3TTSForConditionalGeneration(Qwen3TTSPreTrainedModel, GenerationMixin)
         padded_hiddens[padding_mask] = pad_embedding_vector
         trailing_text_hiddens = padded_hiddens
 
-        # forward
-        talker_result = self.talker.generate(
+        return talker_input_embeds, talker_attention_mask, trailing_text_hiddens, tts_pad_embed, prefix_lengths
+
+    @torch.no_grad()
+    def generate(
+        self,
+        input_ids: Optional[list[torch.Tensor]] = None,
+        instruct_ids: Optional[list[torch.Tensor]] = None,
+        ref_ids: Optional[list[torch.Tensor]] = None,
+        voice_clone_prompt: list[dict] = None,
+        languages: list[str] = None,
+        speakers: list[str] = None,
+        non_streaming_mode = False,
+        max_new_tokens: int = 4096,
+        do_sample: bool = True,
+        top_k: int = 50,
+        top_p: float = 1.0,
+        temperature: float = 0.9,
+        subtalker_dosample: bool = True,
+        subtalker_top_k: int = 50,
+        subtalker_top_p: float = 1.0,
+        subtalker_temperature: float = 0.9,
+        eos_token_id: Optional[int] = None,
+        repetition_penalty: float = 1.05,
+        cancel: Optional[CancelFn] = None,
+        cancel_check_frames: int = DEFAULT_CHECK_FRAMES,
+        return_hidden_states: bool = False,
+        **kwargs,
+    ):
+        """
+        Generate the codec frames of a batch of prompts.
+
+        Returns:
+            `(codes_list, hidden_states_list)`: per sequence, its `(frames, num_code_groups)` codes
+            without the EOS frame, and, if `return_hidden_states`, the `(frames, hidden_size)`
+            last-layer talker hidden states the frames were predicted from (otherwise None).
+            Cancelled sequences come back empty, see `qwen_tts.core.cancellation`.
+        """
+        eos_token_id = eos_token_id if eos_token_id is not None else self.config.talker_config.codec_eos_token_id
+        talker_input_embeds, attention_mask, trailing_text_hiddens, tts_pad_embed, prefix_lengths = self._build_talker_inputs(
+            input_ids=input_ids,
+            instruct_ids=instruct_ids,
+            ref_ids=ref_ids,
+            voice_clone_prompt=voice_clone_prompt,
+            languages=languages,
+            speakers=speakers,
+            non_streaming_mode=non_streaming_mode,
+        )
+        batch_size = talker_input_embeds.shape[0]
+        device = talker_input_embeds.device
+        max_frames = max(max_new_tokens - 1, 0)
+        codes = torch.empty(
+            (batch_size, max_frames, self.config.talker_config.num_code_groups), dtype=torch.long, device=device
+        )
+        hidden_states = (
+            talker_input_embeds.new_empty((batch_size, max_frames, talker_input_embeds.shape[-1]))
+            if return_hidden_states else None
+        )
+        lengths = torch.zeros(batch_size, dtype=torch.long, device=device)
+
+        frames = self._talker_frames(
+            talker_input_embeds, attention_mask, trailing_text_hiddens, tts_pad_embed, prefix_lengths,
+            max_new_tokens=max_new_tokens, do_sample=do_sample, top_k=top_k, top_p=top_p,
+            temperature=temperature, repetition_penalty=repetition_penalty, eos_token_id=eos_token_id,
+            subtalker_dosample=subtalker_dosample, subtalker_top_k=subtalker_top_k,
+            subtalker_top_p=subtalker_top_p, subtalker_temperature=subtalker_temperature,
+            cancel=cancel, cancel_check_frames=cancel_check_frames,
+        )
+        for step, (rows, frame_codes, frame_hidden) in enumerate(frames):
+            codes[rows, step] = frame_codes
+            lengths[rows] = step + 1
+            if hidden_states is not None:
+                hidden_states[rows, step] = frame_hidden
+
+        # Cancelled rows come back empty, whatever they produced before the cancel was seen.
+        cancelled = torch.tensor(cancel_flags(cancel, batch_size), device=device)
+        lengths = lengths.masked_fill(cancelled, 0).tolist()
+        codes_list = [codes[i, :length] for i, length in enumerate(lengths)]
+        if hidden_states is None:
+            return codes_list, None
+        return codes_list, [hidden_states[i, :length] for i, length in enumerate(lengths)]
+
+    def _keeping_talker_state(self, cancel: CancelFn) -> CancelFn:
+        # `cancel` may block while other calls use this model (see qwen_tts.core.cancellation);
+        # the talker keeps the rope offsets of the running call on itself, so put them back after.
+        def poll():
+            rope_deltas = self.talker.rope_deltas
+            try:
+                return cancel()
+            finally:
+                self.talker.rope_deltas = rope_deltas
+        return poll
+
+    def _talker_logits_processor(
+        self,
+        do_sample: bool,
+        top_k: int,
+        top_p: float,
+        temperature: float,
+        repetition_penalty: float,
+        eos_token_id: int,
+        min_new_tokens: int = 2,
+    ) -> LogitsProcessorList:
+        # Same processors, in the same order, as `GenerationMixin.generate` builds for the talker kwargs in `generate`.
+        processors = LogitsProcessorList()
+        if repetition_penalty is not None and repetition_penalty != 1.0:
+            processors.append(RepetitionPenaltyLogitsProcessor(penalty=repetition_penalty))
+        if min_new_tokens > 0:
+            processors.append(MinNewTokensLengthLogitsProcessor(0, min_new_tokens, eos_token_id, device=self.talker.device))
+        suppress_tokens = [
+            i
+            for i in range(self.config.talker_config.vocab_size - 1024, self.config.talker_config.vocab_size)
+            if i not in (self.config.talker_config.codec_eos_token_id,)
+        ]
+        processors.append(SuppressTokensLogitsProcessor(suppress_tokens, device=self.talker.device))
+        if do_sample:
+            if temperature is not None and temperature != 1.0:
+                processors.append(TemperatureLogitsWarper(temperature))
+            if top_k is not None and top_k != 0:
+                processors.append(TopKLogitsWarper(top_k=top_k))
+            if top_p is not None and top_p < 1.0:
+                processors.append(TopPLogitsWarper(top_p=top_p))
+        return processors
+
+    @torch.no_grad()
+    def generate_stream(
+        self,
+        input_ids: Optional[list[torch.Tensor]] = None,
+        instruct_ids: Optional[list[torch.Tensor]] = None,
+        ref_ids: Optional[list[torch.Tensor]] = None,
+        voice_clone_prompt: list[dict] = None,
+        languages: list[str] = None,
+        speakers: list[str] = None,
+        non_streaming_mode = False,
+        max_new_tokens: int = 4096,
+        do_sample: bool = True,
+        top_k: int = 50,
+        top_p: float = 1.0,
+        temperature: float = 0.9,
+        subtalker_dosample: bool = True,
+        subtalker_top_k: int = 50,
+        subtalker_top_p: float = 1.0,
+        subtalker_temperature: float = 0.9,
+        eos_token_id: Optional[int] = None,
+        repetition_penalty: float = 1.05,
+        cancel: Optional[CancelFn] = None,
+        cancel_check_frames: int = DEFAULT_CHECK_FRAMES,
+        **kwargs,
+    ):
+        """
+        Incremental variant of `generate`: yields codec frames while the talker is still decoding.
+
+        Takes the same arguments as `generate` and runs the same decode loop, yielding each frame
+        as soon as the code predictor has produced its residual codebooks.
+
+        Yields:
+            torch.LongTensor: `(batch_size, num_code_groups)` codes for one frame. Generation stops
+            once every sequence has emitted EOS or been cancelled; rows of sequences that finished
+            earlier carry `codec_eos_token_id` in their first codebook and must be dropped by the caller.
+            `cancel` is polled every `cancel_check_frames` frames, see `qwen_tts.core.cancellation`.
+        """
+        eos_token_id = eos_token_id if eos_token_id is not None else self.config.talker_config.codec_eos_token_id
+        talker_input_embeds, attention_mask, trailing_text_hiddens, tts_pad_embed, prefix_lengths = self._build_talker_inputs(
+            input_ids=input_ids,
+            instruct_ids=instruct_ids,
+            ref_ids=ref_ids,
+            voice_clone_prompt=voice_clone_prompt,
+            languages=languages,
+            speakers=speakers,
+            non_streaming_mode=non_streaming_mode,
+        )
+        batch_size = talker_input_embeds.shape[0]
+        frames = self._talker_frames(
+            talker_input_embeds, attention_mask, trailing_text_hiddens, tts_pad_embed, prefix_lengths,
+            max_new_tokens=max_new_tokens, do_sample=do_sample, top_k=top_k, top_p=top_p,
+            temperature=temperature, repetition_penalty=repetition_penalty, eos_token_id=eos_token_id,
+            subtalker_dosample=subtalker_dosample, subtalker_top_k=subtalker_top_k,
+            subtalker_top_p=subtalker_top_p, subtalker_temperature=subtalker_temperature,
+            cancel=cancel, cancel_check_frames=cancel_check_frames,
+        )
+        for rows, frame_codes, _ in frames:
+            if rows.shape[0] == batch_size:
+                yield frame_codes
+                continue
+            frame = frame_codes.new_zeros((batch_size, frame_codes.shape[1]))
+            frame[:, 0] = eos_token_id
+            frame[rows] = frame_codes
+            yield frame
+
+    def new_engine(
+        self, max_batch_size: int = 32, max_tokens: int = 32768, block_size: int = 16
+    ) -> "Qwen3TTSTalkerEngine":
+        """
+        Create a continuous-batching engine on this model, see `Qwen3TTSTalkerEngine`.
+
+        Args:
+            max_batch_size (`int`): Sequences decoded together at most.
+            max_tokens (`int`): Positions in the paged KV cache, shared by all sequences. The cache is
+                allocated here, `2 * num_hidden_layers * num_key_value_heads * head_dim` values per position.
+            block_size (`int`): Positions per cache block.
+        """
+        return Qwen3TTSTalkerEngine(self, max_batch_size=max_batch_size, max_tokens=max_tokens, block_size=block_size)
+
+    def _talker_frames(
+        self,
+        talker_input_embeds: torch.Tensor,
+        attention_mask: torch.Tensor,
+        trailing_text_hiddens: torch.Tensor,
+        tts_pad_embed: torch.Tensor,
+        prefix_lengths: list[int],
+        max_new_tokens: int,
+        do_sample: bool,
+        top_k: int,
+        top_p: float,
+        temperature: float,
+        repetition_penalty: float,
+        eos_token_id: int,
+        subtalker_dosample: bool,
+        subtalker_top_k: int,
+        subtalker_top_p: float,
+        subtalker_temperature: float,
+        cancel: Optional[CancelFn],
+        cancel_check_frames: int,
+    ):
+        """
+        Decode loop of `generate` and `generate_stream`: drives the talker frame by frame.
+
+        Sampling is what `GenerationMixin.generate` does for the talker, but finished and cancelled
+        sequences are dropped from the batch (KV cache, masks, rope offsets, text conditioning)
+        instead of being carried along with EOS inputs, and nothing beyond the current frame is kept.
+        With a prefix cache, the prefill starts behind the cached prompt prefixes.
+
+        Yields:
+            `(rows, codes, hidden)` per frame: the indices of the sequences still running, their
+            `(len(rows), num_code_groups)` codes and the `(len(rows), hidden_size)` last-layer talker
+            hidden states the frame was predicted from.
+        """
+        logits_processor = self._talker_logits_processor(
+            do_sample, top_k, top_p, temperature, repetition_penalty, eos_token_id
+        )
+        poll = self._keeping_talker_state(cancel) if cancel is not None else None
+        subtalker_kwargs = {
+            "subtalker_dosample": subtalker_dosample,
+            "subtalker_top_k": subtalker_top_k,
+            "subtalker_top_p": subtalker_top_p,
+            "subtalker_temperature": subtalker_temperature,
+        }
+
+        batch_size = talker_input_embeds.shape[0]
+        device = talker_input_embeds.device
+        past_key_values = DynamicCache()
+        rows = torch.arange(batch_size, device=device)
+        generated = torch.zeros((batch_size, 0), dtype=torch.long, device=device)
+
+        cached = 0
+        if self.prefix_cache is not None:
+            talker_input_embeds, attention_mask, cached = self._reuse_prefixes(
+                talker_input_embeds, attention_mask, prefix_lengths, past_key_values
+            )
+        prompt_len = attention_mask.shape[1]
+        outputs = self.talker(
             inputs_embeds=talker_input_embeds,
-            attention_mask=talker_attention_mask,
+            attention_mask=attention_mask,
+            past_key_values=past_key_values,
+            use_cache=True,
+            cache_position=torch.arange(cached, prompt_len, device=device),
             trailing_text_hidden=trailing_text_hiddens,
             tts_pad_embed=tts_pad_embed,
-            **talker_kwargs,
+            **subtalker_kwargs,
         )
+        past_hidden = outputs.past_hidden
+        for step in range(max_new_tokens):
+            scores = logits_processor(generated, outputs.logits[:, -1, :].float())
+            if do_sample:
+                next_tokens = torch.multinomial(torch.softmax(scores, dim=-1), num_samples=1).squeeze(1)
+            else:
+                next_tokens = torch.argmax(scores, dim=-1)
+            generated = torch.cat([generated, next_tokens[:, None]], dim=-1)
+            running = next_tokens != eos_token_id
+            if poll is not None and step % max(cancel_check_frames, 1) == 0:
+                running &= ~torch.tensor(cancel_flags(poll, batch_size), device=device)[rows]
+            # The codes of a frame come out of the forward pass that consumes its first codebook,
+            # so the last sampled token (EOS, or the token at max_new_tokens) is never decoded.
+            if not running.any() or step == max_new_tokens - 1:
+                break
+            if not running.all():
+                keep = running.nonzero().squeeze(1)
+                rows, next_tokens, generated = rows[keep], next_tokens[keep], generated[keep]
+                attention_mask, trailing_text_hiddens = attention_mask[keep], trailing_text_hiddens[keep]
+                past_hidden = past_hidden[keep]
+                past_key_values.batch_select_indices(keep)
+                self.talker.rope_deltas = self.talker.rope_deltas[keep]
+            attention_mask = torch.cat([attention_mask, attention_mask.new_ones((rows.shape[0], 1))], dim=-1)
+            outputs = self.talker(
+                input_ids=next_tokens[:, None],
+                attention_mask=attention_mask,
+                past_key_values=past_key_values,
+                use_cache=True,
+                cache_position=torch.tensor([prompt_len + step], device=device),
+                past_hidden=past_hidden,
+                generation_step=outputs.generation_step,
+                trailing_text_hidden=trailing_text_hiddens,
+                tts_pad_embed=tts_pad_embed,
+                predictor_cache=outputs.predictor_cache,
+                **subtalker_kwargs,
+            )
+            yield rows, outputs.hidden_states[-1], past_hidden[:, -1]
+            past_hidden = outputs.past_hidden
+
+    def _reuse_prefixes(
+        self,
+        inputs_embeds: torch.Tensor,
+        attention_mask: torch.Tensor,
+        prefix_lengths: list[int],
+        past_key_values: DynamicCache,
+    ) -> tuple:
+        """
+        Put the cached KV states of each row's prompt prefix into `past_key_values`, computing the missing ones.
+
+        Returns:
+            `(inputs_embeds, attention_mask, cached)`: the rest of each prompt, left-padded, the mask over the
+            `cached` prefix positions (each row's prefix right-aligned) followed by the rest, and `cached`.
+        """
+        width = inputs_embeds.shape[1]
+        lengths = attention_mask.sum(dim=-1).tolist()
+        entries = self._prefix_entries(
+            [inputs_embeds[row, width - length:width - length + prefix] for row, (length, prefix) in enumerate(zip(lengths, prefix_lengths))]
+        )
+        cached = max(prefix_lengths)
+        rest = max(length - prefix for length, prefix in zip(lengths, prefix_lengths))
+        mask = attention_mask.new_zeros((len(lengths), cached + rest))
+        for row, (length, prefix) in enumerate(zip(lengths, prefix_lengths)):
+            mask[row, cached - prefix:cached] = 1
+            mask[row, cached + rest - (length - prefix):] = 1
+        for layer_idx in range(self.config.talker_config.num_hidden_layers):
+            first = entries[0][0][layer_idx]
+            shape = (len(lengths), first.shape[0], cached, first.shape[2])
+            layer_keys, layer_values = first.new_zeros(shape), first.new_zeros(shape)
+            for row, (entry_keys, entry_values) in enumerate(entries):
+                layer_keys[row, :, cached - entry_keys[layer_idx].shape[1]:] = entry_keys[layer_idx]
+                layer_values[row, :, cached - entry_values[layer_idx].shape[1]:] = entry_values[layer_idx]
+            past_key_values.update(layer_keys, layer_values, layer_idx)
+        return inputs_embeds[:, width - rest:], mask, cached
+
+    def _prefix_entries(self, prefixes: list[torch.Tensor]) -> list[tuple]:
+        """Prefix cache entries of `(prefix_len, hidden_size)` prefix embeddings; the missing ones are prefilled in one batch."""
+        keys = [self.prefix_cache.key(prefix) for prefix in prefixes]
+        entries, missing = {}, {}
+        for key, prefix in zip(keys, prefixes):
+            if key in entries or key in missing:
+                continue
+            entry = self.prefix_cache.get(key)
+            if entry is None:
+                missing[key] = prefix
+            else:
+                entries[key] = entry
+        if missing:
+            lengths = [prefix.shape[0] for prefix in missing.values()]
+            width = max(lengths)
+            inputs_embeds = torch.stack([F.pad(prefix, (0, 0, width - prefix.shape[0], 0)) for prefix in missing.values()])
+            attention_mask = (
+                torch.arange(width, device=inputs_embeds.device)[None] >= torch.tensor([width - n for n in lengths], device=inputs_embeds.device)[:, None]
+            ).long()
+            position_ids, _ = self.talker.get_rope_index(attention_mask)
+            past_key_values = DynamicCache()
+            with stage("talker_prefill"):
+                self.talker.model(
+                    inputs_embeds=inputs_embeds,
+                    attention_mask=attention_mask,
+                    position_ids=position_ids,
+                    past_key_values=past_key_values,
+                    use_cache=True,
+                )
+            for row, (key, length) in enumerate(zip(missing, lengths)):
+                entries[key] = (
+                    [layer.keys[row, :, width - length:].clone() for layer in past_key_values.layers],
+                    [layer.values[row, :, width - length:].clone() for layer in past_key_values.layers],
+                )
+                self.prefix_cache.put(key, *entries[key])
+        return [entries[key] for key in keys]
+
+
+class Qwen3TTSTalkerPrefixCache:
+    """
+    Talker KV states of prompt prefixes, so that prompts sharing a prefix are prefilled from where it ends.
+
+    The prefix of a prompt is everything ahead of its text: the instruction, `<|im_start|>assistant\n`
+    and the codec think, language and speaker positions. Requests for the same speaker, or with the same
+    voice design description, share it. Its KV states only depend on its own embeddings, which are the
+    key of an entry, at positions `0..prefix_len - 1`. An entry holds per layer the
+    `(num_key_value_heads, prefix_len, head_dim)` keys and values. Least recently used entries are evicted
+    once the entries hold more than `max_tokens` positions. The model is shared by the threads that run
+    requests, so lookups and updates are serialized by a lock.
+    """
+
+    def __init__(self, max_tokens: int):
+        self.max_tokens = int(max_tokens)
+        self.tokens = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(prefix_embeds: torch.Tensor) -> str:
+        """Key of the prefix with these `(prefix_len, hidden_size)` embeddings."""
+        return hashlib.sha1(prefix_embeds.contiguous().view(torch.uint8).cpu().numpy().tobytes()).hexdigest()
+
+    def get(self, key: str) -> Optional[tuple]:
+        """`(keys, values)` per layer of a prefix, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, keys: list[torch.Tensor], values: list[torch.Tensor]):
+        length = keys[0].shape[1]
+        if length > self.max_tokens:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = (keys, values)
+            self.tokens += length
+            while self.tokens > self.max_tokens:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.tokens -= evicted[0].shape[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.tokens = 0
+
+
+class _RowWarper:
+    """
+    Temperature, top-k and top-p with settings per batch row, for batches that mix sequences.
+
+    Computes what `TemperatureLogitsWarper`, `TopKLogitsWarper` and `TopPLogitsWarper` compute for a
+    whole batch. Rows that do not sample are cut down to their argmax when others do, so that one
+    multinomial draw serves the whole batch.
+    """
+
+    def __init__(self, settings: list, vocab_size: int, device: torch.device):
+        """`settings` holds one `(do_sample, top_k, top_p, temperature)` per row."""
+        sampled = [bool(do_sample) for do_sample, _, _, _ in settings]
+        self.do_sample = any(sampled)
+        self.greedy = None
+        if self.do_sample and not all(sampled):
+            self.greedy = torch.tensor([not s for s in sampled], device=device)[:, None]
+        temperatures = [t if s and t is not None else 1.0 for s, (_, _, _, t) in zip(sampled, settings)]
+        top_ks = [min(max(k, 1), vocab_size) if s and k else vocab_size for s, (_, k, _, _) in zip(sampled, settings)]
+        top_ps = [p if s and p is not None else 1.0 for s, (_, _, p, _) in zip(sampled, settings)]
+        self.temperature = None
+        if any(t != 1.0 for t in temperatures):
+            self.temperature = torch.tensor(temperatures, dtype=torch.float32, device=device)[:, None]
+        self.top_k = None
+        if any(k < vocab_size for k in top_ks):
+            self.max_k = max(top_ks)
+            self.top_k = torch.tensor(top_ks, device=device)[:, None] - 1
+        self.top_p = None
+        if any(p < 1.0 for p in top_ps):
+            self.top_p = 1 - torch.tensor(top_ps, dtype=torch.float32, device=device)[:, None]
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        if not self.do_sample:
+            return scores
+        greedy = None
+        if self.greedy is not None:
+            argmax = scores.argmax(dim=-1, keepdim=True)
+            greedy = self.greedy & (torch.arange(scores.shape[-1], device=scores.device) != argmax)
+        if self.temperature is not None:
+            scores = scores / self.temperature
+        if self.top_k is not None:
+            kth = torch.topk(scores, self.max_k)[0].gather(1, self.top_k)
+            scores = scores.masked_fill(scores < kth, -float("inf"))
+        if self.top_p is not None:
+            sorted_logits, sorted_indices = torch.sort(scores, descending=False)
+            sorted_to_remove = sorted_logits.softmax(dim=-1).cumsum(dim=-1) <= self.top_p
+            sorted_to_remove[..., -1:] = 0
+            scores = scores.masked_fill(sorted_to_remove.scatter(1, sorted_indices, sorted_to_remove), -float("inf"))
+        if greedy is not None:
+            scores = scores.masked_fill(greedy, -float("inf"))
+        return scores
+
+
+class Qwen3TTSTalkerPagedCache:
+    """
+    Block KV cache of the talker, shared by the sequences of a `Qwen3TTSTalkerEngine`.
+
+    Each layer keeps its keys and values in one pool of `num_blocks * block_size` slots. A sequence
+    owns a list of blocks (its block table) and returns them to the pool when it is done, so
+    sequences of any length come and go without fragmenting or reallocating the cache.
+    `prepare` tells the next forward pass which slots each row writes and reads. `update`
+    follows the `Cache.update` contract: it stores the new positions and gathers each row's
+    positions so far into a padded batch. Attention then runs on that batch under the
+    returned padding mask.
+    """
+
+    def __init__(
+        self,
+        config: Qwen3TTSTalkerConfig,
+        num_blocks: int,
+        block_size: int,
+        dtype: torch.dtype,
+        device: torch.device,
+    ):
+        head_dim = getattr(config, "head_dim", config.hidden_size // config.num_attention_heads)
+        shape = (num_blocks * block_size, config.num_key_value_heads, head_dim)
+        # Zeroed: padded rows read slots they do not own, which must at least hold finite values.
+        self.keys = [torch.zeros(shape, dtype=dtype, device=device) for _ in range(config.num_hidden_layers)]
+        self.values = [torch.zeros(shape, dtype=dtype, device=device) for _ in range(config.num_hidden_layers)]
+        self.num_blocks = num_blocks
+        self.block_size = block_size
+        self.free_blocks = list(range(num_blocks - 1, -1, -1))
+        self.attn_implementation = config._attn_implementation
+        self.dtype = dtype
+        self.write_slots = None
+        self.read_slots = None
+
+    def blocks_for(self, length: int) -> int:
+        """Blocks that hold `length` positions."""
+        return -(-length // self.block_size)
+
+    def allocate(self, count: int) -> list:
+        """Take `count` blocks from the pool (the caller checks `free_blocks` first)."""
+        blocks = self.free_blocks[len(self.free_blocks) - count:]
+        del self.free_blocks[len(self.free_blocks) - count:]
+        return blocks
+
+    def release(self, blocks: list):
+        self.free_blocks.extend(blocks)
+
+    def prepare(self, tables: torch.LongTensor, lengths: torch.LongTensor, query_length: int) -> Optional[torch.Tensor]:
+        """
+        Set up the next forward pass, which adds `query_length` positions to each row.
+
+        Args:
+            tables (`torch.LongTensor` of shape `(batch_size, max_blocks)`):
+                Block table of each row, padded with any block.
+            lengths (`torch.LongTensor` of shape `(batch_size,)`):
+                Positions each row already has in the cache.
+            query_length (`int`):
+                New positions per row. Several only for a single row (prefill).
+
+        Returns:
+            The attention mask for the layers' attention implementation, or None when no
+            position needs masking beyond causality.
+        """
+        ends = lengths + query_length
+        span = int(ends.max())
+        positions = torch.arange(span, device=tables.device)
+        slots = tables[:, positions // self.block_size] * self.block_size + positions % self.block_size
+        offsets = lengths[:, None] + torch.arange(query_length, device=tables.device)
+        self.write_slots = slots.gather(1, offsets).reshape(-1)
+        self.read_slots = slots
+
+        padded = bool((ends != span).any())
+        if self.attn_implementation.startswith("flash"):
+            # Causal within the new positions, aligned to the end of the keys; padding as a 2D mask.
+            return (positions < ends[:, None]).long() if padded else None
+        if not padded and (query_length == 1 or (span == query_length and self.attn_implementation != "eager")):
+            return None
+        allowed = positions[None, None, :] <= offsets[:, :, None]   # (batch, query, key), also masks padding
+        if self.attn_implementation == "eager":
+            mask = torch.zeros(allowed.shape, dtype=self.dtype, device=tables.device)
+            return mask.masked_fill(~allowed, torch.finfo(self.dtype).min)[:, None]
+        return allowed[:, None]
+
+    def update(self, key_states, value_states, layer_idx, cache_kwargs=None):
+        """Write the new positions of a layer and return each row's keys and values so far (the `Cache.update` contract)."""
+        batch_size, num_heads, length, head_dim = key_states.shape
+        keys, values = self.keys[layer_idx], self.values[layer_idx]
+        keys[self.write_slots] = key_states.transpose(1, 2).reshape(batch_size * length, num_heads, head_dim)
+        values[self.write_slots] = value_states.transpose(1, 2).reshape(batch_size * length, num_heads, head_dim)
+        return keys[self.read_slots].transpose(1, 2), values[self.read_slots].transpose(1, 2)
+
+
+@dataclass
+class Qwen3TTSTalkerSequence:
+    """One utterance decoded by a `Qwen3TTSTalkerEngine`."""
+
+    seq_id: int
+    # Talker prompt `(prompt_len, hidden_size)`, dropped once it is prefilled.
+    inputs_embeds: Optional[torch.Tensor]
+    # Text conditioning of each frame `(text_len, hidden_size)`, ending with `tts_pad_embed`
+    # which also conditions every frame after it.
+    trailing_text_hidden: torch.Tensor
+    max_new_tokens: int
+    # Positions of the prompt ahead of its text, see `Qwen3TTSTalkerPrefixCache`.
+    prefix_length: int
+    # `(do_sample, top_k, top_p, temperature, repetition_penalty)` of the talker and
+    # `(do_sample, top_k, top_p, temperature)` of the code predictor.
+    sampling: tuple
+    subtalker_sampling: tuple
+    # Voice clone reference codes, decoded ahead of the sequence's own and cut from its audio.
+    context_codes: Optional[torch.Tensor] = None
+    blocks: list = field(default_factory=list)
+    # `(num_code_groups,)` codes of each frame decoded so far, the EOS frame excluded.
+    frames: list = field(default_factory=list)
+    # Set once the sequence is finished: `frames` stacked to `(num_frames, num_code_groups)`.
+    codes: Optional[torch.Tensor] = None
+    cancelled: bool = False
+
+
+class Qwen3TTSTalkerEngine:
+    """
+    Continuous (iteration-level) batching of talker decodes.
+
+    `generate` runs a fixed batch until its longest sequence has emitted EOS. The engine keeps one
+    running batch instead: a sequence joins it as soon as there is room and leaves it as soon as
+    it emits EOS, reaches `max_new_tokens` or is cancelled. Short utterances therefore never wait
+    for long ones, and a freed row is refilled on the next step.
+
+    `add` queues sequences. Each `step` retires cancelled sequences and prefills the ones it
+    admits. It then samples one codec token for every running sequence and decodes one frame for
+    those still going, code predictor included. KV states live in a `Qwen3TTSTalkerPagedCache`.
+    A sequence is admitted once the pool has blocks for its prompt and `max_new_tokens` frames,
+    in arrival order. With the model's prefix cache enabled, its prompt is prefilled behind the
+    cached KV states of its prefix.
+
+    Sampling settings are per sequence. The random draws come from the global generator and are
+    shared by the batch, so sampled output depends on which sequences run together; a sequence
+    decoded alone matches `Qwen3TTSForConditionalGeneration.generate`. Not thread-safe: drive an
+    engine from one thread at a time.
+    """
+
+    def __init__(
+        self,
+        model: Qwen3TTSForConditionalGeneration,
+        max_batch_size: int = 32,
+        max_tokens: int = 32768,
+        block_size: int = 16,
+    ):
+        self.model = model
+        talker = model.talker
+        config = model.config.talker_config
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self.eos_token_id = config.codec_eos_token_id
+        self.cache = Qwen3TTSTalkerPagedCache(
+            config, max(-(-int(max_tokens) // int(block_size)), 1), int(block_size), talker.dtype, talker.device
+        )
+        self.predictor_cache = talker.code_predictor.new_cache(self.max_batch_size, config.hidden_size, do_sample=False)
+        self.device = talker.device
+        self.waiting = deque()
+        self.running = []
+        self.tts_pad_embed = None
+        self._ids = itertools.count()
+        self._cancelled = set()
+        self._suppress = torch.zeros(config.vocab_size, dtype=torch.bool, device=self.device)
+        self._suppress[config.vocab_size - 1024:] = True
+        self._suppress[self.eos_token_id] = False
+        self._eos = torch.zeros(config.vocab_size, dtype=torch.bool, device=self.device)
+        self._eos[self.eos_token_id] = True
+        self._reset_batch()
+
+    @property
+    def num_running(self) -> int:
+        return len(self.running)
+
+    @property
+    def num_waiting(self) -> int:
+        return len(self.waiting)
+
+    @torch.no_grad()
+    def add(
+        self,
+        input_ids: list[torch.Tensor],
+        instruct_ids: Optional[list[torch.Tensor]] = None,
+        ref_ids: Optional[list[torch.Tensor]] = None,
+        voice_clone_prompt: dict = None,
+        languages: list[str] = None,
+        speakers: list[str] = None,
+        non_streaming_mode: bool = False,
+        max_new_tokens: int = 4096,
+        do_sample: bool = True,
+        top_k: int = 50,
+        top_p: float = 1.0,
+        temperature: float = 0.9,
+        subtalker_dosample: bool = True,
+        subtalker_top_k: int = 50,
+        subtalker_top_p: float = 1.0,
+        subtalker_temperature: float = 0.9,
+        repetition_penalty: float = 1.05,
+        **kwargs,
+    ) -> list[int]:
+        """
+        Queue a batch of prompts, given as for `Qwen3TTSForConditionalGeneration.generate`.
+
+        Returns:
+            The ids of the new sequences, in batch order.
+
+        Raises:
+            ValueError: A sequence needs more KV cache positions than the engine has.
+        """
+        talker_input_embeds, attention_mask, trailing_text_hiddens, tts_pad_embed, prefix_lengths = self.model._build_talker_inputs(
+            input_ids=input_ids,
+            instruct_ids=instruct_ids,
+            ref_ids=ref_ids,
+            voice_clone_prompt=voice_clone_prompt,
+            languages=languages,
+            speakers=speakers,
+            non_streaming_mode=non_streaming_mode,
+        )
+        self.tts_pad_embed = tts_pad_embed.reshape(-1)
+        prompt_lens = attention_mask.sum(dim=-1).tolist()
+        for prompt_len in prompt_lens:
+            needed = self.cache.blocks_for(prompt_len + max_new_tokens)
+            if needed > self.cache.num_blocks:
+                raise ValueError(
+                    f"A prompt of {prompt_len} positions with max_new_tokens={max_new_tokens} needs "
+                    f"{needed * self.cache.block_size} KV cache positions; the engine has "
+                    f"{self.cache.num_blocks * self.cache.block_size}."
+                )
+        ref_codes = (voice_clone_prompt or {}).get("ref_code") or [None] * len(prompt_lens)
+        subtalker_sampling = self.model.talker.code_predictor.sampling_settings(
+            subtalker_dosample, subtalker_top_k, subtalker_top_p, subtalker_temperature
+        )
+        ids = []
+        for index, prompt_len in enumerate(prompt_lens):
+            # Text conditioning is padded with tts_pad_embed, which is what follows the text anyway.
+            trailing = torch.cat([trailing_text_hiddens[index], tts_pad_embed.reshape(1, -1)])
+            seq = Qwen3TTSTalkerSequence(
+                seq_id=next(self._ids),
+                inputs_embeds=talker_input_embeds[index, talker_input_embeds.shape[1] - prompt_len:],
+                trailing_text_hidden=trailing,
+                max_new_tokens=max_new_tokens,
+                prefix_length=prefix_lengths[index],
+                sampling=(do_sample, top_k, top_p, temperature, repetition_penalty),
+                subtalker_sampling=subtalker_sampling,
+                context_codes=ref_codes[index],
+            )
+            self.waiting.append(seq)
+            ids.append(seq.seq_id)
+        return ids
+
+    def cancel(self, seq_id: int):
+        """Stop a sequence; the next `step` returns it with `cancelled` set."""
+        self._cancelled.add(seq_id)
+
+    def clear(self):
+        """Drop every sequence, e.g. after a step failed half-way."""
+        for seq in self.running:
+            self.cache.release(seq.blocks)
+        self.waiting.clear()
+        self.running = []
+        self._cancelled.clear()
+        self._reset_batch()
+
+    @torch.no_grad()
+    def step(self) -> list[Qwen3TTSTalkerSequence]:
+        """
+        Advance every sequence by one frame.
+
+        Returns:
+            The sequences that finished: emitted EOS, reached `max_new_tokens` or were cancelled.
+            Their frames are in `codes`; running sequences accumulate theirs in `frames`.
+        """
+        finished = self._take_cancelled()
+        self._admit()
+        if not self.running:
+            return finished
+        next_tokens = self._sample()
+        done = (next_tokens == self.eos_token_id) | (self._counts >= self._max_new_tokens - 1)
+        self._tokens = next_tokens
+        self._counts = self._counts + 1
+        if done.any():
+            finished += self._retire(~done)
+            if not self.running:
+                return finished
+        self._decode()
+        return finished
+
+    def _reset_batch(self):
+        hidden_size = self.model.config.talker_config.hidden_size
+        vocab_size = self.model.config.talker_config.vocab_size
+        dtype = self.model.talker.dtype
+        long = dict(dtype=torch.long, device=self.device)
+        self._tokens = torch.zeros(0, **long)              # last sampled token, next to be decoded
+        self._counts = torch.zeros(0, **long)              # tokens sampled so far
+        self._max_new_tokens = torch.zeros(0, **long)
+        self._lengths = torch.zeros(0, **long)             # positions in the KV cache
+        self._tables = torch.zeros((0, 1), **long)
+        self._seen = torch.zeros((0, vocab_size), dtype=torch.bool, device=self.device)
+        self._text = torch.zeros((0, 1, hidden_size), dtype=dtype, device=self.device)
+        self._past_hidden = torch.zeros((0, 1, hidden_size), dtype=dtype, device=self.device)
+        self._logits = torch.zeros((0, vocab_size), dtype=torch.float32, device=self.device)
+
+    def _take_cancelled(self) -> list[Qwen3TTSTalkerSequence]:
+        if not self._cancelled:
+            return []
+        finished = [seq for seq in self.waiting if seq.seq_id in self._cancelled]
+        self.waiting = deque(seq for seq in self.waiting if seq.seq_id not in self._cancelled)
+        keep = torch.tensor([seq.seq_id not in self._cancelled for seq in self.running], dtype=torch.bool)
+        if self.running and not keep.all():
+            finished += self._retire(keep.to(self.device))
+        for seq in finished:
+            seq.cancelled = True
+            if seq.codes is None:   # never admitted
+                self._finish(seq)
+        self._cancelled.clear()
+        return finished
+
+    def _admit(self):
+        admitted = []
+        while self.waiting and len(self.running) + len(admitted) < self.max_batch_size:
+            seq = self.waiting[0]
+            needed = self.cache.blocks_for(seq.inputs_embeds.shape[0] + seq.max_new_tokens)
+            if needed > len(self.cache.free_blocks):
+                break
+            self.waiting.popleft()
+            seq.blocks = self.cache.allocate(needed)
+            admitted.append(seq)
+        if not admitted:
+            return
+        hidden_states, logits = [], []
+        for seq in admitted:
+            hidden, seq_logits = self._prefill(seq)
+            hidden_states.append(hidden)
+            logits.append(seq_logits)
+        self._join(admitted, torch.cat(hidden_states), torch.cat(logits))
+
+    def _prefill(self, seq: Qwen3TTSTalkerSequence) -> tuple:
+        """
+        Prefill the prompt of a newly admitted sequence, behind its cached prefix if there is one.
+
+        Returns:
+            The `(1, 1, hidden_size)` hidden state and `(1, vocab_size)` logits of its last position.
+        """
+        table = torch.tensor([seq.blocks], dtype=torch.long, device=self.device)
+        prefix_cache = self.model.prefix_cache
+        cached, key = 0, None
+        if prefix_cache is not None and seq.prefix_length:
+            positions = torch.arange(seq.prefix_length, device=self.device)
+            slots = table[0, positions // self.cache.block_size] * self.cache.block_size + positions % self.cache.block_size
+            key = prefix_cache.key(seq.inputs_embeds[:seq.prefix_length])
+            entry = prefix_cache.get(key)
+            if entry is not None:
+                for cache_keys, cache_values, keys, values in zip(self.cache.keys, self.cache.values, *entry):
+                    cache_keys[slots] = keys.transpose(0, 1)
+                    cache_values[slots] = values.transpose(0, 1)
+                cached = seq.prefix_length
+        with stage("talker_prefill"):
+            hidden = self._forward(seq.inputs_embeds[None, cached:], table, torch.full((1,), cached, dtype=torch.long, device=self.device))
+            logits = self.model.talker.codec_head(hidden[:, -1]).float()
+        if key is not None and not cached:
+            prefix_cache.put(
+                key,
+                [cache_keys[slots].transpose(0, 1) for cache_keys in self.cache.keys],
+                [cache_values[slots].transpose(0, 1) for cache_values in self.cache.values],
+            )
+        return hidden[:, -1:], logits
+
+    def _forward(self, inputs_embeds: torch.Tensor, tables: torch.LongTensor, lengths: torch.LongTensor) -> torch.Tensor:
+        """Run the talker decoder layers on new positions of each row; returns the normed hidden states."""
+        model = self.model.talker.model
+        positions = lengths[:, None] + torch.arange(inputs_embeds.shape[1], device=self.device)
+        position_embeddings = model.rotary_emb(inputs_embeds, positions[None].expand(3, -1, -1))
+        attention_mask = self.cache.prepare(tables, lengths, inputs_embeds.shape[1])
+        hidden_states = inputs_embeds
+        for decoder_layer in model.layers:
+            hidden_states = decoder_layer(
+                hidden_states,
+                attention_mask=attention_mask,
+                past_key_values=self.cache,
+                position_embeddings=position_embeddings,
+            )[0]
+        return model.norm(hidden_states)
+
+    def _sample(self) -> torch.LongTensor:
+        """The processors of `Qwen3TTSForConditionalGeneration._talker_logits_processor`, row by row, then sampling."""
+        scores = self._logits
+        if self._penalty is not None:
+            penalized = torch.where(scores < 0, scores * self._penalty, scores / self._penalty)
+            scores = torch.where(self._seen, penalized, scores)
+        scores = scores.masked_fill((self._counts < 2)[:, None] & self._eos, -float("inf"))
+        scores = scores.masked_fill(self._suppress, -float("inf"))
+        scores = self._warper(None, scores)
+        if self._warper.do_sample:
+            next_tokens = torch.multinomial(torch.softmax(scores, dim=-1), num_samples=1).squeeze(1)
+        else:
+            next_tokens = torch.argmax(scores, dim=-1)
+        self._seen[torch.arange(len(self.running), device=self.device), next_tokens] = True
+        return next_tokens
+
+    def _decode(self):
+        talker = self.model.talker
+        rows = torch.arange(len(self.running), device=self.device)
+        last_id_hidden = talker.get_input_embeddings()(self._tokens[:, None])
+        with stage("code_predictor"):
+            predicted_codes, codec_hiddens = talker.code_predictor.predict(
+                torch.cat((self._past_hidden, last_id_hidden), dim=1), self.predictor_cache
+            )
+        frame_codes = torch.cat((self._tokens[:, None], predicted_codes), dim=-1)
+        text_step = (self._counts - 1).clamp(max=self._text.shape[1] - 1)
+        inputs_embeds = codec_hiddens.sum(1, keepdim=True) + self._text[rows, text_step][:, None]
+        with stage("talker_decode"):
+            hidden_states = self._forward(inputs_embeds, self._tables, self._lengths)
+            self._logits = talker.codec_head(hidden_states[:, -1]).float()
+        self._past_hidden = hidden_states[:, -1:]
+        self._lengths = self._lengths + 1
+        for seq, codes in zip(self.running, frame_codes.unbind(0)):
+            seq.frames.append(codes)
+
+    def _join(self, admitted: list, past_hidden: torch.Tensor, logits: torch.Tensor):
+        count = len(admitted)
+        long = dict(dtype=torch.long, device=self.device)
+        width = max(self._tables.shape[1], *(len(seq.blocks) for seq in admitted))
+        tables = torch.zeros((count, width), **long)
+        for row, seq in enumerate(admitted):
+            tables[row, :len(seq.blocks)] = torch.tensor(seq.blocks, **long)
+        text_len = max(self._text.shape[1], *(seq.trailing_text_hidden.shape[0] for seq in admitted))
+
+        def pad_text(text):
+            if text.shape[1] == text_len:
+                return text
+            return torch.cat([text, self.tts_pad_embed.expand(text.shape[0], text_len - text.shape[1], -1)], dim=1)
+
+        text = pad_text(torch.nn.utils.rnn.pad_sequence([seq.trailing_text_hidden for seq in admitted], batch_first=True))
+        # Padding of pad_sequence comes before the sequence's own tts_pad_embed: rewrite it.
+        for row, seq in enumerate(admitted):
+            text[row, seq.trailing_text_hidden.shape[0]:] = self.tts_pad_embed
+        self._tables = torch.cat([torch.nn.functional.pad(self._tables, (0, width - self._tables.shape[1])), tables])
+        self._text = torch.cat([pad_text(self._text), text])
+        self._tokens = torch.cat([self._tokens, torch.zeros(count, **long)])
+        self._counts = torch.cat([self._counts, torch.zeros(count, **long)])
+        self._max_new_tokens = torch.cat([self._max_new_tokens, torch.tensor([seq.max_new_tokens for seq in admitted], **long)])
+        self._lengths = torch.cat([self._lengths, torch.tensor([seq.inputs_embeds.shape[0] for seq in admitted], **long)])
+        self._seen = torch.cat([self._seen, self._seen.new_zeros((count, self._seen.shape[1]))])
+        self._past_hidden = torch.cat([self._past_hidden, past_hidden])
+        self._logits = torch.cat([self._logits, logits])
+        for seq in admitted:
+            seq.inputs_embeds = None
+        self.running = self.running + admitted
+        self._configure_sampling()
+
+    def _retire(self, keep: torch.BoolTensor) -> list[Qwen3TTSTalkerSequence]:
+        flags = keep.tolist()
+        finished = [seq for seq, kept in zip(self.running, flags) if not kept]
+        for seq in finished:
+            self._finish(seq)
+        self.running = [seq for seq, kept in zip(self.running, flags) if kept]
+        index = keep.nonzero().squeeze(1)
+        for name in ("_tokens", "_counts", "_max_new_tokens", "_lengths", "_tables", "_seen", "_text", "_past_hidden", "_logits"):
+            setattr(self, name, getattr(self, name)[index])
+        self._configure_sampling()
+        return finished
+
+    def _finish(self, seq: Qwen3TTSTalkerSequence):
+        self.cache.release(seq.blocks)
+        seq.blocks = []
+        num_code_groups = self.model.config.talker_config.num_code_groups
+        seq.codes = torch.stack(seq.frames) if seq.frames else torch.zeros((0, num_code_groups), dtype=torch.long, device=self.device)
+
+    def _configure_sampling(self):
+        vocab_size = self.model.config.talker_config.vocab_size
+        penalties = [seq.sampling[4] if seq.sampling[4] is not None else 1.0 for seq in self.running]
+        self._penalty = None
+        if any(p != 1.0 for p in penalties):
+            self._penalty = torch.tensor(penalties, dtype=torch.float32, device=self.device)[:, None]
+        self._warper = _RowWarper([seq.sampling[:4] for seq in self.running], vocab_size, self.device)
+        predictor = self.model.talker.code_predictor
+        subtalker = _RowWarper([seq.subtalker_sampling for seq in self.running], predictor.config.vocab_size, self.device)
+        self.predictor_cache.logits_processor = [subtalker] if subtalker.do_sample else []
+        self.predictor_cache.do_sample = subtalker.do_sample
 
-        talker_codes = torch.stack([hid[-1] for hid in talker_result.hidden_states if hid[-1] is not None], dim=1)
-        talker_hidden_states = torch.cat([hid[0][-1][:, -1:] for hid in talker_result.hidden_states], dim=1)[:, :-1]
-        
-        first_codebook = talker_codes[:, :, 0]
-        is_stop_token = (first_codebook ==  self.config.talker_config.codec_eos_token_id)
-        stop_indices = torch.argmax(is_stop_token.int(), dim=1)
-        has_stop_token = is_stop_token.any(dim=1)
-        effective_lengths = torch.where(has_stop_token, stop_indices, talker_codes.shape[1])
-        
-        talker_codes_list = [talker_codes[i, :length, ] for i, length in enumerate(effective_lengths)]
-        talker_hidden_states_list = [talker_hidden_states[i, :length, :] for i, length in enumerate(effective_lengths)]
-        
-        return talker_codes_list, talker_hidden_states_list
 
 __all__ = [
     "Qwen3TTSForConditionalGeneration",
+    "Qwen3TTSTalkerEngine",
     "Qwen3TTSTalkerForConditionalGeneration",
     "Qwen3TTSPreTrainedModel",
     "Qwen3TTSTalkerModel",
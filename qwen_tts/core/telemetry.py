@@ -0,0 +1,95 @@
+# coding=utf-8
+# Copyright 2026 The Alibaba Qwen team.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Per-stage timing hooks.
+
+Model and wrapper code wraps its pipeline stages in `stage(name)`; callers that want the timings
+register an observer with `add_stage_observer(fn)`, which is called as `fn(name, seconds, info)`.
+With no observer registered and no profiler running, `stage` only checks two flags, so the hooks
+cost nothing on the inference path. While an observer is registered, CUDA is synchronized at stage boundaries so the
+reported time covers the kernels launched by the stage rather than just their launch. While a
+`torch.profiler` session is active, stages are also recorded as labelled ranges in the trace.
+
+Stages emitted by the library:
+  - text_tokenize:  processor call in `Qwen3TTSModel`
+  - prompt_encode:  reference audio -> codes + speaker embedding
+  - talker_prefill: talker forward over the prompt
+  - talker_decode:  one talker decode step (per frame, excluding the code predictor)
+  - code_predictor: residual codebook generation for one frame
+  - codec_decode:   codes -> waveform (info: frames)
+"""
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Iterator, List
+
+import torch
+
+StageObserver = Callable[[str, float, Dict[str, Any]], None]
+
+_observers: List[StageObserver] = []
+_lock = threading.Lock()
+
+
+def add_stage_observer(fn: StageObserver) -> None:
+    """Register `fn(name, seconds, info)` to be called after every stage."""
+    global _observers
+    with _lock:
+        _observers = _observers + [fn]
+
+
+def remove_stage_observer(fn: StageObserver) -> None:
+    """Unregister an observer added with `add_stage_observer`."""
+    global _observers
+    with _lock:
+        _observers = [o for o in _observers if o is not fn]
+
+
+def _sync() -> None:
+    if torch.cuda.is_available() and torch.cuda.is_initialized():
+        torch.cuda.synchronize()
+
+
+def emit(name: str, seconds: float, **info: Any) -> None:
+    """Report a stage that was timed by the caller."""
+    for fn in _observers:
+        fn(name, seconds, info)
+
+
+@contextmanager
+def stage(name: str, **info: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Time the enclosed block as stage `name`.
+
+    Yields the `info` dict so the block can add fields (e.g. frame counts) that are only known
+    once it has run. Nothing is reported if the block raises.
+    """
+    observers = _observers
+    profiling = torch.autograd._profiler_enabled()
+    if not observers and not profiling:
+        yield info
+        return
+    with torch.profiler.record_function(name) if profiling else nullcontext():
+        if not observers:
+            yield info
+            return
+        _sync()
+        t0 = time.perf_counter()
+        yield info
+        _sync()
+        dt = time.perf_counter() - t0
+    for fn in observers:
+        fn(name, dt, info)
@@ -15,7 +15,7 @@
 """PyTorch Qwen3TTSTokenizerV2 model."""
 
 import math
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Callable, Optional, Union, List
 
 import numpy as np
@@ -72,6 +72,22 @@ class Qwen3TTSTokenizerV2DecoderOutput(ModelOutput):
     audio_values: List[torch.FloatTensor] = None
 
 
+@dataclass
+class Qwen3TTSTokenizerV2DecoderStreamingState:
+    r"""
+    Carry-over state of `Qwen3TTSTokenizerV2Decoder.streaming_decode` between calls.
+
+    conv_buffers (`dict`):
+        Per-module tensors keyed by module: the last `padding` input samples of every causal conv and the pending
+        (bias-free) overlap of every transposed conv.
+    past_key_values (`Cache`, *optional*):
+        Sliding-window KV cache of `pre_transformer`, bounded by `config.sliding_window`.
+    """
+
+    conv_buffers: dict = field(default_factory=dict)
+    past_key_values: Optional[Cache] = None
+
+
 def rotate_half(x):
     """Rotates half the hidden dims of the input."""
     x1 = x[..., : x.shape[-1] // 2]
@@ -191,6 +207,17 @@ class Qwen3TTSTokenizerV2CausalConvNet(nn.Module):
         hidden_state = F.pad(hidden_state, (self.padding, extra_padding), mode="constant", value=0)
         return self.conv(hidden_state).contiguous()
 
+    def streaming_forward(self, hidden_state, buffers):
+        # Same as `forward` for stride 1, with the left padding taken from the previous call's input.
+        if self.stride != 1:
+            raise ValueError("Streaming is only supported for stride-1 causal convolutions.")
+        past = buffers.get(self)
+        if past is None:
+            past = hidden_state.new_zeros(*hidden_state.shape[:-1], self.padding)
+        hidden_state = torch.cat([past, hidden_state], dim=-1)
+        buffers[self] = hidden_state[..., hidden_state.shape[-1] - self.padding :]
+        return self.conv(hidden_state).contiguous()
+
 
 class Qwen3TTSTokenizerV2CausalTransConvNet(nn.Module):
     def __init__(self, in_channels, out_channels, kernel_size, stride=1):
@@ -207,6 +234,23 @@ class Qwen3TTSTokenizerV2CausalTransConvNet(nn.Module):
             hidden_state = hidden_state[..., : hidden_state.shape[-1] - self.right_pad]
         return hidden_state.contiguous()
 
+    def streaming_forward(self, hidden_state, buffers):
+        # The `right_pad` samples trimmed by `forward` overlap with the next frames' output: keep them
+        # (minus the bias, which the next call adds again) and add them to the head of the next chunk.
+        hidden_state = self.conv(hidden_state)
+        if self.right_pad > 0:
+            overlap = buffers.get(self)
+            if overlap is not None:
+                hidden_state = torch.cat(
+                    [hidden_state[..., : self.right_pad] + overlap, hidden_state[..., self.right_pad :]], dim=-1
+                )
+            tail = hidden_state[..., hidden_state.shape[-1] - self.right_pad :]
+            if self.conv.bias is not None:
+                tail = tail - self.conv.bias[:, None]
+            buffers[self] = tail
+            hidden_state = hidden_state[..., : hidden_state.shape[-1] - self.right_pad]
+        return hidden_state.contiguous()
+
 
 class Qwen3TTSTokenizerV2ConvNeXtBlock(nn.Module):
     def __init__(self, dim: int):
@@ -242,6 +286,20 @@ class Qwen3TTSTokenizerV2ConvNeXtBlock(nn.Module):
 
         return hidden_states
 
+    def streaming_forward(self, hidden_states, buffers):
+        input = hidden_states
+
+        hidden_states = self.dwconv.streaming_forward(hidden_states, buffers)
+        hidden_states = hidden_states.permute(0, 2, 1)
+        hidden_states = self.norm(hidden_states)
+        hidden_states = self.pwconv1(hidden_states)
+        hidden_states = self.act(hidden_states)
+        hidden_states = self.pwconv2(hidden_states)
+        hidden_states = self.gamma * hidden_states
+        hidden_states = hidden_states.permute(0, 2, 1)
+
+        return input + hidden_states
+
 
 class Qwen3TTSTokenizerV2DecoderRotatoryEmbedding(nn.Module):
     inv_freq: torch.Tensor  # fix linting for `register_buffer`
@@ -634,6 +692,15 @@ class Qwen3TTSTokenizerV2DecoderDecoderResidualUnit(nn.Module):
         hidden_state = self.conv2(hidden_state)
         return hidden_state + residual
 
+    def streaming_forward(self, hidden_state, buffers):
+        residual = hidden_state
+
+        hidden_state = self.act1(hidden_state)
+        hidden_state = self.conv1.streaming_forward(hidden_state, buffers)
+        hidden_state = self.act2(hidden_state)
+        hidden_state = self.conv2.streaming_forward(hidden_state, buffers)
+        return hidden_state + residual
+
 
 class Qwen3TTSTokenizerV2DecoderDecoderBlock(Qwen3TTSTokenizerV2DecoderPreTrainedModel):
     def __init__(self, config: Qwen3TTSTokenizerV2DecoderConfig, layer_idx):
@@ -657,6 +724,11 @@ class Qwen3TTSTokenizerV2DecoderDecoderBlock(Qwen3TTSTokenizerV2DecoderPreTraine
             hidden = block(hidden)
         return hidden
 
+    def streaming_forward(self, hidden, buffers):
+        for block in self.block:
+            hidden = block(hidden) if isinstance(block, SnakeBeta) else block.streaming_forward(hidden, buffers)
+        return hidden
+
 
 class EuclideanCodebook(nn.Module):
     def __init__(
@@ -883,16 +955,53 @@ class Qwen3TTSTokenizerV2Decoder(Qwen3TTSTokenizerV2DecoderPreTrainedModel):
             wav = block(wav)
         return wav.clamp(min=-1, max=1)
 
-    def chunked_decode(self, codes, chunk_size=300, left_context_size=25):
+    def streaming_decode(self, codes, state=None):
+        """
+        Decode the next frames of a stream, continuing from `state`.
+
+        Every conv is causal and `pre_transformer` attends over a sliding window, so carrying the
+        conv tails, the transposed-conv overlaps and a window-bounded KV cache across calls makes
+        the concatenated output equal to `forward` on the whole sequence, at the cost of the new
+        frames only.
+
+        Args:
+            codes (`torch.LongTensor` of shape `(batch_size, num_quantizers, frames)`):
+                The new frames.
+            state (`Qwen3TTSTokenizerV2DecoderStreamingState`, *optional*):
+                State returned by the previous call; `None` starts a new stream.
+
+        Returns:
+            `Tuple[torch.FloatTensor, Qwen3TTSTokenizerV2DecoderStreamingState]`: the waveform of the new
+            frames, of shape `(batch_size, 1, frames * total_upsample)`, and the updated state.
+        """
+        if codes.shape[1] != self.config.num_quantizers:
+            raise ValueError(f"Expected {self.config.num_quantizers} layer of codes, got {codes.shape[1]}")
+        if state is None:
+            state = Qwen3TTSTokenizerV2DecoderStreamingState(past_key_values=DynamicCache(config=self.config))
+        buffers = state.conv_buffers
+
+        hidden = self.quantizer.decode(codes)
+        hidden = self.pre_conv.streaming_forward(hidden, buffers).transpose(1, 2)
+
+        hidden = self.pre_transformer(
+            inputs_embeds=hidden, past_key_values=state.past_key_values, use_cache=True
+        ).last_hidden_state
+        hidden = hidden.permute(0, 2, 1)
+        for upsample, convnext in self.upsample:
+            hidden = upsample.streaming_forward(hidden, buffers)
+            hidden = convnext.streaming_forward(hidden, buffers)
+        wav = hidden
+        for block in self.decoder:
+            wav = block(wav) if isinstance(block, SnakeBeta) else block.streaming_forward(wav, buffers)
+        return wav.clamp(min=-1, max=1), state
+
+    def chunked_decode(self, codes, chunk_size=300):
+        # Bounds activation memory on long inputs; the streaming state makes the result match `forward`.
         wavs = []
-        start_index = 0
-        while start_index < codes.shape[-1]:
-            end_index = min(start_index + chunk_size, codes.shape[-1])
-            context_size = left_context_size if start_index - left_context_size > 0 else start_index
-            codes_chunk = codes[..., start_index - context_size : end_index]
-            wav_chunk = self(codes_chunk)
-            wavs.append(wav_chunk[..., context_size * self.total_upsample :])
-            start_index = end_index
+        state = None
+        for start_index in range(0, codes.shape[-1], chunk_size):
+            wav_chunk, state = self.streaming_decode(codes[..., start_index : start_index + chunk_size], state)
+            wavs.append(wav_chunk)
         return torch.cat(wavs, dim=-1)
 
 
@@ -1023,5 +1132,29 @@ class Qwen3TTSTokenizerV2Model(Qwen3TTSTokenizerV2PreTrainedModel):
 
         return Qwen3TTSTokenizerV2DecoderOutput(audio_values)
 
+    def streaming_decode(
+        self,
+        audio_codes: torch.Tensor,
+        state: Optional[Qwen3TTSTokenizerV2DecoderStreamingState] = None,
+    ) -> tuple[torch.Tensor, Qwen3TTSTokenizerV2DecoderStreamingState]:
+        """
+        Decodes the next frames of a code stream, continuing from the state of the previous call.
+
+        Concatenating the outputs of successive calls gives the same waveform as `decode` on all frames at once.
+
+        Args:
+            audio_codes (`torch.LongTensor` of shape `(batch_size, codes_length, num_quantizers)`):
+                The new frames.
+            state (`Qwen3TTSTokenizerV2DecoderStreamingState`, *optional*):
+                State returned by the previous call; `None` starts a new stream.
+
+        Returns:
+            `Tuple[torch.FloatTensor, Qwen3TTSTokenizerV2DecoderStreamingState]`: audio of shape
+            `(batch_size, codes_length * decode_upsample_rate)` and the updated state.
+        """
+        audio_codes = torch.clamp(audio_codes, min=0)
+        audio_values, state = self.decoder.streaming_decode(audio_codes.transpose(1, 2), state)
+        return audio_values.squeeze(1), state
+
 
 __all__ = ["Qwen3TTSTokenizerV2Model", "Qwen3TTSTokenizerV2PreTrainedModel"]
@@ -15,9 +15,10 @@
 # limitations under the License.
 import base64
 import io
+import re
 import urllib.request
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 from urllib.parse import urlparse
 
 import librosa
@@ -27,6 +28,9 @@ import torch
 from transformers import AutoConfig, AutoModel, AutoProcessor
 
 from ..core.models import Qwen3TTSConfig, Qwen3TTSForConditionalGeneration, Qwen3TTSProcessor
+from ..core.models.modeling_qwen3_tts import Qwen3TTSTalkerEngine, Qwen3TTSTalkerSequence
+from ..core.cancellation import CancelFn, cancel_flags
+from ..core.telemetry import stage
 
 AudioLike = Union[
     str,                     # wav path, URL, base64
@@ -36,6 +40,47 @@ AudioLike = Union[
 
 MaybeList = Union[Any, List[Any]]
 
+# Sentence ends: CJK and Western terminators (a period only when not inside a number), plus
+# trailing closing quotes/brackets and whitespace; blank-line paragraph breaks also end a sentence.
+_SENTENCE_END = re.compile(r"(?:[。！？!?…]+|(?<!\d)\.(?!\d)|[;；])[\"'”’」』)）\]]*\s*|\n\s*")
+# Clause ends, used to break sentences that do not fit the token budget on their own.
+_CLAUSE_END = re.compile(r"[，,、：:—]+\s*")
+
+
+class _CrossfadeStitcher:
+    """
+    Joins separately generated segments with an equal-power crossfade, incrementally.
+
+    The last `fade` samples written are held back until the next segment (or `close`), so
+    streamed output can be emitted as it is produced.
+    """
+
+    def __init__(self, fade: int):
+        self.fade = max(int(fade), 0)
+        self._tail = np.zeros(0, dtype=np.float32)
+        self._new_segment = False
+
+    def start_segment(self) -> None:
+        self._new_segment = True
+
+    def write(self, wav: np.ndarray) -> np.ndarray:
+        wav = np.asarray(wav, dtype=np.float32)
+        n = min(self.fade, len(self._tail), len(wav)) if self._new_segment else 0
+        self._new_segment = False
+        if n:
+            t = (np.arange(n, dtype=np.float32) + 0.5) / n * (np.pi / 2)
+            mixed = self._tail[-n:] * np.cos(t) + wav[:n] * np.sin(t)
+            wav = np.concatenate([self._tail[:-n], mixed, wav[n:]])
+        else:
+            wav = np.concatenate([self._tail, wav])
+        cut = max(len(wav) - self.fade, 0)
+        self._tail = wav[cut:]
+        return wav[:cut]
+
+    def close(self) -> np.ndarray:
+        tail, self._tail = self._tail, np.zeros(0, dtype=np.float32)
+        return tail
+
 
 @dataclass
 class VoiceClonePromptItem:
@@ -60,6 +105,14 @@ class Qwen3TTSModel:
           * VoiceDesign: generate_voice_design()
           * Base: generate_voice_clone() + create_voice_clone_prompt()
       - consistent output: (wavs: List[np.ndarray], sample_rate: int)
+      - incremental streaming: stream_custom_voice() / stream_voice_design() / stream_voice_clone()
+        yield (wav_chunk: np.ndarray, sample_rate: int) while the talker is still generating
+      - long-form synthesis: generate_long() / stream_long() split long text into sentence chunks,
+        generate them in batches and crossfade the results
+      - continuous batching: get_engine() / add_requests() / decode_sequences() feed texts into a
+        running batch that sequences join and leave frame by frame
+      - prefix caching: enable_prefix_cache() reuses the talker KV states of prompt prefixes shared
+        across calls (instruction, role tokens, speaker)
 
     Notes:
       - This wrapper expects the underlying model class to be `Qwen3TTSForConditionalGeneration`
@@ -71,6 +124,7 @@ class Qwen3TTSModel:
         self.model = model
         self.processor = processor
         self.generate_defaults = generate_defaults or {}
+        self._engine: Optional[Qwen3TTSTalkerEngine] = None
 
         self.device = getattr(model, "device", None)
         if self.device is None:
@@ -277,11 +331,12 @@ class Qwen3TTSModel:
 
     def _tokenize_texts(self, texts: List[str]) -> List[torch.Tensor]:
         input_ids = []
-        for text in texts:
-            input = self.processor(text=text, return_tensors="pt", padding=True)
-            input_id = input["input_ids"].to(self.device)
-            input_id = input_id.unsqueeze(0) if input_id.dim() == 1 else input_id
-            input_ids.append(input_id)
+        with stage("text_tokenize"):
+            for text in texts:
+                input = self.processor(text=text, return_tensors="pt", padding=True)
+                input_id = input["input_ids"].to(self.device)
+                input_id = input_id.unsqueeze(0) if input_id.dim() == 1 else input_id
+                input_ids.append(input_id)
         return input_ids
 
     def _merge_generate_kwargs(
@@ -416,7 +471,15 @@ class Qwen3TTSModel:
             )
 
         normalized = self._normalize_audio_inputs(ref_audio_list)
+        with stage("prompt_encode"):
+            return self._encode_voice_clone_prompt(normalized, ref_text_list, xvec_list)
 
+    def _encode_voice_clone_prompt(
+        self,
+        normalized: List[Tuple[np.ndarray, int]],
+        ref_text_list: List[Optional[str]],
+        xvec_list: List[bool],
+    ) -> List[VoiceClonePromptItem]:
         ref_wavs_for_code: List[np.ndarray] = []
         ref_sr_for_code: List[int] = []
         for wav, sr in normalized:
@@ -465,6 +528,177 @@ class Qwen3TTSModel:
             icl_mode=[it.icl_mode for it in items],
         )
 
+    def _voice_clone_inputs(
+        self,
+        text: Union[str, List[str]],
+        language: Union[str, List[str]] = None,
+        ref_audio: Optional[Union[AudioLike, List[AudioLike]]] = None,
+        ref_text: Optional[Union[str, List[Optional[str]]]] = None,
+        x_vector_only_mode: Union[bool, List[bool]] = False,
+        voice_clone_prompt: Optional[Union[Dict[str, Any], List[VoiceClonePromptItem]]] = None,
+        method: str = "generate_voice_clone",
+    ) -> Dict[str, Any]:
+        """Validate voice-clone inputs and build the talker inputs for `Qwen3TTSForConditionalGeneration.generate`."""
+        if self.model.tts_model_type != "base":
+            raise ValueError(
+                f"model with \ntokenizer_type: {self.model.tokenizer_type}\n"
+                f"tts_model_size: {self.model.tts_model_size}\n"
+                f"tts_model_type: {self.model.tts_model_type}\n"
+                f"does not support {method}, Please check Model Card or Readme for more details."
+            )
+        
+        texts = self._ensure_list(text)
+        languages = self._ensure_list(language) if isinstance(language, list) else ([language] * len(texts) if language is not None else ["Auto"] * len(texts))
+        if len(languages) == 1 and len(texts) > 1:
+            languages = languages * len(texts)
+        if len(texts) != len(languages):
+            raise ValueError(f"Batch size mismatch: text={len(texts)}, language={len(languages)}")
+
+        self._validate_languages(languages)
+
+        if voice_clone_prompt is None:
+            if ref_audio is None:
+                raise ValueError("Either `voice_clone_prompt` or `ref_audio` must be provided.")
+            prompt_items = self.create_voice_clone_prompt(ref_audio=ref_audio, ref_text=ref_text, x_vector_only_mode=x_vector_only_mode)
+            if len(prompt_items) == 1 and len(texts) > 1:
+                prompt_items = prompt_items * len(texts)
+            if len(prompt_items) != len(texts):
+                raise ValueError(f"Batch size mismatch: prompt={len(prompt_items)}, text={len(texts)}")
+            voice_clone_prompt_dict = self._prompt_items_to_voice_clone_prompt(prompt_items)
+            ref_texts_for_ids = [it.ref_text for it in prompt_items]
+        else:
+            if isinstance(voice_clone_prompt, list):
+                prompt_items = voice_clone_prompt
+                if len(prompt_items) == 1 and len(texts) > 1:
+                    prompt_items = prompt_items * len(texts)
+                if len(prompt_items) != len(texts):
+                    raise ValueError(f"Batch size mismatch: prompt={len(prompt_items)}, text={len(texts)}")
+                voice_clone_prompt_dict = self._prompt_items_to_voice_clone_prompt(prompt_items)
+                ref_texts_for_ids = [it.ref_text for it in prompt_items]
+            else:
+                voice_clone_prompt_dict = voice_clone_prompt
+                ref_texts_for_ids = None
+
+        input_texts = [self._build_assistant_text(t) for t in texts]
+        input_ids = self._tokenize_texts(input_texts)
+
+        ref_ids = None
+        if ref_texts_for_ids is not None:
+            ref_ids = []
+            for i, rt in enumerate(ref_texts_for_ids):
+                if rt is None or rt == "":
+                    ref_ids.append(None)
+                else:
+                    ref_tok = self._tokenize_texts([self._build_ref_text(rt)])[0]
+                    ref_ids.append(ref_tok)
+
+        return dict(
+            input_ids=input_ids,
+            ref_ids=ref_ids,
+            voice_clone_prompt=voice_clone_prompt_dict,
+            languages=languages,
+        )
+
+    def _voice_design_inputs(
+        self,
+        text: Union[str, List[str]],
+        instruct: Union[str, List[str]],
+        language: Union[str, List[str]] = None,
+        method: str = "generate_voice_design",
+    ) -> Dict[str, Any]:
+        """Validate voice-design inputs and build the talker inputs for `Qwen3TTSForConditionalGeneration.generate`."""
+        if self.model.tts_model_type != "voice_design":
+            raise ValueError(
+                f"model with \ntokenizer_type: {self.model.tokenizer_type}\n"
+                f"tts_model_size: {self.model.tts_model_size}\n"
+                f"tts_model_type: {self.model.tts_model_type}\n"
+                f"does not support {method}, Please check Model Card or Readme for more details."
+            )
+        
+        texts = self._ensure_list(text)
+        languages = self._ensure_list(language) if isinstance(language, list) else ([language] * len(texts) if language is not None else ["Auto"] * len(texts))
+        instructs = self._ensure_list(instruct)
+
+        if len(languages) == 1 and len(texts) > 1:
+            languages = languages * len(texts)
+        if len(instructs) == 1 and len(texts) > 1:
+            instructs = instructs * len(texts)
+
+        if not (len(texts) == len(languages) == len(instructs)):
+            raise ValueError(f"Batch size mismatch: text={len(texts)}, language={len(languages)}, instruct={len(instructs)}")
+
+        self._validate_languages(languages)
+
+        input_ids = self._tokenize_texts([self._build_assistant_text(t) for t in texts])
+
+        instruct_ids: List[Optional[torch.Tensor]] = []
+        for ins in instructs:
+            if ins is None or ins == "":
+                instruct_ids.append(None)
+            else:
+                instruct_ids.append(self._tokenize_texts([self._build_instruct_text(ins)])[0])
+
+        return dict(
+            input_ids=input_ids,
+            instruct_ids=instruct_ids,
+            languages=languages,
+        )
+
+    def _custom_voice_inputs(
+        self,
+        text: Union[str, List[str]],
+        speaker: Union[str, List[str]],
+        language: Union[str, List[str]] = None,
+        instruct: Optional[Union[str, List[str]]] = None,
+        method: str = "generate_custom_voice",
+    ) -> Dict[str, Any]:
+        """Validate custom-voice inputs and build the talker inputs for `Qwen3TTSForConditionalGeneration.generate`."""
+        if self.model.tts_model_type != "custom_voice":
+            raise ValueError(
+                f"model with \ntokenizer_type: {self.model.tokenizer_type}\n"
+                f"tts_model_size: {self.model.tts_model_size}\n"
+                f"tts_model_type: {self.model.tts_model_type}\n"
+                f"does not support {method}, Please check Model Card or Readme for more details."
+            )
+
+        texts = self._ensure_list(text)
+        languages = self._ensure_list(language) if isinstance(language, list) else ([language] * len(texts) if language is not None else ["Auto"] * len(texts))
+        speakers = self._ensure_list(speaker)
+        if self.model.tts_model_size in "0b6": # for 0b6 model, instruct is not supported
+            instruct = None
+        instructs = self._ensure_list(instruct) if isinstance(instruct, list) else ([instruct] * len(texts) if instruct is not None else [""] * len(texts))
+
+        if len(languages) == 1 and len(texts) > 1:
+            languages = languages * len(texts)
+        if len(speakers) == 1 and len(texts) > 1:
+            speakers = speakers * len(texts)
+        if len(instructs) == 1 and len(texts) > 1:
+            instructs = instructs * len(texts)
+
+        if not (len(texts) == len(languages) == len(speakers) == len(instructs)):
+            raise ValueError(
+                f"Batch size mismatch: text={len(texts)}, language={len(languages)}, speaker={len(speakers)}, instruct={len(instructs)}"
+            )
+
+        self._validate_languages(languages)
+        self._validate_speakers(speakers)
+
+        input_ids = self._tokenize_texts([self._build_assistant_text(t) for t in texts])
+
+        instruct_ids: List[Optional[torch.Tensor]] = []
+        for ins in instructs:
+            if ins is None or ins == "":
+                instruct_ids.append(None)
+            else:
+                instruct_ids.append(self._tokenize_texts([self._build_instruct_text(ins)])[0])
+
+        return dict(
+            input_ids=input_ids,
+            instruct_ids=instruct_ids,
+            languages=languages,
+            speakers=speakers,
+        )
+
     # voice clone model
     @torch.no_grad()
     def generate_voice_clone(
@@ -545,92 +779,27 @@ class Qwen3TTSModel:
             ValueError:
                 If batch sizes mismatch or required prompt inputs are missing.
         """
-        if self.model.tts_model_type != "base":
-            raise ValueError(
-                f"model with \ntokenizer_type: {self.model.tokenizer_type}\n"
-                f"tts_model_size: {self.model.tts_model_size}\n"
-                f"tts_model_type: {self.model.tts_model_type}\n"
-                "does not support generate_voice_clone, Please check Model Card or Readme for more details."
-            )
-        
-        texts = self._ensure_list(text)
-        languages = self._ensure_list(language) if isinstance(language, list) else ([language] * len(texts) if language is not None else ["Auto"] * len(texts))
-        if len(languages) == 1 and len(texts) > 1:
-            languages = languages * len(texts)
-        if len(texts) != len(languages):
-            raise ValueError(f"Batch size mismatch: text={len(texts)}, language={len(languages)}")
-
-        self._validate_languages(languages)
-
-        if voice_clone_prompt is None:
-            if ref_audio is None:
-                raise ValueError("Either `voice_clone_prompt` or `ref_audio` must be provided.")
-            prompt_items = self.create_voice_clone_prompt(ref_audio=ref_audio, ref_text=ref_text, x_vector_only_mode=x_vector_only_mode)
-            if len(prompt_items) == 1 and len(texts) > 1:
-                prompt_items = prompt_items * len(texts)
-            if len(prompt_items) != len(texts):
-                raise ValueError(f"Batch size mismatch: prompt={len(prompt_items)}, text={len(texts)}")
-            voice_clone_prompt_dict = self._prompt_items_to_voice_clone_prompt(prompt_items)
-            ref_texts_for_ids = [it.ref_text for it in prompt_items]
-        else:
-            if isinstance(voice_clone_prompt, list):
-                prompt_items = voice_clone_prompt
-                if len(prompt_items) == 1 and len(texts) > 1:
-                    prompt_items = prompt_items * len(texts)
-                if len(prompt_items) != len(texts):
-                    raise ValueError(f"Batch size mismatch: prompt={len(prompt_items)}, text={len(texts)}")
-                voice_clone_prompt_dict = self._prompt_items_to_voice_clone_prompt(prompt_items)
-                ref_texts_for_ids = [it.ref_text for it in prompt_items]
-            else:
-                voice_clone_prompt_dict = voice_clone_prompt
-                ref_texts_for_ids = None
-
-        input_texts = [self._build_assistant_text(t) for t in texts]
-        input_ids = self._tokenize_texts(input_texts)
-
-        ref_ids = None
-        if ref_texts_for_ids is not None:
-            ref_ids = []
-            for i, rt in enumerate(ref_texts_for_ids):
-                if rt is None or rt == "":
-                    ref_ids.append(None)
-                else:
-                    ref_tok = self._tokenize_texts([self._build_ref_text(rt)])[0]
-                    ref_ids.append(ref_tok)
+        talker_inputs = self._voice_clone_inputs(
+            text=text,
+            language=language,
+            ref_audio=ref_audio,
+            ref_text=ref_text,
+            x_vector_only_mode=x_vector_only_mode,
+            voice_clone_prompt=voice_clone_prompt,
+        )
+        voice_clone_prompt_dict = talker_inputs["voice_clone_prompt"]
 
         gen_kwargs = self._merge_generate_kwargs(**kwargs)
 
         talker_codes_list, _ = self.model.generate(
-            input_ids=input_ids,
-            ref_ids=ref_ids,
-            voice_clone_prompt=voice_clone_prompt_dict,
-            languages=languages,
+            **talker_inputs,
             non_streaming_mode=non_streaming_mode,
             **gen_kwargs,
         )
 
-        codes_for_decode = []
-        for i, codes in enumerate(talker_codes_list):
-            ref_code_list = voice_clone_prompt_dict.get("ref_code", None)
-            if ref_code_list is not None and ref_code_list[i] is not None:
-                codes_for_decode.append(torch.cat([ref_code_list[i].to(codes.device), codes], dim=0))
-            else:
-                codes_for_decode.append(codes)
-
-        wavs_all, fs = self.model.speech_tokenizer.decode([{"audio_codes": c} for c in codes_for_decode])
-
-        wavs_out: List[np.ndarray] = []
-        for i, wav in enumerate(wavs_all):
-            ref_code_list = voice_clone_prompt_dict.get("ref_code", None)
-            if ref_code_list is not None and ref_code_list[i] is not None:
-                ref_len = int(ref_code_list[i].shape[0])
-                total_len = int(codes_for_decode[i].shape[0])
-                cut = int(ref_len / max(total_len, 1) * wav.shape[0])
-                wavs_out.append(wav[cut:])
-            else:
-                wavs_out.append(wav)
-
-        return wavs_out, fs
+        return self._decode_after_context(
+            talker_codes_list, voice_clone_prompt_dict.get("ref_code", None), kwargs.get("cancel")
+        )
 
     # voice design model
     @torch.no_grad()
@@ -683,48 +852,17 @@ class Qwen3TTSModel:
             Tuple[List[np.ndarray], int]:
                 (wavs, sample_rate)
         """
-        if self.model.tts_model_type != "voice_design":
-            raise ValueError(
-                f"model with \ntokenizer_type: {self.model.tokenizer_type}\n"
-                f"tts_model_size: {self.model.tts_model_size}\n"
-                f"tts_model_type: {self.model.tts_model_type}\n"
-                "does not support generate_voice_design, Please check Model Card or Readme for more details."
-            )
-        
-        texts = self._ensure_list(text)
-        languages = self._ensure_list(language) if isinstance(language, list) else ([language] * len(texts) if language is not None else ["Auto"] * len(texts))
-        instructs = self._ensure_list(instruct)
-
-        if len(languages) == 1 and len(texts) > 1:
-            languages = languages * len(texts)
-        if len(instructs) == 1 and len(texts) > 1:
-            instructs = instructs * len(texts)
-
-        if not (len(texts) == len(languages) == len(instructs)):
-            raise ValueError(f"Batch size mismatch: text={len(texts)}, language={len(languages)}, instruct={len(instructs)}")
-
-        self._validate_languages(languages)
-
-        input_ids = self._tokenize_texts([self._build_assistant_text(t) for t in texts])
-
-        instruct_ids: List[Optional[torch.Tensor]] = []
-        for ins in instructs:
-            if ins is None or ins == "":
-                instruct_ids.append(None)
-            else:
-                instruct_ids.append(self._tokenize_texts([self._build_instruct_text(ins)])[0])
+        talker_inputs = self._voice_design_inputs(text=text, instruct=instruct, language=language)
 
         gen_kwargs = self._merge_generate_kwargs(**kwargs)
 
         talker_codes_list, _ = self.model.generate(
-            input_ids=input_ids,
-            instruct_ids=instruct_ids,
-            languages=languages,
+            **talker_inputs,
             non_streaming_mode=non_streaming_mode,
             **gen_kwargs,
         )
 
-        wavs, fs = self.model.speech_tokenizer.decode([{"audio_codes": c} for c in talker_codes_list])
+        wavs, fs = self._decode_codes(talker_codes_list, kwargs.get("cancel"))
         return wavs, fs
 
     # custom voice model
@@ -785,59 +923,480 @@ class Qwen3TTSModel:
             ValueError:
                 If any speaker/language is unsupported or batch sizes mismatch.
         """
-        if self.model.tts_model_type != "custom_voice":
-            raise ValueError(
-                f"model with \ntokenizer_type: {self.model.tokenizer_type}\n"
-                f"tts_model_size: {self.model.tts_model_size}\n"
-                f"tts_model_type: {self.model.tts_model_type}\n"
-                "does not support generate_custom_voice, Please check Model Card or Readme for more details."
-            )
+        talker_inputs = self._custom_voice_inputs(text=text, speaker=speaker, language=language, instruct=instruct)
 
-        texts = self._ensure_list(text)
-        languages = self._ensure_list(language) if isinstance(language, list) else ([language] * len(texts) if language is not None else ["Auto"] * len(texts))
-        speakers = self._ensure_list(speaker)
-        if self.model.tts_model_size in "0b6": # for 0b6 model, instruct is not supported
-            instruct = None
-        instructs = self._ensure_list(instruct) if isinstance(instruct, list) else ([instruct] * len(texts) if instruct is not None else [""] * len(texts))
+        gen_kwargs = self._merge_generate_kwargs(**kwargs)
 
-        if len(languages) == 1 and len(texts) > 1:
-            languages = languages * len(texts)
-        if len(speakers) == 1 and len(texts) > 1:
-            speakers = speakers * len(texts)
-        if len(instructs) == 1 and len(texts) > 1:
-            instructs = instructs * len(texts)
+        talker_codes_list, _ = self.model.generate(
+            **talker_inputs,
+            non_streaming_mode=non_streaming_mode,
+            **gen_kwargs,
+        )
 
-        if not (len(texts) == len(languages) == len(speakers) == len(instructs)):
-            raise ValueError(
-                f"Batch size mismatch: text={len(texts)}, language={len(languages)}, speaker={len(speakers)}, instruct={len(instructs)}"
-            )
+        wavs, fs = self._decode_codes(talker_codes_list, kwargs.get("cancel"))
+        return wavs, fs
 
-        self._validate_languages(languages)
-        self._validate_speakers(speakers)
 
-        input_ids = self._tokenize_texts([self._build_assistant_text(t) for t in texts])
+    # streaming
+    def _single_text(self, text: Union[str, List[str]], method: str) -> str:
+        texts = self._ensure_list(text)
+        if len(texts) != 1:
+            raise ValueError(f"{method} synthesizes one text at a time, got {len(texts)}.")
+        return texts[0]
 
-        instruct_ids: List[Optional[torch.Tensor]] = []
-        for ins in instructs:
-            if ins is None or ins == "":
-                instruct_ids.append(None)
+    def _decode_codes(
+        self, codes_list: List[torch.Tensor], cancel: Optional[CancelFn] = None
+    ) -> Tuple[List[np.ndarray], int]:
+        """Decode talker codes to waveforms; rows flagged by `cancel` are not decoded and come back empty."""
+        tokenizer = self.model.speech_tokenizer
+        keep = [i for i, flag in enumerate(cancel_flags(cancel, len(codes_list))) if not flag]
+        wavs = [np.zeros(0, dtype=np.float32) for _ in codes_list]
+        if not keep:
+            return wavs, tokenizer.get_output_sample_rate()
+        decoded, fs = tokenizer.decode([{"audio_codes": codes_list[i]} for i in keep])
+        for i, wav in zip(keep, decoded):
+            wavs[i] = wav
+        return wavs, fs
+
+    def _decode_after_context(
+        self,
+        codes_list: List[torch.Tensor],
+        ref_code_list: Optional[List[Optional[torch.Tensor]]],
+        cancel: Optional[CancelFn] = None,
+    ) -> Tuple[List[np.ndarray], int]:
+        """Decode talker codes behind their ICL reference codes, if any, and cut the reference audio off again."""
+        codes_for_decode = []
+        for i, codes in enumerate(codes_list):
+            if ref_code_list is not None and ref_code_list[i] is not None:
+                codes_for_decode.append(torch.cat([ref_code_list[i].to(codes.device), codes], dim=0))
             else:
-                instruct_ids.append(self._tokenize_texts([self._build_instruct_text(ins)])[0])
+                codes_for_decode.append(codes)
+
+        wavs_all, fs = self._decode_codes(codes_for_decode, cancel)
+
+        wavs_out: List[np.ndarray] = []
+        for i, wav in enumerate(wavs_all):
+            if ref_code_list is not None and ref_code_list[i] is not None:
+                ref_len = int(ref_code_list[i].shape[0])
+                total_len = int(codes_for_decode[i].shape[0])
+                cut = int(ref_len / max(total_len, 1) * wav.shape[0])
+                wavs_out.append(wav[cut:])
+            else:
+                wavs_out.append(wav)
+
+        return wavs_out, fs
+
+    def _stream_decode(
+        self,
+        frames: Iterator[torch.Tensor],
+        context_codes: Optional[torch.Tensor] = None,
+        first_chunk_frames: int = 4,
+        max_chunk_frames: int = 32,
+        cancel: Optional[CancelFn] = None,
+    ) -> Iterator[Tuple[np.ndarray, int]]:
+        """
+        Decode talker frames to audio in windows as they arrive.
+
+        The first window is `first_chunk_frames` long to minimise time-to-first-audio; each later
+        window doubles in size up to `max_chunk_frames`, which amortises the per-call overhead.
+        The tokenizer's streaming state carries the decoder context between windows, so the chunks
+        add up to exactly what a one-shot decode produces (for ICL voice clone, the reference codes
+        are decoded first and their audio is discarded, as in `generate_voice_clone`). Once `cancel`
+        is set no further window is decoded.
+        """
+        tokenizer = self.model.speech_tokenizer
+        sr = tokenizer.get_output_sample_rate()
+        state = None
+        if context_codes is not None:
+            _, state = tokenizer.streaming_decode(context_codes, state)
+        chunk_frames = max(int(first_chunk_frames), 1)
+        pending: List[torch.Tensor] = []
+
+        def flush():
+            nonlocal state
+            wav, state = tokenizer.streaming_decode(torch.stack(pending, dim=0), state)
+            pending.clear()
+            return wav
+
+        for frame in frames:
+            pending.append(frame)
+            if len(pending) >= chunk_frames:
+                if cancel_flags(cancel, 1)[0]:
+                    return
+                yield flush(), sr
+                chunk_frames = min(chunk_frames * 2, max(int(max_chunk_frames), 1))
+        if pending and not cancel_flags(cancel, 1)[0]:
+            yield flush(), sr
+
+    @torch.no_grad()
+    def stream_custom_voice(
+        self,
+        text: str,
+        speaker: str,
+        language: str = None,
+        instruct: Optional[str] = None,
+        non_streaming_mode: bool = True,
+        first_chunk_frames: int = 4,
+        max_chunk_frames: int = 32,
+        **kwargs,
+    ) -> Iterator[Tuple[np.ndarray, int]]:
+        """
+        Streaming variant of `generate_custom_voice` for a single text.
+
+        Codec frames are taken from the talker loop as they are produced and decoded in small
+        windows, so the first audio is available after `first_chunk_frames` frames instead of
+        after the whole utterance.
 
+        Args:
+            text, speaker, language, instruct, non_streaming_mode, **kwargs:
+                Same as `generate_custom_voice` (single sample only).
+            first_chunk_frames:
+                Frames in the first decoded window (12Hz frames, i.e. 80 ms each).
+            max_chunk_frames:
+                Upper bound for later windows; window size doubles after each chunk.
+
+        Yields:
+            Tuple[np.ndarray, int]:
+                (wav_chunk, sample_rate); concatenating the chunks gives the full waveform.
+        """
+        text = self._single_text(text, "stream_custom_voice")
+        talker_inputs = self._custom_voice_inputs(
+            text=text, speaker=speaker, language=language, instruct=instruct, method="stream_custom_voice"
+        )
         gen_kwargs = self._merge_generate_kwargs(**kwargs)
+        frames = (f[0] for f in self.model.generate_stream(**talker_inputs, non_streaming_mode=non_streaming_mode, **gen_kwargs))
+        yield from self._stream_decode(frames, None, first_chunk_frames, max_chunk_frames, kwargs.get("cancel"))
 
-        talker_codes_list, _ = self.model.generate(
-            input_ids=input_ids,
-            instruct_ids=instruct_ids,
-            languages=languages,
-            speakers=speakers,
-            non_streaming_mode=non_streaming_mode,
-            **gen_kwargs,
+    @torch.no_grad()
+    def stream_voice_design(
+        self,
+        text: str,
+        instruct: str,
+        language: str = None,
+        non_streaming_mode: bool = True,
+        first_chunk_frames: int = 4,
+        max_chunk_frames: int = 32,
+        **kwargs,
+    ) -> Iterator[Tuple[np.ndarray, int]]:
+        """
+        Streaming variant of `generate_voice_design` for a single text.
+
+        Args:
+            text, instruct, language, non_streaming_mode, **kwargs:
+                Same as `generate_voice_design` (single sample only).
+            first_chunk_frames, max_chunk_frames:
+                Window schedule, see `stream_custom_voice`.
+
+        Yields:
+            Tuple[np.ndarray, int]:
+                (wav_chunk, sample_rate)
+        """
+        text = self._single_text(text, "stream_voice_design")
+        talker_inputs = self._voice_design_inputs(
+            text=text, instruct=instruct, language=language, method="stream_voice_design"
         )
+        gen_kwargs = self._merge_generate_kwargs(**kwargs)
+        frames = (f[0] for f in self.model.generate_stream(**talker_inputs, non_streaming_mode=non_streaming_mode, **gen_kwargs))
+        yield from self._stream_decode(frames, None, first_chunk_frames, max_chunk_frames, kwargs.get("cancel"))
 
-        wavs, fs = self.model.speech_tokenizer.decode([{"audio_codes": c} for c in talker_codes_list])
-        return wavs, fs
+    @torch.no_grad()
+    def stream_voice_clone(
+        self,
+        text: str,
+        language: str = None,
+        ref_audio: Optional[AudioLike] = None,
+        ref_text: Optional[str] = None,
+        x_vector_only_mode: bool = False,
+        voice_clone_prompt: Optional[Union[Dict[str, Any], List[VoiceClonePromptItem]]] = None,
+        non_streaming_mode: bool = False,
+        first_chunk_frames: int = 4,
+        max_chunk_frames: int = 32,
+        **kwargs,
+    ) -> Iterator[Tuple[np.ndarray, int]]:
+        """
+        Streaming variant of `generate_voice_clone` for a single text.
 
+        In ICL mode the reference codes prime the decoder state, so the output continues the
+        reference audio just as in `generate_voice_clone`.
+
+        Args:
+            text, language, ref_audio, ref_text, x_vector_only_mode, voice_clone_prompt, non_streaming_mode, **kwargs:
+                Same as `generate_voice_clone` (single sample only).
+            first_chunk_frames, max_chunk_frames:
+                Window schedule, see `stream_custom_voice`.
+
+        Yields:
+            Tuple[np.ndarray, int]:
+                (wav_chunk, sample_rate)
+        """
+        text = self._single_text(text, "stream_voice_clone")
+        talker_inputs = self._voice_clone_inputs(
+            text=text,
+            language=language,
+            ref_audio=ref_audio,
+            ref_text=ref_text,
+            x_vector_only_mode=x_vector_only_mode,
+            voice_clone_prompt=voice_clone_prompt,
+            method="stream_voice_clone",
+        )
+        ref_code_list = talker_inputs["voice_clone_prompt"].get("ref_code", None)
+        context_codes = ref_code_list[0] if ref_code_list is not None else None
+        gen_kwargs = self._merge_generate_kwargs(**kwargs)
+        frames = (f[0] for f in self.model.generate_stream(**talker_inputs, non_streaming_mode=non_streaming_mode, **gen_kwargs))
+        yield from self._stream_decode(frames, context_codes, first_chunk_frames, max_chunk_frames, kwargs.get("cancel"))
+
+    # long-form
+    _LONG_FORM_METHODS = {
+        "custom_voice": ("generate_custom_voice", "stream_custom_voice"),
+        "voice_design": ("generate_voice_design", "stream_voice_design"),
+        "base": ("generate_voice_clone", "stream_voice_clone"),
+    }
+
+    def _count_tokens(self, text: str) -> int:
+        return int(self.processor(text=text, return_tensors="pt", padding=True)["input_ids"].shape[-1])
+
+    @staticmethod
+    def _split_at(pattern: "re.Pattern", text: str) -> List[str]:
+        parts, start = [], 0
+        for m in pattern.finditer(text):
+            if m.end() > start:
+                parts.append(text[start:m.end()])
+                start = m.end()
+        if start < len(text):
+            parts.append(text[start:])
+        return parts
+
+    def _fit_tokens(self, text: str, max_tokens: int) -> List[str]:
+        """Break `text` at clause, then word, then character boundaries until every piece fits."""
+        if self._count_tokens(text) <= max_tokens:
+            return [text]
+        for pattern in (_CLAUSE_END, re.compile(r"\s+")):
+            parts = self._split_at(pattern, text)
+            if len(parts) > 1:
+                return [p for part in parts for p in self._fit_tokens(part, max_tokens)]
+        return list(text)
+
+    def split_text(self, text: str, max_tokens: int = 80) -> List[str]:
+        """
+        Split text into chunks of whole sentences of at most `max_tokens` text tokens.
+
+        Sentences end at Chinese/Japanese/Korean and Western terminators and at line breaks.
+        Consecutive sentences are packed into one chunk while they fit; a sentence that is too
+        long on its own is broken at clause punctuation, then between words, and as a last resort
+        between characters.
+
+        Args:
+            text:
+                Text to split.
+            max_tokens:
+                Token budget per chunk, counted with the model's text tokenizer.
+
+        Returns:
+            List[str]: Non-empty chunks in reading order.
+        """
+        max_tokens = max(int(max_tokens), 1)
+        pieces = [p for sentence in self._split_at(_SENTENCE_END, text) for p in self._fit_tokens(sentence, max_tokens)]
+        chunks: List[str] = []
+        current = ""
+        for piece in pieces:
+            if current.strip() and self._count_tokens(current + piece) > max_tokens:
+                chunks.append(current)
+                current = piece
+            else:
+                current += piece
+        chunks.append(current)
+        return [c.strip() for c in chunks if c.strip()]
+
+    def _long_form_setup(self, text: str, max_chunk_tokens: int, kwargs: Dict[str, Any], method: str):
+        if self.model.tts_model_type not in self._LONG_FORM_METHODS:
+            raise ValueError(f"Long-form synthesis is not supported for tts_model_type={self.model.tts_model_type}")
+        chunks = self.split_text(self._single_text(text, method), max_chunk_tokens)
+        if not chunks:
+            raise ValueError("Text is empty.")
+        if self.model.tts_model_type == "base" and kwargs.get("voice_clone_prompt") is None:
+            # Build the prompt once instead of once per batch.
+            kwargs["voice_clone_prompt"] = self.create_voice_clone_prompt(
+                ref_audio=kwargs.pop("ref_audio", None),
+                ref_text=kwargs.pop("ref_text", None),
+                x_vector_only_mode=kwargs.pop("x_vector_only_mode", False),
+            )
+        if kwargs.get("cancel") is not None:
+            # The caller's cancel describes one text; every batch of its chunks stops with it.
+            cancel = kwargs["cancel"]
+            kwargs["cancel"] = lambda: cancel_flags(cancel, 1)[0]
+        generate, stream = (getattr(self, name) for name in self._LONG_FORM_METHODS[self.model.tts_model_type])
+        return chunks, generate, stream
+
+    @torch.no_grad()
+    def generate_long(
+        self,
+        text: str,
+        max_chunk_tokens: int = 80,
+        batch_size: int = 8,
+        crossfade_ms: float = 40.0,
+        **kwargs,
+    ) -> Tuple[np.ndarray, int]:
+        """
+        Synthesize a long text as batched sentence chunks joined with short crossfades.
+
+        The text is split with `split_text`, the chunks are generated `batch_size` at a time with
+        the generate method of this model type, and the waveforms are stitched together. Each chunk
+        runs with a short KV cache, so quality and memory do not degrade with the length of the text.
+
+        Args:
+            text:
+                A single text.
+            max_chunk_tokens:
+                Token budget per chunk, see `split_text`.
+            batch_size:
+                Chunks per batched generate call.
+            crossfade_ms:
+                Overlap between consecutive chunks.
+            **kwargs:
+                Arguments of `generate_custom_voice` / `generate_voice_design` / `generate_voice_clone`
+                (speaker, instruct, language, voice clone prompt, sampling parameters, ...), applied to
+                every chunk. `max_new_tokens` is per chunk. A `cancel` callable stops the remaining
+                batches as well as the one in flight; a cancelled call returns an empty waveform.
+
+        Returns:
+            Tuple[np.ndarray, int]:
+                (wav, sample_rate)
+        """
+        chunks, generate, _ = self._long_form_setup(text, max_chunk_tokens, kwargs, "generate_long")
+        sr = self.model.speech_tokenizer.get_output_sample_rate()
+        stitcher = _CrossfadeStitcher(crossfade_ms * sr / 1000)
+        batch_size = max(int(batch_size), 1)
+        out: List[np.ndarray] = []
+        for i in range(0, len(chunks), batch_size):
+            if cancel_flags(kwargs.get("cancel"), 1)[0]:
+                return np.zeros(0, dtype=np.float32), sr
+            wavs, sr = generate(text=chunks[i:i + batch_size], **kwargs)
+            for wav in wavs:
+                stitcher.start_segment()
+                out.append(stitcher.write(wav))
+        out.append(stitcher.close())
+        return np.concatenate(out), sr
+
+    @torch.no_grad()
+    def stream_long(
+        self,
+        text: str,
+        max_chunk_tokens: int = 80,
+        batch_size: int = 8,
+        crossfade_ms: float = 40.0,
+        first_chunk_frames: int = 4,
+        max_chunk_frames: int = 32,
+        **kwargs,
+    ) -> Iterator[Tuple[np.ndarray, int]]:
+        """
+        Streaming variant of `generate_long`.
+
+        The first chunk is streamed frame by frame like `stream_custom_voice`, so audio starts
+        after `first_chunk_frames` frames; the remaining chunks are then generated `batch_size` at a
+        time and each is yielded as soon as its batch completes.
+
+        Args:
+            text, max_chunk_tokens, batch_size, crossfade_ms, **kwargs:
+                Same as `generate_long`.
+            first_chunk_frames, max_chunk_frames:
+                Window schedule for the first chunk, see `stream_custom_voice`.
+
+        Yields:
+            Tuple[np.ndarray, int]:
+                (wav_chunk, sample_rate)
+        """
+        chunks, generate, stream = self._long_form_setup(text, max_chunk_tokens, kwargs, "stream_long")
+        sr = self.model.speech_tokenizer.get_output_sample_rate()
+        stitcher = _CrossfadeStitcher(crossfade_ms * sr / 1000)
+        batch_size = max(int(batch_size), 1)
+        for wav, sr in stream(text=chunks[0], first_chunk_frames=first_chunk_frames,
+                              max_chunk_frames=max_chunk_frames, **kwargs):
+            wav = stitcher.write(wav)
+            if len(wav):
+                yield wav, sr
+        for i in range(1, len(chunks), batch_size):
+            if cancel_flags(kwargs.get("cancel"), 1)[0]:
+                return
+            wavs, sr = generate(text=chunks[i:i + batch_size], **kwargs)
+            for wav in wavs:
+                stitcher.start_segment()
+                wav = stitcher.write(wav)
+                if len(wav):
+                    yield wav, sr
+        yield stitcher.close(), sr
+
+    def enable_prefix_cache(self, max_tokens: int = 4096) -> None:
+        """
+        Cache the talker KV states of prompt prefixes: the instruction, the assistant role tokens and the
+        codec language/speaker tags. Later prompts with the same prefix are prefilled only from where it
+        ends, which makes repeated voice design descriptions and speakers cheaper to serve.
+
+        Args:
+            max_tokens:
+                Prefix positions kept, least recently used first out; 0 turns the cache off.
+        """
+        self.model.enable_prefix_cache(max_tokens)
+
+    # continuous batching
+    # Per tts_model_type: input builder, the generate method it stands for and that method's
+    # arguments that describe the input rather than the sampling, and its non_streaming_mode default.
+    _ENGINE_INPUTS = {
+        "custom_voice": ("_custom_voice_inputs", "generate_custom_voice", ("text", "speaker", "language", "instruct"), True),
+        "voice_design": ("_voice_design_inputs", "generate_voice_design", ("text", "instruct", "language"), True),
+        "base": ("_voice_clone_inputs", "generate_voice_clone",
+                 ("text", "language", "ref_audio", "ref_text", "x_vector_only_mode", "voice_clone_prompt"), False),
+    }
+
+    def get_engine(self, max_batch_size: int = 32, max_tokens: int = 32768, block_size: int = 16) -> Qwen3TTSTalkerEngine:
+        """
+        The continuous-batching engine of this model, see `Qwen3TTSTalkerEngine`.
+
+        Created, with its KV cache, by the first call; the arguments of later calls are ignored.
+        """
+        if self._engine is None:
+            self._engine = self.model.new_engine(max_batch_size=max_batch_size, max_tokens=max_tokens, block_size=block_size)
+        return self._engine
+
+    @torch.no_grad()
+    def add_requests(self, engine: Qwen3TTSTalkerEngine, **kwargs) -> List[int]:
+        """
+        Queue texts on a continuous-batching engine instead of generating them right away.
+
+        Args:
+            engine:
+                From `get_engine`.
+            **kwargs:
+                Arguments of the generate method of this model type (`generate_custom_voice`,
+                `generate_voice_design` or `generate_voice_clone`), validated the same way.
+
+        Returns:
+            List[int]: The engine's sequence ids, in text order. Drive the engine with `step()` and
+            turn the sequences it returns into audio with `decode_sequences`.
+        """
+        if self.model.tts_model_type not in self._ENGINE_INPUTS:
+            raise ValueError(f"Continuous batching is not supported for tts_model_type={self.model.tts_model_type}")
+        builder, method, fields, non_streaming_mode = self._ENGINE_INPUTS[self.model.tts_model_type]
+        talker_inputs = getattr(self, builder)(**{k: kwargs.pop(k) for k in fields if k in kwargs}, method=method)
+        non_streaming_mode = kwargs.pop("non_streaming_mode", non_streaming_mode)
+        kwargs.pop("cancel", None)   # cancel sequences with engine.cancel
+        gen_kwargs = self._merge_generate_kwargs(**kwargs)
+        return engine.add(**talker_inputs, non_streaming_mode=non_streaming_mode, **gen_kwargs)
+
+    def decode_sequences(self, sequences: List[Qwen3TTSTalkerSequence]) -> Tuple[List[np.ndarray], int]:
+        """
+        Decode finished engine sequences to waveforms, as the generate methods do.
+
+        Cancelled sequences are not decoded and come back empty.
+
+        Returns:
+            Tuple[List[np.ndarray], int]:
+                (wavs, sample_rate)
+        """
+        return self._decode_after_context(
+            [seq.codes for seq in sequences],
+            [seq.context_codes for seq in sequences],
+            lambda: [seq.cancelled for seq in sequences],
+        )
 
     def get_supported_speakers(self) -> Optional[List[str]]:
         """
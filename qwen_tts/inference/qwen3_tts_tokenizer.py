@@ -14,15 +14,20 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import base64
+import hashlib
 import io
+import os
+import threading
 import urllib.request
-from typing import List, Optional, Tuple, Union
+import weakref
+from typing import Any, List, Optional, Tuple, Union
 from urllib.parse import urlparse
 
 import librosa
 import numpy as np
 import soundfile as sf
 import torch
+from huggingface_hub import snapshot_download
 from torch.nn.utils.rnn import pad_sequence
 from transformers import AutoConfig, AutoFeatureExtractor, AutoModel
 
@@ -32,6 +37,7 @@ from ..core import (
     Qwen3TTSTokenizerV2Config,
     Qwen3TTSTokenizerV2Model,
 )
+from ..core.telemetry import stage
 
 AudioInput = Union[
     str,  # wav path, or base64 string
@@ -40,6 +46,42 @@ AudioInput = Union[
     List[np.ndarray],
 ]
 
+# Process-wide registry of loaded tokenizers, see `Qwen3TTSTokenizer.from_pretrained_shared`.
+_SHARED_TOKENIZERS = weakref.WeakValueDictionary()
+_SHARED_LOCK = threading.Lock()
+_WEIGHTS_DIGESTS = {}
+
+_HASHED_SUFFIXES = (".safetensors", ".bin", ".json")
+
+
+def _weights_digest(path: str) -> str:
+    """
+    Content hash of the weight and config files in a local model directory.
+
+    Digests are cached per (path, size, mtime) so repeated loads only stat the files.
+    """
+    path = os.path.realpath(path)
+    files = []
+    for root, _, names in os.walk(path):
+        for name in names:
+            if name.endswith(_HASHED_SUFFIXES):
+                full = os.path.join(root, name)
+                st = os.stat(full)
+                files.append((os.path.relpath(full, path), full, st.st_size, st.st_mtime_ns))
+    files.sort()
+    stamp = (path, tuple((rel, size, mtime) for rel, _, size, mtime in files))
+    digest = _WEIGHTS_DIGESTS.get(stamp)
+    if digest is None:
+        h = hashlib.sha256()
+        for rel, full, _, _ in files:
+            h.update(rel.encode("utf-8"))
+            with open(full, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+        digest = h.hexdigest()
+        _WEIGHTS_DIGESTS[stamp] = digest
+    return digest
+
 
 class Qwen3TTSTokenizer:
     """
@@ -98,6 +140,42 @@ class Qwen3TTSTokenizer:
 
         return inst
 
+    @classmethod
+    def from_pretrained_shared(cls, pretrained_model_name_or_path: str, *args, **kwargs) -> "Qwen3TTSTokenizer":
+        """
+        Like `from_pretrained`, but returns a process-wide shared instance.
+
+        Instances are keyed by a content hash of the weight files plus the loading arguments,
+        so every Qwen3 TTS checkpoint that ships the same `speech_tokenizer/` (and the standalone
+        tokenizer repo) resolves to a single codec in memory. The registry holds weak references:
+        the tokenizer is freed once no model or caller keeps it alive.
+
+        Args:
+            pretrained_model_name_or_path (str):
+                HuggingFace repo id or local directory.
+            *args, **kwargs (Any):
+                Forwarded to `from_pretrained(...)`; they are part of the sharing key, so loads with a
+                different device_map or dtype get their own instance.
+
+        Returns:
+            Qwen3TTSTokenizer:
+                The shared instance.
+        """
+        local_path = pretrained_model_name_or_path
+        if not os.path.isdir(local_path):
+            local_path = snapshot_download(pretrained_model_name_or_path)
+        key = (
+            _weights_digest(local_path),
+            tuple(repr(a) for a in args),
+            tuple(sorted((k, repr(v)) for k, v in kwargs.items())),
+        )
+        with _SHARED_LOCK:
+            inst = _SHARED_TOKENIZERS.get(key)
+            if inst is None:
+                inst = cls.from_pretrained(local_path, *args, **kwargs)
+                _SHARED_TOKENIZERS[key] = inst
+        return inst
+
     def _is_probably_base64(self, s: str) -> bool:
         if s.startswith("data:audio"):
             return True
@@ -160,7 +238,7 @@ class Qwen3TTSTokenizer:
     def _normalize_audio_inputs(
         self,
         audios: AudioInput,
-        sr: Optional[int],
+        sr: Optional[Union[int, List[int]]],
     ) -> List[np.ndarray]:
         """
         Normalize all supported input types into a list of 1-D numpy float32 waveforms
@@ -171,8 +249,8 @@ class Qwen3TTSTokenizer:
                 - str: wav path OR base64 audio string
                 - np.ndarray: raw waveform (sr must be provided)
                 - list[str] / list[np.ndarray]
-            sr (Optional[int]):
-                Sampling rate for raw numpy input. Required if input is np.ndarray or list[np.ndarray].
+            sr (Optional[Union[int, List[int]]]):
+                Sampling rate for raw numpy input, or one per waveform. Required if input is np.ndarray or list[np.ndarray].
 
         Returns:
             List[np.ndarray]:
@@ -194,21 +272,25 @@ class Qwen3TTSTokenizer:
         if sr is None:
             raise ValueError("For numpy waveform input, you must provide `sr` (original sampling rate).")
 
+        srs = list(sr) if isinstance(sr, (list, tuple)) else [sr] * len(audios)
+        if len(srs) != len(audios):
+            raise ValueError(f"Got {len(srs)} sampling rates for {len(audios)} waveforms.")
+
         out: List[np.ndarray] = []
-        for a in audios:  # type: ignore[assignment]
+        for a, a_sr in zip(audios, srs):  # type: ignore[assignment]
             if not isinstance(a, np.ndarray):
                 raise TypeError("Mixed input types are not supported. Use all paths/base64 or all numpy arrays.")
             if a.ndim > 1:
                 a = np.mean(a, axis=-1)
-            if int(sr) != target_sr:
-                a = librosa.resample(y=a.astype(np.float32), orig_sr=int(sr), target_sr=target_sr)
+            if int(a_sr) != target_sr:
+                a = librosa.resample(y=a.astype(np.float32), orig_sr=int(a_sr), target_sr=target_sr)
             out.append(a.astype(np.float32))
         return out
 
     def encode(
         self,
         audios: AudioInput,
-        sr: Optional[int] = None,
+        sr: Optional[Union[int, List[int]]] = None,
         return_dict: bool = True,
     ):
         """
@@ -221,8 +303,8 @@ class Qwen3TTSTokenizer:
                 - list[np.ndarray]: waveforms (requires sr)
                 - str: wav path OR base64 audio string
                 - list[str]: wav paths and/or base64 strings
-            sr (Optional[int], default=None):
-                Original sampling rate for numpy waveform input.
+            sr (Optional[Union[int, List[int]]], default=None):
+                Original sampling rate for numpy waveform input, or one per waveform.
             return_dict (bool, default=True):
                 Forwarded to model.encode(...). If True, returns ModelOutput.
 
@@ -323,12 +405,14 @@ class Qwen3TTSTokenizer:
                 # 12Hz single sample: (C, Q) -> (1, C, Q)
                 t = t.unsqueeze(0)
             audio_codes_padded = t.to(self.device)
+            frames = t.shape[0] * t.shape[1]
         else:
             # List[Tensor/np]
             audio_codes_list = [_to_tensor(c, dtype=torch.long) for c in audio_codes_list]
+            frames = sum(c.shape[0] for c in audio_codes_list)
             audio_codes_padded = pad_sequence(audio_codes_list, batch_first=True, padding_value=-1).to(self.device)
 
-        with torch.inference_mode():
+        with torch.inference_mode(), stage("codec_decode", frames=frames):
             if model_type == "qwen3_tts_tokenizer_25hz":
                 if xvectors_list is None or ref_mels_list is None:
                     raise ValueError("25Hz decode requires `xvectors` and `ref_mels`.")
@@ -364,6 +448,30 @@ class Qwen3TTSTokenizer:
         wavs = [w.to(torch.float32).detach().cpu().numpy() for w in wav_tensors]
         return wavs, int(self.model.get_output_sample_rate())
 
+    def streaming_decode(self, audio_codes: torch.Tensor, state: Any = None) -> Tuple[np.ndarray, Any]:
+        """
+        Decode the next frames of a 12Hz code stream for incremental playback.
+
+        The decoder keeps its conv tails and sliding-window KV cache in `state`, so each call only
+        pays for the new frames and the concatenated chunks equal a single `decode` of all frames.
+
+        Args:
+            audio_codes (torch.Tensor):
+                (codes_len, num_quantizers) new codes.
+            state (optional):
+                State returned by the previous call; None starts a new stream.
+
+        Returns:
+            Tuple[np.ndarray, Any]:
+                (1-D float32 waveform of the new frames, updated state)
+        """
+        if self.get_model_type() != "qwen3_tts_tokenizer_12hz":
+            raise ValueError("Streaming decode is only supported by the 12Hz tokenizer.")
+        codes = audio_codes.to(self.device).long().unsqueeze(0)
+        with torch.inference_mode(), stage("codec_decode", frames=codes.shape[1]):
+            wav, state = self.model.streaming_decode(codes, state)
+        return wav[0].to(torch.float32).detach().cpu().numpy(), state
+
     def get_model_type(self) -> str:
         """
         Get the underlying tokenizer model type.